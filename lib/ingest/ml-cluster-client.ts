@@ -9,6 +9,18 @@ interface ClusterResult {
   outliers: number
   processed: number
   message: string
+  /** Articles put in the cluster of a recent duplicate from an earlier batch */
+  linked?: number
+  /** Grown/drifted clusters re-enriched after the run (REENRICH_ENABLED) */
+  reenriched?: number
+  /** 'skipped' when another replica is running the global stages */
+  global_stage?: 'done' | 'skipped'
+  /** Last stage completed by the interrupted run this call resumed */
+  resumed_from?: string
+  /** Clusters still waiting for GPT enrichment (retried on the next call) */
+  enrich_pending?: number
+  /** Offline enrichment job id (poll GET /api/enrichment-jobs/:id) */
+  enrich_job?: string
 }
 
 interface SimilarityResult {
@@ -22,6 +34,58 @@ interface FindClusterResult {
   alternatives?: Array<{ cluster_id: string; similarity: number }>
 }
 
+interface FindClustersResult {
+  results: Array<FindClusterResult & { id: string | null }>
+  count: number
+  matched: number
+  persisted: number
+}
+
+interface MergeClustersResult {
+  clusters: number
+  groups: number
+  removed: number
+  articles_moved: number
+  dry_run: boolean
+  merges?: Array<{ into: string; absorbed: string[] }>
+}
+
+interface ResplitClustersResult {
+  clusters: number
+  wide: number
+  split: number
+  created: number
+  unassigned: number
+  dry_run: boolean
+  candidates?: Array<{
+    cluster_id: string
+    size: number
+    dispersion: number
+    children: number[]
+    outliers: number
+  }>
+}
+
+interface HierarchyViewResult {
+  run: {
+    created_at: number
+    articles: number
+    min_cluster_size: number
+    min_samples: number
+  }
+  min_cluster_size: number
+  epsilon: number
+  method: 'eom' | 'leaf'
+  clusters: Array<{
+    label: number
+    size: number
+    stability: number | null
+    article_ids: string[]
+    clusters?: Record<string, number>
+  }>
+  outliers: number
+}
+
 interface DuplicateResult {
   duplicates: Array<{
     id1: string
@@ -90,6 +154,19 @@ class MLClusterClient {
       signal: AbortSignal.timeout(this.timeout),
     })
 
+    if (response.status === 409) {
+      // Another run holds the cluster lock: nothing to do (and no fallback clustering)
+      return {
+        created: 0,
+        updated: 0,
+        duplicates: 0,
+        outliers: 0,
+        processed: 0,
+        message: 'Cluster run already in progress',
+        global_stage: 'skipped',
+      }
+    }
+
     if (!response.ok) {
       const error = await response.json()
       throw new Error(error.error || 'Clustering failed')
@@ -160,6 +237,139 @@ class MLClusterClient {
     return response.json()
   }
 
+  /**
+   * Encuentra el mejor cluster para muchos artículos (un embedding batch y una
+   * búsqueda matricial por petición). Con persist, guarda embeddings y asigna
+   * los artículos (requiere id).
+   */
+  async findClustersForArticles(
+    articles: Array<{
+      id?: string
+      title: string
+      snippet?: string
+      full_content?: string
+      countries?: string[]
+      topics?: string[]
+    }>,
+    options?: {
+      persist?: boolean
+      alternatives?: number
+      chunkSize?: number
+    }
+  ): Promise<FindClustersResult> {
+    const { chunkSize = 500, ...body } = options || {}
+    const combined: FindClustersResult = { results: [], count: 0, matched: 0, persisted: 0 }
+
+    for (let i = 0; i < articles.length; i += chunkSize) {
+      const response = await fetch(`${this.baseUrl}/api/find-clusters`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...body, articles: articles.slice(i, i + chunkSize) }),
+        signal: AbortSignal.timeout(this.timeout),
+      })
+
+      if (!response.ok) {
+        const error = await response.json()
+        throw new Error(error.error || 'Find clusters failed')
+      }
+
+      const result: FindClustersResult = await response.json()
+      combined.results.push(...result.results)
+      combined.count += result.count
+      combined.matched += result.matched
+      combined.persisted += result.persisted
+    }
+
+    return combined
+  }
+
+  /**
+   * Fusiona clusters con centroides casi idénticos (misma historia partida
+   * entre ejecuciones). Pensado para un cron de mantenimiento.
+   */
+  async mergeClusters(options?: {
+    threshold?: number
+    days?: number
+    dryRun?: boolean
+  }): Promise<MergeClustersResult> {
+    const response = await fetch(`${this.baseUrl}/api/merge-clusters`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        threshold: options?.threshold,
+        days: options?.days,
+        dry_run: options?.dryRun,
+      }),
+      signal: AbortSignal.timeout(this.timeout),
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(error.error || 'Merge clusters failed')
+    }
+
+    return response.json()
+  }
+
+  /**
+   * Divide clusters demasiado dispersos re-ejecutando HDBSCAN solo sobre sus
+   * miembros (el subcluster mayor conserva el id). Alternativa local a recluster.
+   */
+  async resplitClusters(options?: {
+    maxDispersion?: number
+    minSize?: number
+    days?: number
+    dryRun?: boolean
+  }): Promise<ResplitClustersResult> {
+    const response = await fetch(`${this.baseUrl}/api/resplit-clusters`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        max_dispersion: options?.maxDispersion,
+        min_size: options?.minSize,
+        days: options?.days,
+        dry_run: options?.dryRun,
+      }),
+      signal: AbortSignal.timeout(this.timeout),
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(error.error || 'Resplit clusters failed')
+    }
+
+    return response.json()
+  }
+
+  /**
+   * Clusters de la última ejecución a otra granularidad, recortados del árbol
+   * HDBSCAN en caché (sin recalcular embeddings ni HDBSCAN)
+   */
+  async getHierarchyView(options?: {
+    minClusterSize?: number
+    epsilon?: number
+    method?: 'eom' | 'leaf'
+    withClusters?: boolean
+  }): Promise<HierarchyViewResult> {
+    const params = new URLSearchParams()
+    if (options?.minClusterSize !== undefined) params.set('min_cluster_size', String(options.minClusterSize))
+    if (options?.epsilon !== undefined) params.set('epsilon', String(options.epsilon))
+    if (options?.method) params.set('method', options.method)
+    if (options?.withClusters) params.set('with_clusters', '1')
+
+    const response = await fetch(`${this.baseUrl}/api/hierarchy?${params}`, {
+      method: 'GET',
+      signal: AbortSignal.timeout(this.timeout),
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(error.error || 'Hierarchy view failed')
+    }
+
+    return response.json()
+  }
+
   /**
    * Detecta artículos duplicados
    */
@@ -239,4 +449,4 @@ export async function runMLClustering(options?: {
 }
 
 export { MLClusterClient }
-export type { ClusterResult, SimilarityResult, FindClusterResult, DuplicateResult }
+export type { ClusterResult, SimilarityResult, FindClusterResult, FindClustersResult, MergeClustersResult, ResplitClustersResult, HierarchyViewResult, DuplicateResult }
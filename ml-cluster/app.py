@@ -1,17 +1,36 @@
 """
 Flask API for the ML clustering service
 """
+import os
+import socket
 import logging
-from flask import Flask, request, jsonify
+from typing import Dict, Any, Optional
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 import numpy as np
 
 from config import Config
 from services.embeddings import get_embedding_service
-from services.clustering import ClusteringService, DeduplicationService
+from services.clustering import ClusteringService, DeduplicationService, labels_to_clusters
 from services.database import DatabaseService
 from services.enrichment import EnrichmentService
+from services.concurrency import configure_cpu_pool
+from services.streaming import StreamingEncoder
+from services.prefilter import DuplicatePrefilter, article_texts, encode_articles
+from services.grouping import annotate_timestamps
+from services.pipeline import (
+    ClusteringPipeline, RunCheckpoint, match_existing_clusters, link_recent_duplicates
+)
+from services.recent_index import RecentEmbeddingIndex
+from services.reenrichment import ReenrichmentQueue
+from services.batch_enrichment import BatchEnricher, OpenAIBatchBackend, LocalBatchBackend
+from services.stream_worker import CentroidIndex
+from services.export import FORMATS as EXPORT_FORMATS, stream_export
+from services.merge import ClusterMerger
+from services.resplit import ClusterResplitter
+from services.hierarchy import HierarchyStore
+from services.blocked import BlockedClusterer
 
 # Configurar logging
 logging.basicConfig(
@@ -30,6 +49,15 @@ _clustering_service = None
 _dedup_service = None
 _db_service = None
 _enrichment_service = None
+_recent_index = None
+_reenrich_queue = None
+_batch_enricher = None
+_centroid_index = None
+_hierarchy_store = None
+_blocked_clusterer = None
+
+# Advisory lock serializing the global stages of cluster runs across replicas
+CLUSTER_RUN_LOCK = "ml-cluster:cluster-run"
 
 
 def get_services():
@@ -38,19 +66,269 @@ def get_services():
     
     if _embedding_service is None:
         logger.info("Initializing services...")
+        configure_cpu_pool(Config.CPU_POOL_SIZE)
         _embedding_service = get_embedding_service(Config.EMBEDDING_MODEL)
+        if Config.MICRO_BATCH_ENABLED:
+            _embedding_service.enable_micro_batching(
+                max_wait_ms=Config.MICRO_BATCH_MAX_WAIT_MS,
+                max_batch_size=Config.MICRO_BATCH_MAX_SIZE
+            )
+        if Config.EMBEDDING_CACHE_MB > 0:
+            _embedding_service.enable_cache(max_bytes=int(Config.EMBEDDING_CACHE_MB * 1024 * 1024))
+        if Config.ENCODE_PROCESSES > 0:
+            _embedding_service.enable_multiprocess(
+                Config.ENCODE_PROCESSES,
+                threads_per_process=Config.ENCODE_THREADS_PER_PROCESS or None,
+                chunk_size=Config.ENCODE_MP_CHUNK_SIZE,
+                min_texts=Config.ENCODE_MP_MIN_TEXTS
+            )
         _clustering_service = ClusteringService(
             min_cluster_size=Config.MIN_CLUSTER_SIZE,
             min_samples=Config.MIN_SAMPLES
         )
         _dedup_service = DeduplicationService(threshold=Config.DEDUP_THRESHOLD)
         _db_service = DatabaseService()
-        _enrichment_service = EnrichmentService()
+        _enrichment_service = EnrichmentService(
+            max_articles=Config.ENRICH_MAX_ARTICLES,
+            token_budget=Config.ENRICH_TOKEN_BUDGET,
+            snippet_chars=Config.ENRICH_SNIPPET_CHARS
+        )
         logger.info("Services initialized")
     
     return _embedding_service, _clustering_service, _dedup_service, _db_service, _enrichment_service
 
 
+def stream_articles(embedding_service, db_service, days: int, limit: int, claim_as: Optional[str] = None):
+    """
+    Fetch unclustered articles page by page, encoding each page while the
+    previous batch of embeddings is being stored. Articles leased by someone
+    else are skipped; with claim_as, pages are leased for that worker instead
+    of read (sharded runs).
+    Returns (articles, article_ids, embeddings).
+    """
+    encode_batch_size = Config.STREAM_PAGE_SIZE
+    if Config.ENCODE_PROCESSES > 0:
+        # Large enough batches for the multi-process pool
+        encode_batch_size = max(encode_batch_size, Config.ENCODE_MP_MIN_TEXTS)
+
+    if claim_as:
+        page_source = lambda **kwargs: db_service.iter_claimed_articles(
+            claim_as, lease_seconds=Config.CLAIM_LEASE_SECONDS, **kwargs
+        )
+    else:
+        # Articles leased by another replica or the stream worker are theirs
+        page_source = lambda **kwargs: db_service.iter_unclustered_articles(exclude_claimed=True, **kwargs)
+
+    streamer = StreamingEncoder(
+        db_service,
+        embedding_service,
+        page_size=Config.STREAM_PAGE_SIZE,
+        queue_depth=Config.STREAM_QUEUE_DEPTH,
+        encode_batch_size=encode_batch_size,
+        page_source=page_source,
+        prefilter=new_prefilter()
+    )
+    return streamer.run(days=days, limit=limit)
+
+
+def new_prefilter() -> Optional[DuplicatePrefilter]:
+    """Exact/near-exact duplicate detector for one run (PREFILTER_ENABLED)"""
+    if not Config.PREFILTER_ENABLED:
+        return None
+    return DuplicatePrefilter(threshold=Config.PREFILTER_JACCARD)
+
+
+def get_recent_index() -> Optional[RecentEmbeddingIndex]:
+    """Process-wide index of the last RECENT_INDEX_DAYS of embeddings (None if disabled)"""
+    global _recent_index
+    
+    if Config.RECENT_INDEX_DAYS <= 0:
+        return None
+    if _recent_index is None:
+        _, _, _, db_service, _ = get_services()
+        _recent_index = RecentEmbeddingIndex(
+            db_service,
+            days=Config.RECENT_INDEX_DAYS,
+            threshold=Config.DEDUP_THRESHOLD
+        )
+    return _recent_index
+
+
+def get_reenrich_queue() -> Optional[ReenrichmentQueue]:
+    """Drift-triggered re-enrichment of grown clusters (None unless REENRICH_ENABLED)"""
+    global _reenrich_queue
+    
+    if not Config.REENRICH_ENABLED:
+        return None
+    if _reenrich_queue is None:
+        _, _, _, db_service, _ = get_services()
+        _reenrich_queue = ReenrichmentQueue(
+            db_service,
+            growth=Config.REENRICH_GROWTH,
+            drift=Config.REENRICH_DRIFT,
+            debounce_seconds=Config.REENRICH_DEBOUNCE_SECONDS,
+            max_wait_seconds=Config.REENRICH_MAX_WAIT_SECONDS,
+            min_interval_seconds=Config.REENRICH_MIN_INTERVAL_SECONDS,
+            max_articles=Config.ENRICH_MAX_ARTICLES,
+            diversity=Config.ENRICH_DIVERSITY
+        )
+    return _reenrich_queue
+
+
+def get_centroid_index() -> Optional[CentroidIndex]:
+    """Centroid matrix of the recent clusters for /api/find-clusters (None without DATABASE_URL)"""
+    global _centroid_index
+    
+    if _centroid_index is None:
+        if not Config.DATABASE_URL:
+            return None
+        _, _, _, db_service, _ = get_services()
+        _centroid_index = CentroidIndex(
+            db_service,
+            days=Config.CLUSTER_MATCH_DAYS,
+            refresh_seconds=Config.FIND_CLUSTERS_REFRESH_SECONDS
+        )
+    return _centroid_index
+
+
+def get_hierarchy_store() -> Optional[HierarchyStore]:
+    """HDBSCAN tree of the last cluster run, for /api/hierarchy (None if HIERARCHY_DIR is empty)"""
+    global _hierarchy_store
+    
+    if not Config.HIERARCHY_DIR:
+        return None
+    if _hierarchy_store is None:
+        _hierarchy_store = HierarchyStore(Config.HIERARCHY_DIR, min_articles=Config.HIERARCHY_MIN_ARTICLES)
+    return _hierarchy_store
+
+
+def get_blocked_clusterer() -> Optional[BlockedClusterer]:
+    """Per-block HDBSCAN for large windows (None if BLOCKED_MIN_ARTICLES is 0)"""
+    global _blocked_clusterer
+    
+    if Config.BLOCKED_MIN_ARTICLES <= 0:
+        return None
+    if _blocked_clusterer is None:
+        _, clustering_service, _, _, _ = get_services()
+        _blocked_clusterer = BlockedClusterer(
+            clustering_service,
+            min_articles=Config.BLOCKED_MIN_ARTICLES,
+            max_block=Config.BLOCKED_MAX_BLOCK,
+            min_block=Config.BLOCKED_MIN_BLOCK,
+            overlap_hours=Config.BLOCKED_OVERLAP_HOURS,
+            stitch_threshold=Config.BLOCKED_STITCH_THRESHOLD,
+            processes=Config.BLOCKED_PROCESSES
+        )
+    return _blocked_clusterer
+
+
+def get_batch_enricher() -> Optional[BatchEnricher]:
+    """Offline batch enrichment (BATCH_ENRICH_BACKEND); None if "openai" has no API key"""
+    global _batch_enricher
+    
+    if _batch_enricher is None:
+        _, _, _, db_service, enrichment_service = get_services()
+        client = getattr(enrichment_service, "client", None)
+        if Config.BATCH_ENRICH_BACKEND == "local":
+            responder = None
+            if client is not None:
+                responder = lambda body: client.chat.completions.create(**body).choices[0].message.content
+            backend = LocalBatchBackend(
+                os.path.join(Config.BATCH_ENRICH_DIR, "local"),
+                responder,
+                stale_seconds=Config.BATCH_ENRICH_LOCAL_STALE_SECONDS
+            )
+        elif client is not None:
+            backend = OpenAIBatchBackend(client)
+        else:
+            return None
+        _batch_enricher = BatchEnricher(
+            Config.BATCH_ENRICH_DIR,
+            backend,
+            enrichment_service,
+            db_service,
+            reenrich_queue=get_reenrich_queue()
+        )
+    return _batch_enricher
+
+
+def run_reenrichment(limit: Optional[int] = None) -> Dict[str, int]:
+    """Re-enrich queued clusters whose debounce expired ({} when disabled)"""
+    queue = get_reenrich_queue()
+    if queue is None:
+        return {}
+    _, _, _, _, enrichment_service = get_services()
+    try:
+        return queue.process(enrichment_service, limit=limit or Config.REENRICH_BATCH_SIZE)
+    except Exception as e:
+        logger.warning(f"Re-enrichment failed: {e}")
+        return {}
+
+
+def worker_id() -> str:
+    """Identifies this replica/process in article claims"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def new_pipeline(kind: str, days: int, limit: int) -> ClusteringPipeline:
+    """
+    Pipeline for one kind of run ("cluster", "global", "recluster"). Runs with
+    the same kind and parameters share a checkpoint, so a call after an
+    interrupted run resumes it.
+    """
+    _, clustering_service, dedup_service, db_service, enrichment_service = get_services()
+    checkpoint = None
+    if Config.CHECKPOINT_DIR:
+        checkpoint = RunCheckpoint(
+            Config.CHECKPOINT_DIR,
+            f"{kind}-d{days}-l{limit}",
+            max_age=Config.CHECKPOINT_MAX_AGE_SECONDS
+        )
+    return ClusteringPipeline(
+        clustering_service,
+        dedup_service,
+        db_service,
+        enrichment_service,
+        checkpoint=checkpoint,
+        recent_index=get_recent_index(),
+        reenrich_queue=get_reenrich_queue(),
+        batch_enricher=get_batch_enricher() if Config.BATCH_ENRICH_MIN_CLUSTERS > 0 else None,
+        batch_min_clusters=Config.BATCH_ENRICH_MIN_CLUSTERS,
+        hierarchy=get_hierarchy_store(),
+        blocked=get_blocked_clusterer()
+    )
+
+
+def load_unclaimed_embeddings(embedding_service, db_service, days: int, limit: int):
+    """
+    Unclustered articles not leased by any replica, with their stored
+    embeddings (encoding any that are missing).
+    Returns (articles, article_ids, embeddings).
+    """
+    articles = [
+        a
+        for page in db_service.iter_unclustered_articles(
+            days=days, limit=limit, page_size=Config.STREAM_PAGE_SIZE, exclude_claimed=True
+        )
+        for a in page
+    ]
+    if not articles:
+        return [], [], np.array([])
+    annotate_timestamps(articles)
+    
+    article_ids = [a["id"] for a in articles]
+    stored = db_service.get_article_embeddings(article_ids)
+    
+    missing = [a for a in articles if a["id"] not in stored]
+    if missing:
+        missing_ids = [a["id"] for a in missing]
+        missing_embeddings = encode_articles(embedding_service, missing, new_prefilter())
+        db_service.store_article_embeddings_batch(missing_ids, missing_embeddings)
+        stored.update(zip(missing_ids, missing_embeddings))
+    
+    return articles, article_ids, np.vstack([stored[aid] for aid in article_ids])
+
+
 # ==================== ENDPOINTS ====================
 
 @app.route("/health", methods=["GET"])
@@ -59,7 +337,8 @@ def health():
     return jsonify({
         "status": "ok",
         "service": "ml-cluster",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "embedding_cache": _embedding_service.cache_stats() if _embedding_service else None
     })
 
 
@@ -94,39 +373,173 @@ def embed_texts():
 @app.route("/api/similarity", methods=["POST"])
 def calculate_similarity():
     """
-    Calculate similarity between texts.
+    Calculate similarity between texts. All texts are encoded in one batch.
     
-    Body: { "text1": "...", "text2": "..." }
-    Response: { "similarity": 0.85 }
+    Body (one of):
+        { "text1": "...", "text2": "..." }
+        { "pairs": [["a", "b"], ["c", "d"], ...] }
+        { "query": "...", "candidates": ["a", "b", ...] }   (1×N)
+    Response:
+        { "similarity": 0.85, "is_similar": true }               (text1/text2)
+        { "similarities": [0.85, ...], "is_similar": [true, ...] } (pairs, 1×N)
     """
     try:
-        data = request.get_json()
-        text1 = data.get("text1")
-        text2 = data.get("text2")
+        data = request.get_json() or {}
+        embedding_service, _, _, _, _ = get_services()
         
-        if not text1 or not text2:
-            return jsonify({"error": "text1 and text2 required"}), 400
+        if "pairs" in data:
+            pairs = data.get("pairs") or []
+            if not pairs or not all(
+                isinstance(p, (list, tuple)) and len(p) == 2 and p[0] and p[1]
+                for p in pairs
+            ):
+                return jsonify({"error": "pairs must be a non-empty list of [text1, text2]"}), 400
+            
+            embeddings = embedding_service.encode([t for pair in pairs for t in pair])
+            similarities = np.einsum("ij,ij->i", embeddings[0::2], embeddings[1::2])
+        
+        elif "query" in data:
+            query = data.get("query")
+            candidates = data.get("candidates") or []
+            if not query or not candidates:
+                return jsonify({"error": "query and candidates required"}), 400
+            
+            embeddings = embedding_service.encode([query] + list(candidates))
+            similarities = embedding_service.batch_cosine_similarity(embeddings[0], embeddings[1:])
         
-        embedding_service, _, _, _, _ = get_services()
-        emb1 = embedding_service.encode_single(text1)
-        emb2 = embedding_service.encode_single(text2)
-        similarity = embedding_service.cosine_similarity(emb1, emb2)
+        else:
+            text1 = data.get("text1")
+            text2 = data.get("text2")
+            
+            if not text1 or not text2:
+                return jsonify({"error": "text1 and text2 required"}), 400
+            
+            emb1, emb2 = embedding_service.encode([text1, text2])
+            similarity = embedding_service.cosine_similarity(emb1, emb2)
+            
+            return jsonify({
+                "similarity": similarity,
+                "is_similar": similarity >= Config.SIMILARITY_THRESHOLD
+            })
         
+        similarities = [float(s) for s in similarities]
         return jsonify({
-            "similarity": similarity,
-            "is_similar": similarity >= Config.SIMILARITY_THRESHOLD
+            "similarities": similarities,
+            "is_similar": [s >= Config.SIMILARITY_THRESHOLD for s in similarities],
+            "count": len(similarities)
         })
     except Exception as e:
         logger.error(f"Error in similarity: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def run_clustering(days: int, limit: int) -> Dict[str, Any]:
+    """Single-instance run: fetch/encode/store → dedup → match → HDBSCAN → create → enrich"""
+    embedding_service, _, _, db_service, _ = get_services()
+    
+    def fetch():
+        # Obtener artículos sin cluster, generar y guardar embeddings (solapado)
+        logger.info(f"Fetching unclustered articles (last {days} days, limit {limit})")
+        return stream_articles(embedding_service, db_service, days, limit)
+    
+    result = new_pipeline("cluster", days, limit).run(fetch)
+    # Clusters that grew in this or earlier runs and are due for a new analysis
+    reenriched = run_reenrichment()
+    if result is None:
+        return {
+            "message": "No unclustered articles",
+            "created": 0,
+            "updated": 0,
+            "duplicates": 0,
+            **reenriched
+        }
+    
+    return {"message": "Clustering completed", **result, **reenriched}
+
+
+def run_claimed_clustering(days: int, limit: int) -> Dict[str, Any]:
+    """
+    Sharded run (CLUSTER_CLAIMS_ENABLED). Any number of replicas lease
+    batches of new articles, embed them and match them against existing
+    clusters. Then one replica at a time (advisory lock) runs the global
+    stages over everything left unclustered and unleased.
+    """
+    embedding_service, _, dedup_service, db_service, _ = get_services()
+    worker = worker_id()
+    
+    # Embed + match: this replica's share of the new articles
+    articles, article_ids, embeddings = stream_articles(
+        embedding_service, db_service, days, limit, claim_as=worker
+    )
+    updated = linked = 0
+    checked = set()
+    try:
+        if articles:
+            embeddings, kept_ids, _ = dedup_service.deduplicate(embeddings, article_ids)
+            checked.update(kept_ids)
+            recent_index = get_recent_index()
+            assigned = []
+            if recent_index is not None:
+                mask, linked = link_recent_duplicates(db_service, recent_index, kept_ids, embeddings)
+                assigned += [aid for aid, keep in zip(kept_ids, mask) if not keep]
+                kept_ids = [aid for aid, keep in zip(kept_ids, mask) if keep]
+                embeddings = embeddings[mask]
+            mask, updated = match_existing_clusters(db_service, kept_ids, embeddings)
+            assigned += [aid for aid, keep in zip(kept_ids, mask) if not keep]
+            reenrich_queue = get_reenrich_queue()
+            if reenrich_queue is not None and assigned:
+                reenrich_queue.note_articles(assigned)
+    finally:
+        db_service.release_article_claims(worker, article_ids)
+    
+    result = {
+        "embedded": len(articles),
+        "updated": updated,
+        "linked": linked,
+        "created": 0,
+    }
+    
+    # Global stages: dedup, HDBSCAN and cluster creation over the whole window
+    with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+        if not acquired:
+            logger.info("Global stage running on another replica, skipping")
+            return {**result, "message": "Embedding completed; global stage running elsewhere",
+                    "global_stage": "skipped"}
+        
+        # Articles matched above are not looked up again; older leftovers may fit
+        # clusters created since they were embedded
+        global_result = new_pipeline("global", days, Config.CLUSTER_GLOBAL_LIMIT).run(
+            lambda: load_unclaimed_embeddings(
+                embedding_service, db_service, days, Config.CLUSTER_GLOBAL_LIMIT
+            ),
+            skip_match=checked
+        )
+        reenriched = run_reenrichment()
+        if global_result is None:
+            return {**result, **reenriched, "message": "Clustering completed", "processed": 0,
+                    "global_stage": "done"}
+    
+    return {
+        **result,
+        **global_result,
+        **reenriched,
+        "message": "Clustering completed",
+        "updated": updated + global_result["updated"],
+        "linked": linked + global_result["linked"],
+        "global_stage": "done"
+    }
+
+
 @app.route("/api/cluster", methods=["POST"])
 def cluster_articles():
     """
     Main clustering endpoint.
     Processes unclustered articles and groups them.
     
+    Only one run executes the global stages at a time (PostgreSQL advisory
+    lock); a concurrent call gets 409. With CLUSTER_CLAIMS_ENABLED, replicas
+    share the embedding work and the call never waits for the lock.
+    
     Body: { "days": 7, "limit": 500 } (optional)
     Response: { "created": 5, "updated": 10, "duplicates": 3 }
     """
@@ -135,197 +548,15 @@ def cluster_articles():
         days = data.get("days", 7)
         limit = data.get("limit", 500)
         
-        embedding_service, clustering_service, dedup_service, db_service, enrichment_service = get_services()
-        
-        # 1. Obtener artículos sin cluster
-        logger.info(f"Fetching unclustered articles (last {days} days, limit {limit})")
-        articles = db_service.get_unclustered_articles(days=days, limit=limit)
-        
-        if not articles:
-            return jsonify({
-                "message": "No unclustered articles",
-                "created": 0,
-                "updated": 0,
-                "duplicates": 0
-            })
-        
-        logger.info(f"Procesando {len(articles)} artículos")
-        
-        # 2. Preparar textos y generar embeddings
-        article_ids = [a["id"] for a in articles]
-        texts = [
-            embedding_service.prepare_article_text(
-                title=a["title"],
-                snippet=a.get("snippet"),
-                content=a.get("full_content"),
-                countries=a.get("countries"),
-                topics=a.get("topics")
-            )
-            for a in articles
-        ]
-        
-        logger.info("Generando embeddings...")
-        embeddings = embedding_service.encode(texts, show_progress=True)
-        
-        # 3. Guardar embeddings
-        logger.info("Saving embeddings to database...")
-        db_service.store_article_embeddings_batch(article_ids, embeddings)
-        
-        # 4. Deduplicar
-        logger.info("Buscando duplicados...")
-        embeddings, article_ids, duplicates = dedup_service.deduplicate(
-            embeddings, article_ids
-        )
-        
-        # Mapear IDs a artículos
-        articles_map = {a["id"]: a for a in articles}
-        articles = [articles_map[aid] for aid in article_ids]
+        _, _, _, db_service, _ = get_services()
         
-        # 5. Buscar matches con clusters existentes (solo si pgvector está disponible)
-        logger.info("Searching for existing clusters...")
-        updated = 0
-        remaining_mask = [True] * len(article_ids)
-        
-        try:
-            for idx, (aid, emb) in enumerate(zip(article_ids, embeddings)):
-                similar_clusters = db_service.find_similar_clusters(
-                    emb,
-                    threshold=Config.SIMILARITY_THRESHOLD
-                )
-                
-                if similar_clusters:
-                    best_cluster_id, similarity = similar_clusters[0]
-                    logger.info(f"Artículo {aid} → Cluster {best_cluster_id} (sim={similarity:.3f})")
-                    
-                    # Asignar al cluster existente
-                    db_service.update_article_cluster(aid, best_cluster_id)
-                    
-                    remaining_mask[idx] = False
-                    updated += 1
-        except Exception as e:
-            logger.warning(f"Similar cluster search unavailable: {e}")
-            # Continuar sin matching, crear nuevos clusters
-        
-        # 6. Clustering de artículos restantes
-        remaining_embeddings = embeddings[remaining_mask]
-        remaining_ids = [aid for aid, keep in zip(article_ids, remaining_mask) if keep]
-        remaining_articles = [articles_map[aid] for aid in remaining_ids]
-        
-        logger.info(f"Clustering {len(remaining_ids)} remaining articles...")
-        clusters = clustering_service.cluster_embeddings(remaining_embeddings, remaining_ids)
-        
-        # 7. Crear nuevos clusters
-        created = 0
-        for cluster_label, cluster_article_ids in clusters.items():
-            if cluster_label == -1:  # Outliers, no crear cluster
-                continue
-            
-            if len(cluster_article_ids) < 2:
-                continue
-            
-            cluster_articles = [articles_map[aid] for aid in cluster_article_ids]
-            cluster_emb_indices = [article_ids.index(aid) for aid in cluster_article_ids]
-            cluster_embeddings = embeddings[cluster_emb_indices]
-            
-            # Calcular centroide
-            centroid = np.mean(cluster_embeddings, axis=0)
-            centroid = centroid / np.linalg.norm(centroid)
-            
-            # Calcular metadatos
-            dates = [
-                datetime.fromisoformat(a["published_at"].replace("Z", "+00:00"))
-                for a in cluster_articles
-                if a.get("published_at")
-            ]
-            
-            if not dates:
-                dates = [datetime.utcnow()]
-            
-            window_start = min(dates).isoformat()
-            window_end = max(dates).isoformat()
-            
-            # Agregar países y topics
-            countries = list(set(
-                c for a in cluster_articles
-                for c in (a.get("countries") or [])
-            ))[:10]
-            
-            topics = list(set(
-                t for a in cluster_articles
-                for t in (a.get("topics") or [])
-            ))[:10]
-            
-            # Canonical title (use first article's for now)
-            canonical_title = cluster_articles[0]["title"]
-            
-            # Count unique sources
-            sources = set(a.get("source_id") for a in cluster_articles if a.get("source_id"))
-            
-            # Calculate severity and confidence
-            severity = min(100, 30 + len(cluster_article_ids) * 10 + len(sources) * 5)
-            confidence = min(100, 40 + len(cluster_article_ids) * 8 + len(sources) * 6)
-            
-            # Crear cluster
-            new_cluster = db_service.create_cluster(
-                canonical_title=canonical_title,
-                summary=f"Event covered by {len(cluster_article_ids)} articles from {len(sources)} sources",
-                countries=countries,
-                topics=topics,
-                article_count=len(cluster_article_ids),
-                source_count=len(sources),
-                window_start=window_start,
-                window_end=window_end,
-                severity=severity,
-                confidence=confidence,
-                embedding=centroid
-            )
-            
-            if new_cluster:
-                # Asignar artículos al cluster
-                db_service.update_articles_cluster(cluster_article_ids, new_cluster["id"])
-                
-                # Enrich with GPT
-                try:
-                    enrichment = enrichment_service.enrich_cluster(new_cluster, cluster_articles)
-                    if enrichment:
-                        # Update cluster with enriched data
-                        update_data = {
-                            "canonical_title": enrichment.get("canonical_title", canonical_title),
-                            "summary": enrichment.get("summary", ""),
-                            "countries": enrichment.get("countries", countries),
-                            "topics": enrichment.get("topics", topics),
-                            "severity": enrichment.get("severity", severity),
-                            "confidence": enrichment.get("confidence", confidence),
-                            "entities": {
-                                "people": enrichment.get("entities", {}).get("people", []),
-                                "organizations": enrichment.get("entities", {}).get("organizations", []),
-                                "locations": enrichment.get("entities", {}).get("locations", []),
-                                "events": enrichment.get("entities", {}).get("events", []),
-                                "geopolitical_implications": enrichment.get("geopolitical_implications", []),
-                                "key_signals": enrichment.get("key_signals", []),
-                                "market_impact": enrichment.get("market_impact"),
-                                "map_data": enrichment.get("map_data")
-                            }
-                        }
-                        db_service.update_cluster(new_cluster["id"], update_data)
-                        logger.info(f"✓ Cluster {new_cluster['id']} enriquecido con GPT")
-                    else:
-                        logger.warning(f"⚠ No se pudo enriquecer cluster {new_cluster['id']}")
-                except Exception as e:
-                    logger.error(f"Error enriching cluster {new_cluster.get('id')}: {e}", exc_info=True)
-                    # Continue even if enrichment fails
-                
-                created += 1
-                logger.info(f"Created cluster: {canonical_title[:50]}... ({len(cluster_article_ids)} articles)")
-        
-        result = {
-            "message": "Clustering completed",
-            "processed": len(articles),
-            "created": created,
-            "updated": updated,
-            "duplicates": len(duplicates),
-            "outliers": len(clusters.get(-1, []))
-        }
+        if Config.CLUSTER_CLAIMS_ENABLED:
+            result = run_claimed_clustering(days, limit)
+        else:
+            with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+                if not acquired:
+                    return jsonify({"error": "A cluster run is already in progress"}), 409
+                result = run_clustering(days, limit)
         
         logger.info(f"Resultado: {result}")
         return jsonify(result)
@@ -340,6 +571,10 @@ def deduplicate():
     """
     Find and mark duplicate articles.
     
+    Uses the stored article embeddings (only articles without one are
+    encoded) and the pairs cached by the recent-embeddings index; only the
+    articles outside the index window are compared, against all the others.
+    
     Body: { "days": 7, "limit": 500 }
     Response: { "duplicates": [{"id1": "...", "id2": "...", "similarity": 0.95}] }
     """
@@ -356,20 +591,36 @@ def deduplicate():
         if len(articles) < 2:
             return jsonify({"duplicates": []})
         
-        # Generar embeddings
+        # Embeddings guardados; codificar solo los que faltan
         article_ids = [a["id"] for a in articles]
-        texts = [
-            embedding_service.prepare_article_text(
-                title=a["title"],
-                snippet=a.get("snippet")
-            )
-            for a in articles
-        ]
-        
-        embeddings = embedding_service.encode(texts)
-        
-        # Encontrar duplicados
-        duplicates = dedup_service.find_duplicates(embeddings, article_ids)
+        stored = db_service.get_article_embeddings(article_ids)
+        missing = [a for a in articles if a["id"] not in stored]
+        if missing:
+            missing_ids = [a["id"] for a in missing]
+            missing_embeddings = encode_articles(embedding_service, missing, new_prefilter())
+            db_service.store_article_embeddings_batch(missing_ids, missing_embeddings)
+            stored.update(zip(missing_ids, missing_embeddings))
+        
+        # Encontrar duplicados: pares cacheados del índice, y solo los artículos
+        # fuera de él comparados con el resto
+        recent_index = get_recent_index()
+        if recent_index is not None:
+            recent_index.refresh()
+            duplicates, outside = recent_index.duplicate_pairs(article_ids)
+        else:
+            duplicates, outside = [], article_ids
+        if outside:
+            embeddings = np.vstack([stored[aid] for aid in article_ids])
+            if len(outside) == len(article_ids):
+                duplicates = dedup_service.find_duplicates(embeddings, article_ids)
+            else:
+                position = {aid: i for i, aid in enumerate(article_ids)}
+                duplicates = sorted(
+                    duplicates + dedup_service.find_duplicates_of(
+                        embeddings, article_ids, [position[aid] for aid in outside]
+                    ),
+                    key=lambda d: (position[d[0]], position[d[1]])
+                )
         
         return jsonify({
             "duplicates": [
@@ -430,6 +681,102 @@ def find_cluster_for_article():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/find-clusters", methods=["POST"])
+def find_clusters_for_articles():
+    """
+    Batch version of /api/find-cluster for ingest pipelines: all articles are
+    encoded in one pass and matched against the recent cluster centroids with
+    one matrix product.
+    
+    Body: {
+        "articles": [{ "id": "...", "title": "...", "snippet": "...", "full_content": "...",
+                       "countries": [...], "topics": [...] }],
+        "alternatives": 4,   # extra candidates per article
+        "persist": false     # assign matched articles and store their embeddings (ids required)
+    }
+    Response: {
+        "results": [{ "id": "...", "cluster_id": "..." | null, "similarity": 0.85, "alternatives": [...] }],
+        "count": N, "matched": M, "persisted": P
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        articles = data.get("articles")
+        alternatives = int(data.get("alternatives", 4))
+        persist = bool(data.get("persist", False))
+        
+        if not isinstance(articles, list) or not articles:
+            return jsonify({"error": "articles must be a non-empty list"}), 400
+        if len(articles) > Config.FIND_CLUSTERS_MAX_ARTICLES:
+            return jsonify({
+                "error": f"at most {Config.FIND_CLUSTERS_MAX_ARTICLES} articles per request"
+            }), 400
+        if not all(isinstance(a, dict) and a.get("title") for a in articles):
+            return jsonify({"error": "every article needs a title"}), 400
+        if persist and not all(a.get("id") for a in articles):
+            return jsonify({"error": "persist requires an id for every article"}), 400
+        alternatives = max(0, min(alternatives, 20))
+        
+        embedding_service, _, _, db_service, _ = get_services()
+        
+        # Same text as the clustering runs, so persisted vectors are interchangeable
+        embeddings = embedding_service.encode(article_texts(embedding_service, articles), use_cache=False)
+        
+        centroids = get_centroid_index()
+        if centroids is not None:
+            centroids.refresh()
+            hits = centroids.top(embeddings, alternatives + 1, Config.SIMILARITY_THRESHOLD)
+        else:
+            # Sin DATABASE_URL: una llamada RPC por artículo
+            hits = [
+                db_service.find_similar_clusters(
+                    embedding,
+                    threshold=Config.SIMILARITY_THRESHOLD,
+                    limit=alternatives + 1
+                )
+                for embedding in embeddings
+            ]
+        
+        results = []
+        by_cluster: Dict[str, list] = {}
+        for article, similar in zip(articles, hits):
+            result = {"id": article.get("id"), "cluster_id": None, "similarity": 0, "alternatives": []}
+            if similar:
+                result.update({
+                    "cluster_id": similar[0][0],
+                    "similarity": similar[0][1],
+                    "alternatives": [
+                        {"cluster_id": c[0], "similarity": c[1]}
+                        for c in similar[1:]
+                    ]
+                })
+                by_cluster.setdefault(similar[0][0], []).append(article.get("id"))
+            results.append(result)
+        
+        persisted = 0
+        if persist and by_cluster:
+            # Only for assigned articles: the rest are encoded by the next cluster run
+            rows = [i for i, result in enumerate(results) if result["cluster_id"]]
+            db_service.store_article_embeddings_batch([articles[i]["id"] for i in rows], embeddings[rows])
+            for cluster_id, article_ids in by_cluster.items():
+                db_service.update_articles_cluster(article_ids, cluster_id)
+                persisted += len(article_ids)
+            reenrich_queue = get_reenrich_queue()
+            if reenrich_queue is not None and persisted:
+                reenrich_queue.note_articles([aid for ids in by_cluster.values() for aid in ids])
+        
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "matched": sum(len(ids) for ids in by_cluster.values()),
+            "persisted": persisted
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in find-clusters: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/reset-clusters", methods=["POST"])
 def reset_clusters():
     """
@@ -451,25 +798,10 @@ def reset_clusters():
         
         logger.warning("⚠️ RESET CLUSTERS: Clearing all clusters...")
         
-        # 1. Desasignar todos los artículos usando Supabase client
+        # 1. Desasignar todos los artículos
         logger.info("Unassigning articles from clusters...")
         try:
-            # Get all articles with non-null cluster_id
-            articles_response = db_service.supabase.table("articles").select("id").not_.is_("cluster_id", "null").limit(10000).execute()
-            article_ids = [a["id"] for a in (articles_response.data or [])]
-            
-            articles_unlinked = 0
-            if article_ids:
-                # Update in smaller batches (long URLs cause 400 errors)
-                BATCH_SIZE = 50
-                for i in range(0, len(article_ids), BATCH_SIZE):
-                    batch = article_ids[i:i + BATCH_SIZE]
-                    try:
-                        db_service.supabase.table("articles").update({"cluster_id": None}).in_("id", batch).execute()
-                        articles_unlinked += len(batch)
-                    except Exception as e:
-                        logger.warning(f"Error actualizando batch {i//BATCH_SIZE + 1}: {e}")
-                        # Continuar con el siguiente batch
+            articles_unlinked = db_service.unassign_all_articles()
         except Exception as e:
             logger.error(f"Error unassigning articles: {e}")
             articles_unlinked = 0
@@ -477,22 +809,7 @@ def reset_clusters():
         # 2. Delete all clusters
         logger.info("Deleting clusters...")
         try:
-            # Get all cluster IDs first
-            clusters_response = db_service.supabase.table("clusters").select("id").execute()
-            cluster_ids = [c["id"] for c in (clusters_response.data or [])]
-            
-            clusters_deleted = 0
-            if cluster_ids:
-                # Delete in smaller batches (long URLs cause 400 errors)
-                BATCH_SIZE = 50
-                for i in range(0, len(cluster_ids), BATCH_SIZE):
-                    batch = cluster_ids[i:i + BATCH_SIZE]
-                    try:
-                        db_service.supabase.table("clusters").delete().in_("id", batch).execute()
-                        clusters_deleted += len(batch)
-                    except Exception as e:
-                        logger.warning(f"Error deleting batch {i//BATCH_SIZE + 1}: {e}")
-                        # Continuar con el siguiente batch
+            clusters_deleted = db_service.delete_all_clusters()
         except Exception as e:
             logger.error(f"Error borrando clusters: {e}")
             clusters_deleted = 0
@@ -502,8 +819,7 @@ def reset_clusters():
         cluster_embeddings_deleted = 0
         try:
             if Config.DATABASE_URL:
-                conn = db_service._get_pg_connection()
-                with conn.cursor() as cur:
+                with db_service.pg_connection() as conn, conn.cursor() as cur:
                     cur.execute("DELETE FROM cluster_embeddings")
                     cluster_embeddings_deleted = cur.rowcount
                     conn.commit()
@@ -520,8 +836,7 @@ def reset_clusters():
             logger.info("Deleting article embeddings...")
             try:
                 if Config.DATABASE_URL:
-                    conn = db_service._get_pg_connection()
-                    with conn.cursor() as cur:
+                    with db_service.pg_connection() as conn, conn.cursor() as cur:
                         cur.execute("DELETE FROM article_embeddings")
                         article_embeddings_deleted = cur.rowcount
                         conn.commit()
@@ -552,7 +867,8 @@ def recluster():
     Body: { 
         "days": 30,  # Días hacia atrás para buscar artículos
         "limit": 1000,  # Máximo de artículos a procesar
-        "reset_first": true  # Si true, limpia clusters primero
+        "reset_first": true,  # Si true, limpia clusters primero
+        "batch_enrich": false  # Si true, enriquecimiento offline (ver /api/enrichment-jobs)
     }
     """
     try:
@@ -560,219 +876,318 @@ def recluster():
         days = data.get("days", 30)
         limit = data.get("limit", 1000)
         reset_first = data.get("reset_first", True)
+        batch_enrich = data.get("batch_enrich", False)
         
-        embedding_service, clustering_service, dedup_service, db_service, enrichment_service = get_services()
+        embedding_service, _, _, db_service, _ = get_services()
         
-        # Step 1: Reset if requested
-        if reset_first:
-            logger.info("Clearing existing clusters...")
-            try:
-                # Desasignar todos los artículos usando Supabase client
-                # Get articles with non-null cluster_id
-                articles_response = db_service.supabase.table("articles").select("id").not_.is_("cluster_id", "null").limit(10000).execute()
-                article_ids = [a["id"] for a in (articles_response.data or [])]
-                
-                articles_unlinked = 0
-                if article_ids:
-                    # Smaller batch to avoid URLs that are too long
-                    BATCH_SIZE = 50  # Reducido para evitar URLs demasiado largas
-                    for i in range(0, len(article_ids), BATCH_SIZE):
-                        batch = article_ids[i:i + BATCH_SIZE]
-                        try:
-                            db_service.supabase.table("articles").update({"cluster_id": None}).in_("id", batch).execute()
-                            articles_unlinked += len(batch)
-                        except Exception as e:
-                            logger.warning(f"Error actualizando batch {i//BATCH_SIZE + 1}: {e}")
-                            # Continuar con el siguiente batch
-                
-                # Delete all clusters
-                clusters_response = db_service.supabase.table("clusters").select("id").execute()
-                cluster_ids = [c["id"] for c in (clusters_response.data or [])]
-                
-                clusters_deleted = 0
-                if cluster_ids:
-                    # Smaller batch to avoid URLs that are too long
-                    BATCH_SIZE = 50  # Reducido para evitar URLs demasiado largas
-                    for i in range(0, len(cluster_ids), BATCH_SIZE):
-                        batch = cluster_ids[i:i + BATCH_SIZE]
-                        try:
-                            db_service.supabase.table("clusters").delete().in_("id", batch).execute()
-                            clusters_deleted += len(batch)
-                        except Exception as e:
-                            logger.warning(f"Error deleting batch {i//BATCH_SIZE + 1}: {e}")
-                            # Continuar con el siguiente batch
-                
-                # Delete cluster embeddings (optional)
+        with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+            if not acquired:
+                return jsonify({"error": "A cluster run is already in progress"}), 409
+            
+            pipeline = new_pipeline("recluster", days, limit)
+            if batch_enrich:
+                pipeline.batch_enricher = get_batch_enricher()
+                pipeline.batch_min_clusters = 1
+            resuming = pipeline.checkpoint is not None and pipeline.checkpoint.last_stage is not None
+            
+            # Step 1: Reset if requested (not when resuming an interrupted
+            # recluster: it would delete the clusters that run already created)
+            if reset_first and not resuming:
+                logger.info("Clearing existing clusters...")
                 try:
-                    if Config.DATABASE_URL:
-                        conn = db_service._get_pg_connection()
-                        with conn.cursor() as cur:
-                            cur.execute("DELETE FROM cluster_embeddings")
-                            conn.commit()
+                    articles_unlinked = db_service.unassign_all_articles()
+                    clusters_deleted = db_service.delete_all_clusters()
+            
+                    # Delete cluster embeddings (optional)
+                    try:
+                        if Config.DATABASE_URL:
+                            with db_service.pg_connection() as conn, conn.cursor() as cur:
+                                cur.execute("DELETE FROM cluster_embeddings")
+                                conn.commit()
+                    except Exception as e:
+                        logger.warning(f"Could not delete embeddings (puede ser normal): {e}")
+            
+                    logger.info(f"✓ Reset: {clusters_deleted} clusters deleted, {articles_unlinked} articles unassigned")
                 except Exception as e:
-                    logger.warning(f"Could not delete embeddings (puede ser normal): {e}")
-                
-                logger.info(f"✓ Reset: {clusters_deleted} clusters deleted, {articles_unlinked} articles unassigned")
-            except Exception as e:
-                logger.error(f"Error en reset: {e}", exc_info=True)
-                return jsonify({"error": f"Error en reset: {str(e)}"}), 500
+                    logger.error(f"Error en reset: {e}", exc_info=True)
+                    return jsonify({"error": f"Error en reset: {str(e)}"}), 500
+            
+            # Step 2: Run full clustering
+            logger.info(f"Running ML clustering (last {days} days, limit {limit})...")
+            
+            # Get ALL unclustered articles (or all if reset_first was True),
+            # encoding and storing embeddings as pages arrive. No matching:
+            # every article goes through HDBSCAN
+            result = pipeline.run(
+                lambda: stream_articles(embedding_service, db_service, days, limit),
+                match=False
+            )
+            
+            if result is None:
+                return jsonify({
+                    "message": "No articles to cluster",
+                    "processed": 0,
+                    "created": 0,
+                    "updated": 0
+                })
+        
+        result.pop("updated", None)
+        result.pop("linked", None)
+        result = {"message": "Reclustering completed", **result}
         
-        # Step 2: Run full clustering
-        logger.info(f"Running ML clustering (last {days} days, limit {limit})...")
+        logger.info(f"✓ Reclustering: {result}")
+        return jsonify(result)
         
-            # Get ALL unclustered articles (or all if reset_first was True)
-        articles = db_service.get_unclustered_articles(days=days, limit=limit)
+    except Exception as e:
+        logger.error(f"Error in recluster: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/merge-clusters", methods=["POST"])
+def merge_clusters():
+    """
+    Merge clusters that split the same story across runs (maintenance job,
+    on demand or from a cron). Requires DATABASE_URL.
+    
+    Body: { "threshold": 0.9, "days": 7, "dry_run": false } (all optional)
+    Response: { "clusters": 420, "groups": 12, "removed": 15, "articles_moved": 83 }
+    """
+    try:
+        data = request.get_json() or {}
+        if not Config.DATABASE_URL:
+            return jsonify({"error": "Merging clusters requires DATABASE_URL"}), 400
+        
+        _, _, _, db_service, _ = get_services()
+        merger = ClusterMerger(
+            db_service,
+            threshold=float(data.get("threshold", Config.MERGE_THRESHOLD)),
+            days=int(data.get("days", Config.MERGE_DAYS)),
+            block_size=Config.MERGE_BLOCK_SIZE,
+            reenrich_queue=get_reenrich_queue()
+        )
         
-        if not articles:
-            return jsonify({
-                "message": "No articles to cluster",
-                "processed": 0,
-                "created": 0,
-                "updated": 0
-            })
+        # Same lock as cluster runs: a run could assign articles to a cluster being deleted
+        with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+            if not acquired:
+                return jsonify({"error": "A cluster run is already in progress"}), 409
+            result = merger.run(dry_run=bool(data.get("dry_run", False)))
         
-        logger.info(f"Procesando {len(articles)} artículos...")
+        if result["removed"] and not result["dry_run"] and _centroid_index is not None:
+            _centroid_index.invalidate()
+        return jsonify(result)
         
-        # Preparar textos y generar embeddings
-        article_ids = [a["id"] for a in articles]
-        texts = [
-            embedding_service.prepare_article_text(
-                title=a["title"],
-                snippet=a.get("snippet"),
-                content=a.get("full_content"),
-                countries=a.get("countries"),
-                topics=a.get("topics")
-            )
-            for a in articles
+    except Exception as e:
+        logger.error(f"Error in merge-clusters: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/resplit-clusters", methods=["POST"])
+def resplit_clusters():
+    """
+    Split active clusters whose members drifted apart (dispersion above the
+    threshold) by re-running HDBSCAN on their members only, instead of
+    /api/recluster with reset_first. Requires DATABASE_URL.
+    
+    Body: { "max_dispersion": 0.3, "min_size": 6, "days": 7, "dry_run": false } (all optional)
+    Response: { "clusters": 420, "wide": 5, "split": 3, "created": 4, "unassigned": 7 }
+    """
+    try:
+        data = request.get_json() or {}
+        if not Config.DATABASE_URL:
+            return jsonify({"error": "Re-splitting clusters requires DATABASE_URL"}), 400
+        
+        _, clustering_service, _, db_service, enrichment_service = get_services()
+        resplitter = ClusterResplitter(
+            db_service,
+            clustering_service,
+            enrichment_service,
+            max_dispersion=float(data.get("max_dispersion", Config.RESPLIT_DISPERSION)),
+            min_size=int(data.get("min_size", Config.RESPLIT_MIN_SIZE)),
+            days=int(data.get("days", Config.RESPLIT_DAYS)),
+            reenrich_queue=get_reenrich_queue()
+        )
+        
+        with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+            if not acquired:
+                return jsonify({"error": "A cluster run is already in progress"}), 409
+            result = resplitter.run(dry_run=bool(data.get("dry_run", False)))
+        
+        if result["split"] and _centroid_index is not None:
+            _centroid_index.invalidate()
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Error in resplit-clusters: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/hierarchy", methods=["GET"])
+def hierarchy_view():
+    """
+    Flat clusters of the last cluster run at another granularity, re-cut from
+    its cached HDBSCAN tree (no embeddings, no HDBSCAN run).
+    
+    Query: ?min_cluster_size=5&epsilon=0.0&method=eom|leaf&with_clusters=0
+    Response: {
+        "run": { "created_at": ..., "articles": 1200, "min_cluster_size": 2, "min_samples": 1 },
+        "clusters": [{ "label": 0, "size": 40, "stability": 0.12, "article_ids": [...] }],
+        "outliers": 85
+    }
+    with_clusters=1 adds the stored clusters of each group's articles ({cluster_id: count}).
+    """
+    try:
+        store = get_hierarchy_store()
+        if store is None:
+            return jsonify({"error": "Hierarchy cache is disabled (HIERARCHY_DIR)"}), 400
+        
+        min_cluster_size = request.args.get("min_cluster_size", type=int)
+        epsilon = request.args.get("epsilon", 0.0, type=float)
+        method = request.args.get("method", "eom")
+        try:
+            view = store.cut(min_cluster_size=min_cluster_size, epsilon=epsilon, method=method)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if view is None:
+            return jsonify({"error": "No clustering hierarchy cached yet; run /api/cluster or /api/recluster"}), 404
+        
+        groups = labels_to_clusters(view["labels"], view["article_ids"])
+        outliers = groups.pop(-1, [])
+        clusters = [
+            {
+                "label": label,
+                "size": len(article_ids),
+                "stability": view["stability"].get(label),
+                "article_ids": article_ids
+            }
+            for label, article_ids in sorted(groups.items(), key=lambda g: -len(g[1]))
         ]
         
-        logger.info("Generando embeddings...")
-        embeddings = embedding_service.encode(texts, show_progress=True)
+        if request.args.get("with_clusters", "0") == "1":
+            _, _, _, db_service, _ = get_services()
+            stored = db_service.get_article_clusters(view["article_ids"])
+            for cluster in clusters:
+                counts: Dict[str, int] = {}
+                for aid in cluster["article_ids"]:
+                    if stored.get(aid):
+                        counts[stored[aid]] = counts.get(stored[aid], 0) + 1
+                cluster["clusters"] = counts
         
-        # Guardar embeddings
-        logger.info("Guardando embeddings...")
-        db_service.store_article_embeddings_batch(article_ids, embeddings)
+        return jsonify({
+            "run": view["meta"],
+            "min_cluster_size": min_cluster_size or view["meta"]["min_cluster_size"],
+            "epsilon": epsilon,
+            "method": method,
+            "clusters": clusters,
+            "outliers": len(outliers)
+        })
         
-        # Deduplicar
-        logger.info("Buscando duplicados...")
-        embeddings, article_ids, duplicates = dedup_service.deduplicate(
-            embeddings, article_ids
-        )
+    except Exception as e:
+        logger.error(f"Error in hierarchy: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/reenrich", methods=["POST"])
+def reenrich():
+    """
+    Re-enrich clusters queued because they grew or drifted since their last
+    GPT analysis and whose debounce period has expired. Cluster runs do this
+    too; the endpoint is for a cron between runs.
+    
+    Body: { "limit": 20 } (optional)
+    Response: { "reenriched": 3, "failed": 0 }
+    """
+    try:
+        if not Config.REENRICH_ENABLED:
+            return jsonify({"error": "Re-enrichment is disabled (REENRICH_ENABLED=0)"}), 400
         
-        articles_map = {a["id"]: a for a in articles}
-        articles = [articles_map[aid] for aid in article_ids]
+        data = request.get_json() or {}
+        result = run_reenrichment(limit=data.get("limit"))
+        return jsonify({"reenriched": 0, "failed": 0, **result})
         
-        # Clustering
-        logger.info(f"Clustering {len(article_ids)} artículos...")
-        clusters = clustering_service.cluster_embeddings(embeddings, article_ids)
+    except Exception as e:
+        logger.error(f"Error in reenrich: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/enrichment-jobs/<job_id>", methods=["GET"])
+def enrichment_job(job_id: str):
+    """
+    State of an offline enrichment job (enrich_job in a cluster/recluster
+    response). Results are applied to the clusters the first time the batch
+    is found complete.
+    
+    Response: { "job_id": "...", "status": "submitted|applied|failed", "clusters": 120, "enriched": 118 }
+    """
+    try:
+        batch_enricher = get_batch_enricher()
+        job = batch_enricher.poll(job_id) if batch_enricher else None
+        if job is None:
+            return jsonify({"error": "Enrichment job not found"}), 404
+        return jsonify(job)
         
-        # Crear clusters
-        created = 0
-        for cluster_label, cluster_article_ids in clusters.items():
-            if cluster_label == -1 or len(cluster_article_ids) < 2:
-                continue
-            
-            cluster_articles = [articles_map[aid] for aid in cluster_article_ids]
-            cluster_emb_indices = [article_ids.index(aid) for aid in cluster_article_ids]
-            cluster_embeddings = embeddings[cluster_emb_indices]
-            
-            # Calcular centroide
-            centroid = np.mean(cluster_embeddings, axis=0)
-            centroid = centroid / np.linalg.norm(centroid)
-            
-            # Metadata
-            dates = [
-                datetime.fromisoformat(a["published_at"].replace("Z", "+00:00"))
-                for a in cluster_articles
-                if a.get("published_at")
-            ]
-            
-            if not dates:
-                dates = [datetime.utcnow()]
-            
-            window_start = min(dates).isoformat()
-            window_end = max(dates).isoformat()
-            
-            countries = list(set(
-                c for a in cluster_articles
-                for c in (a.get("countries") or [])
-            ))[:10]
-            
-            topics = list(set(
-                t for a in cluster_articles
-                for t in (a.get("topics") or [])
-            ))[:10]
-            
-            canonical_title = cluster_articles[0]["title"]
-            sources = set(a.get("source_id") for a in cluster_articles if a.get("source_id"))
-            
-            severity = min(100, 30 + len(cluster_article_ids) * 10 + len(sources) * 5)
-            confidence = min(100, 40 + len(cluster_article_ids) * 8 + len(sources) * 6)
-            
-            # Create initial cluster
-            new_cluster = db_service.create_cluster(
-                canonical_title=canonical_title,
-                summary=f"Event covered by {len(cluster_article_ids)} articles from {len(sources)} sources",
-                countries=countries,
-                topics=topics,
-                article_count=len(cluster_article_ids),
-                source_count=len(sources),
-                window_start=window_start,
-                window_end=window_end,
-                severity=severity,
-                confidence=confidence,
-                embedding=centroid
-            )
-            
-            if new_cluster:
-                db_service.update_articles_cluster(cluster_article_ids, new_cluster["id"])
-                
-                # Enrich with GPT
-                try:
-                    enrichment = enrichment_service.enrich_cluster(new_cluster, cluster_articles)
-                    if enrichment:
-                        # Update cluster with enriched data
-                        update_data = {
-                            "canonical_title": enrichment.get("canonical_title", canonical_title),
-                            "summary": enrichment.get("summary", ""),
-                            "countries": enrichment.get("countries", countries),
-                            "topics": enrichment.get("topics", topics),
-                            "severity": enrichment.get("severity", severity),
-                            "confidence": enrichment.get("confidence", confidence),
-                            "entities": {
-                                "people": enrichment.get("entities", {}).get("people", []),
-                                "organizations": enrichment.get("entities", {}).get("organizations", []),
-                                "locations": enrichment.get("entities", {}).get("locations", []),
-                                "events": enrichment.get("entities", {}).get("events", []),
-                                "geopolitical_implications": enrichment.get("geopolitical_implications", []),
-                                "key_signals": enrichment.get("key_signals", []),
-                                "market_impact": enrichment.get("market_impact"),
-                                "map_data": enrichment.get("map_data")
-                            }
-                        }
-                        db_service.update_cluster(new_cluster["id"], update_data)
-                        logger.info(f"✓ Cluster {new_cluster['id']} enriquecido con GPT")
-                    else:
-                        logger.warning(f"⚠ No se pudo enriquecer cluster {new_cluster['id']}")
-                except Exception as e:
-                    logger.error(f"Error enriching cluster {new_cluster.get('id')}: {e}", exc_info=True)
-                    # Continue even if enrichment fails
-                
-                created += 1
-        
-        result = {
-            "message": "Reclustering completed",
-            "processed": len(articles),
-            "created": created,
-            "duplicates": len(duplicates),
-            "outliers": len(clusters.get(-1, []))
-        }
+    except Exception as e:
+        logger.error(f"Error in enrichment-job: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/enrichment-jobs/poll", methods=["POST"])
+def poll_enrichment_jobs():
+    """
+    Poll every pending offline enrichment job and apply finished ones (cron).
+    
+    Response: { "jobs": [...] }
+    """
+    try:
+        batch_enricher = get_batch_enricher()
+        return jsonify({"jobs": batch_enricher.poll_all() if batch_enricher else []})
         
-        logger.info(f"✓ Reclustering: {result}")
-        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error polling enrichment jobs: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/export", methods=["GET"])
+def export_embeddings():
+    """
+    Stream article embeddings, cluster assignments and metadata for a window
+    as Arrow IPC or Parquet (requires DATABASE_URL and pyarrow).
+    
+    Query: ?days=7&format=arrow|parquet&clustered_only=0
+    Response: one row per article; `embedding` is a fixed-size float32 list
+    """
+    try:
+        days = int(request.args.get("days", 7))
+        fmt = request.args.get("format", "arrow")
+        clustered_only = request.args.get("clustered_only", "0") == "1"
+        
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        if not Config.DATABASE_URL:
+            return jsonify({"error": "Export requires DATABASE_URL"}), 400
+        
+        _, _, _, db_service, _ = get_services()
+        pages = db_service.iter_article_embeddings(
+            days=days,
+            page_size=Config.EXPORT_PAGE_SIZE,
+            clustered_only=clustered_only
+        )
+        chunks = stream_export(pages, Config.EMBEDDING_DIM, fmt)
+        # Primer chunk antes de responder: errores de pyarrow/SQL todavía dan 500
+        first = next(chunks)
+        
+        def generate():
+            yield first
+            yield from chunks
+        
+        extension = "arrow" if fmt == "arrow" else "parquet"
+        return Response(
+            generate(),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename=embeddings-{days}d.{extension}"}
+        )
         
     except Exception as e:
-        logger.error(f"Error in recluster: {e}", exc_info=True)
+        logger.error(f"Error in export: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
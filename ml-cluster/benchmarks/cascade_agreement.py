@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark: throughput and decision agreement of the two-tier model cascade.
+
+Reads the articles published in the last --days (default: three) from
+Supabase, or a JSON export (list of article rows with cluster_id) with
+--articles, and splits them by time: the newest --probe share are the "new"
+articles and the rest, through their stored cluster_id, give each cluster a
+centroid in both models' spaces. Every new article is then decided as the
+stream worker would:
+
+- primary only: best EMBEDDING_MODEL similarity >= --threshold → that cluster,
+  otherwise no cluster (left for HDBSCAN);
+- cascade: best CASCADE_MODEL similarity >= cutoff → that cluster,
+  otherwise the primary-only decision.
+
+For each cutoff it reports the share of articles settled by the cascade
+model, the agreement with the primary-only decisions (overall and among the
+settled ones) and the effective encode throughput, from the measured texts/s
+of each model. The suggested CASCADE_THRESHOLD is the lowest cutoff whose
+settled articles agree at least --min-agreement of the time.
+
+Examples:
+    python benchmarks/cascade_agreement.py --fast-model sentence-transformers/static-similarity-mrl-multilingual-v1
+    python benchmarks/cascade_agreement.py --articles feed.json --cutoffs 0.8,0.85,0.9 --output cascade.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import Config
+from services.embeddings import EmbeddingService
+from services.prefilter import article_texts
+
+FIELDS = "id,title,snippet,full_content,countries,topics,published_at,cluster_id"
+
+
+def fetch_articles(days: int, limit: int, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Articles published in the last `days`, with their cluster (if any)"""
+    from supabase import create_client
+
+    client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    articles: List[Dict[str, Any]] = []
+    while len(articles) < limit:
+        size = min(page_size, limit - len(articles))
+        page = client.table("articles") \
+            .select(FIELDS) \
+            .gte("published_at", cutoff) \
+            .order("published_at") \
+            .order("id") \
+            .range(len(articles), len(articles) + size - 1) \
+            .execute().data or []
+        articles.extend(page)
+        if len(page) < size:
+            break
+    return articles
+
+
+def load_model(name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name, device="cpu")
+
+
+def encode(model, texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    """Embeddings in micro-batches of batch_size, and texts/s"""
+    model.encode(texts[:batch_size], show_progress_bar=False, normalize_embeddings=True)  # warm up
+    start = time.perf_counter()
+    embeddings = np.vstack([
+        model.encode(
+            texts[i:i + batch_size], show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True
+        )
+        for i in range(0, len(texts), batch_size)
+    ]).astype(np.float32)
+    return embeddings, len(texts) / (time.perf_counter() - start)
+
+
+def centroids(cluster_ids: List[str], embeddings: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Normalized mean vector per cluster"""
+    ids = sorted(set(cluster_ids))
+    position = {cid: i for i, cid in enumerate(ids)}
+    sums = np.zeros((len(ids), embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sums, [position[cid] for cid in cluster_ids], embeddings)
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    return ids, (sums / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+def best_matches(embeddings: np.ndarray, ids: List[str], matrix: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Most similar cluster of each row and its similarity"""
+    sims = embeddings @ matrix.T
+    best = sims.argmax(axis=1)
+    return [ids[j] for j in best], sims[np.arange(len(sims)), best]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Throughput and decision agreement of the model cascade")
+    parser.add_argument("--days", type=int, default=3, help="Feed window to read from Supabase")
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--articles", help="JSON file with a list of article rows instead of Supabase")
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL, help="Primary model")
+    parser.add_argument(
+        "--fast-model", default=Config.CASCADE_MODEL or "sentence-transformers/static-similarity-mrl-multilingual-v1", help="Cascade model"
+    )
+    parser.add_argument("--threshold", type=float, default=Config.SIMILARITY_THRESHOLD, help="Primary model threshold")
+    parser.add_argument(
+        "--cutoffs", default="0.7,0.75,0.8,0.85,0.9,0.95", help="Comma-separated cascade model cutoffs"
+    )
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Required agreement of settled articles")
+    parser.add_argument("--probe", type=float, default=0.2, help="Newest share of articles decided")
+    parser.add_argument("--batch-size", type=int, default=Config.STREAM_WORKER_BATCH_SIZE)
+    parser.add_argument("--output", help="Write JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.articles:
+        with open(args.articles) as f:
+            articles = json.load(f)[:args.limit]
+    else:
+        articles = fetch_articles(args.days, args.limit)
+    articles.sort(key=lambda a: (a.get("published_at") or "", a["id"]))
+    split = int(len(articles) * (1 - args.probe))
+    history = [i for i in range(split) if articles[i].get("cluster_id")]
+    probes = list(range(split, len(articles)))
+    if not history or not probes:
+        print("Not enough clustered articles")
+        return 1
+
+    texts = article_texts(EmbeddingService, articles)
+    primary, primary_tps = encode(load_model(args.model), texts, args.batch_size)
+    fast, fast_tps = encode(load_model(args.fast_model), texts, args.batch_size)
+
+    history_clusters = [articles[i]["cluster_id"] for i in history]
+    primary_ids, primary_matrix = centroids(history_clusters, primary[history])
+    fast_ids, fast_matrix = centroids(history_clusters, fast[history])
+
+    primary_best, primary_sims = best_matches(primary[probes], primary_ids, primary_matrix)
+    reference = [cid if s >= args.threshold else None for cid, s in zip(primary_best, primary_sims)]
+    fast_best, fast_sims = best_matches(fast[probes], fast_ids, fast_matrix)
+
+    rows: List[Dict[str, Any]] = []
+    for cutoff in sorted(float(c) for c in args.cutoffs.split(",")):
+        settled = fast_sims >= cutoff
+        decisions = [f if s else r for f, s, r in zip(fast_best, settled, reference)]
+        agree = np.array([d == r for d, r in zip(decisions, reference)])
+        n_settled = int(settled.sum())
+        seconds_per_text = 1 / fast_tps + (1 - n_settled / len(probes)) / primary_tps
+        rows.append({
+            "cutoff": cutoff,
+            "settled": n_settled / len(probes),
+            "agreement": float(agree.mean()),
+            "settled_agreement": float(agree[settled].mean()) if n_settled else None,
+            "settled_unmatched": int(sum(1 for s, r in zip(settled, reference) if s and r is None)),
+            "texts_per_s": 1 / seconds_per_text,
+            "speedup": 1 / (seconds_per_text * primary_tps),
+        })
+
+    suggested = next(
+        (row["cutoff"] for row in rows
+         if row["settled_agreement"] is not None and row["settled_agreement"] >= args.min_agreement),
+        None
+    )
+
+    matched = sum(1 for r in reference if r)
+    print(f"articles={len(articles)} clusters={len(primary_ids)} new={len(probes)} "
+          f"primary matches={matched} (threshold {args.threshold})")
+    print(f"{args.model}: {primary_tps:.0f} texts/s   {args.fast_model}: {fast_tps:.0f} texts/s "
+          f"(batches of {args.batch_size})")
+    print(f"\n  {'cutoff':>6}{'settled':>9}{'agree':>8}{'agree@settled':>15}{'texts/s':>9}{'speedup':>9}")
+    for row in rows:
+        settled_agreement = f"{row['settled_agreement']:.1%}" if row["settled_agreement"] is not None else "-"
+        print(
+            f"  {row['cutoff']:>6.2f}{row['settled']:>9.1%}{row['agreement']:>8.1%}{settled_agreement:>15}"
+            f"{row['texts_per_s']:>9.0f}{row['speedup']:>8.2f}x"
+        )
+    if fast_tps <= primary_tps:
+        print(f"\nWarning: {args.fast_model} is not faster than {args.model}; "
+              f"the cascade can only slow the worker down")
+    if suggested is None:
+        print(f"\nNo cutoff reaches {args.min_agreement:.0%} agreement on settled articles; "
+              f"try higher --cutoffs")
+    else:
+        print(f"\nSuggested CASCADE_THRESHOLD={suggested} (settled agreement >= {args.min_agreement:.0%})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "articles": len(articles), "new": len(probes), "clusters": len(primary_ids),
+                "model": args.model, "fast_model": args.fast_model, "threshold": args.threshold,
+                "primary_texts_per_s": primary_tps, "fast_texts_per_s": fast_tps,
+                "min_agreement": args.min_agreement, "suggested_threshold": suggested, "results": rows,
+            }, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
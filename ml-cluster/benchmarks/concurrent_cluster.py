@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/find-cluster latency while an /api/cluster run is in progress.
+
+For each serving mode it starts the stub-backed service, measures
+find-cluster latency on an idle service, then again while a cluster run
+(with simulated PostgREST/Postgres and OpenAI latency) is executing.
+
+Examples:
+    python benchmarks/concurrent_cluster.py
+    python benchmarks/concurrent_cluster.py --modes sync,gevent --workers 1 --articles 1000
+"""
+import sys
+import time
+import argparse
+import threading
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from load_test import (
+    load_corpus, run_level, start_service, stop_service, print_level, _fmt
+)
+
+# mode -> environment for gunicorn_config.py
+MODES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread", "GUNICORN_THREADS": "8",
+                "CPU_POOL_SIZE": "2", "MICRO_BATCH_ENABLED": "1"},
+    "gevent": {"GUNICORN_WORKER_CLASS": "gevent", "CPU_POOL_SIZE": "2",
+               "MICRO_BATCH_ENABLED": "1"},
+}
+
+
+def run_mode(mode: str, args, corpus: List[str]) -> Dict[str, Any]:
+    env = {
+        **MODES[mode],
+        "STUB_ARTICLES": str(args.articles),
+        "STUB_IO_LATENCY_MS": str(args.io_latency),
+        "STUB_LLM_LATENCY_MS": str(args.llm_latency),
+    }
+    print(f"\n=== mode={mode} workers={args.workers} ===")
+    proc = start_service(args.workers, args.port, env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    mix = {"find-cluster": 1}
+
+    try:
+        run_level(base_url, mix, args.concurrency, args.warmup, corpus, seed=999)
+
+        idle = run_level(base_url, mix, args.concurrency, args.duration, corpus)
+        print_level(args.workers, args.concurrency, idle)
+
+        cluster_result: Dict[str, Any] = {}
+
+        def trigger_cluster():
+            start = time.perf_counter()
+            try:
+                response = requests.post(
+                    f"{base_url}/api/cluster",
+                    json={"limit": args.articles},
+                    timeout=args.cluster_timeout
+                )
+                cluster_result["status"] = response.status_code
+            except requests.RequestException as e:
+                cluster_result["status"] = str(e)
+            cluster_result["seconds"] = time.perf_counter() - start
+
+        cluster_thread = threading.Thread(target=trigger_cluster, daemon=True)
+        cluster_thread.start()
+        time.sleep(0.5)  # let the run get past the fetch
+
+        busy = run_level(base_url, mix, args.concurrency, args.duration, corpus, seed=1)
+        print_level(args.workers, args.concurrency, busy)
+        cluster_thread.join()
+        print(f"  /api/cluster: status={cluster_result.get('status')} "
+              f"time={cluster_result.get('seconds', 0):.1f}s")
+
+        return {
+            "mode": mode,
+            "idle": idle["find-cluster"],
+            "busy": busy["find-cluster"],
+            "cluster": cluster_result,
+        }
+    finally:
+        stop_service(proc)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="find-cluster latency during a cluster run")
+    parser.add_argument("--modes", default="sync,gthread,gevent", help=f"Options: {', '.join(MODES)}")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent find-cluster clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per measurement")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--articles", type=int, default=500, help="Articles in the cluster run")
+    parser.add_argument("--io-latency", type=float, default=50.0, help="Simulated DB round trip (ms)")
+    parser.add_argument("--llm-latency", type=float, default=1500.0, help="Simulated OpenAI call (ms)")
+    parser.add_argument("--cluster-timeout", type=float, default=600.0)
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(None)
+    results = [run_mode(mode.strip(), args, corpus) for mode in args.modes.split(",") if mode.strip()]
+
+    print("\nfind-cluster latency (ms), idle vs during /api/cluster:")
+    print(f"  {'mode':<9}{'idle p50':>10}{'idle p95':>10}{'busy p50':>10}{'busy p95':>10}{'busy p99':>10}"
+          f"{'busy rps':>10}{'err%':>7}")
+    for r in results:
+        idle, busy = r["idle"], r["busy"]
+        print(
+            f"  {r['mode']:<9}{_fmt(idle['p50_ms']):>10}{_fmt(idle['p95_ms']):>10}"
+            f"{_fmt(busy['p50_ms']):>10}{_fmt(busy['p95_ms']):>10}{_fmt(busy['p99_ms']):>10}"
+            f"{busy['throughput_rps']:>10.1f}{busy['error_rate'] * 100:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-process vs multi-process encoding throughput.
+
+Encodes a recluster-sized batch of article texts in-process (the baseline)
+and with EncodePool at several process counts, and reports texts/s, speedup
+and the max deviation from the baseline vectors. The machine's core count is
+included in the report so runs from 4-, 8- and 16-core hosts can be compared
+side by side.
+
+Examples:
+    python benchmarks/encode_scaling.py
+    python benchmarks/encode_scaling.py --texts 10000 --processes 2,4,8 --output scaling-16c.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from load_test import load_corpus, parse_int_list
+from config import Config
+from services.encode_pool import EncodePool
+
+
+def build_texts(corpus: List[str], n: int) -> List[str]:
+    """Article-length texts (title | snippet), like prepare_article_text produces"""
+    texts = []
+    for i in range(n):
+        title = corpus[i % len(corpus)]
+        snippet = " ".join(corpus[(i * 7 + k) % len(corpus)] for k in range(1, 4))
+        texts.append(f"{title} | {snippet} | #{i}")
+    return texts
+
+
+def time_encode(encode_fn, texts: List[str], repeats: int):
+    best, result = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = encode_fn(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv: Optional[List[str]] = None):
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    default_processes = ",".join(str(p) for p in (2, 4, 8, 16) if p <= cpu_count) or "2"
+
+    parser = argparse.ArgumentParser(description="Encoding throughput vs number of processes")
+    parser.add_argument("--texts", type=int, default=10000, help="Texts per run (a large recluster)")
+    parser.add_argument("--processes", default=default_processes, help="Comma-separated process counts")
+    parser.add_argument("--threads-per-process", type=int, default=0, help="0 = cores / processes")
+    parser.add_argument("--chunk-size", type=int, default=Config.ENCODE_MP_CHUNK_SIZE)
+    parser.add_argument("--repeats", type=int, default=2, help="Best of N runs")
+    parser.add_argument("--corpus", help="Text file with one title per line")
+    parser.add_argument("--output", help="Write JSON report here")
+    args = parser.parse_args(argv)
+
+    texts = build_texts(load_corpus(args.corpus), args.texts)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(cpu_count)
+    model = SentenceTransformer(Config.EMBEDDING_MODEL, device="cpu")
+    dim = model.get_sentence_embedding_dimension()
+
+    def encode_baseline(batch: List[str]) -> np.ndarray:
+        return model.encode(
+            batch, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+    print(f"cores={cpu_count} texts={len(texts)} model={Config.EMBEDDING_MODEL}")
+    encode_baseline(texts[:64])  # warm up
+    base_seconds, baseline = time_encode(encode_baseline, texts, args.repeats)
+
+    rows: List[Dict[str, Any]] = [{
+        "processes": 1,
+        "threads_per_process": cpu_count,
+        "seconds": base_seconds,
+        "texts_per_s": len(texts) / base_seconds,
+        "speedup": 1.0,
+        "max_abs_diff": 0.0,
+    }]
+
+    for processes in parse_int_list(args.processes):
+        pool = EncodePool(
+            Config.EMBEDDING_MODEL,
+            dim,
+            processes,
+            threads_per_process=args.threads_per_process or None,
+            chunk_size=args.chunk_size
+        )
+        try:
+            pool.encode(texts[:processes * args.chunk_size])  # spawn + load models
+            seconds, result = time_encode(pool.encode, texts, args.repeats)
+        finally:
+            pool.close()
+        speedup = base_seconds / seconds
+        rows.append({
+            "processes": processes,
+            "threads_per_process": pool.threads_per_process,
+            "seconds": seconds,
+            "texts_per_s": len(texts) / seconds,
+            "speedup": speedup,
+            "max_abs_diff": float(np.abs(result - baseline).max()),
+        })
+
+    print(f"\n  {'procs':>5}{'thr/proc':>9}{'seconds':>10}{'texts/s':>10}{'speedup':>9}{'max diff':>11}")
+    for row in rows:
+        print(
+            f"  {row['processes']:>5}{row['threads_per_process']:>9}{row['seconds']:>10.2f}"
+            f"{row['texts_per_s']:>10.0f}{row['speedup']:>8.2f}x{row['max_abs_diff']:>11.2e}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": cpu_count, "texts": len(texts), "model": Config.EMBEDDING_MODEL,
+                       "results": rows}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
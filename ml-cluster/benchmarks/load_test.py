@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the ML clustering service.
+
+Starts the service under gunicorn (using gunicorn_config.py) backed by stub
+storage, drives /api/find-cluster(s), /api/embed and /api/similarity with a
+configurable request mix at increasing concurrency levels, and reports
+latency percentiles, histograms, error rates and the throughput knee per
+endpoint and worker configuration.
+
+Examples:
+    # Sweep 1/2/4 workers at concurrency 1..32 for 20s per level
+    python benchmarks/load_test.py --workers 1,2,4 --concurrency 1,2,4,8,16,32
+
+    # Only find-cluster, against an already running service
+    python benchmarks/load_test.py --url http://localhost:5001 --mix find-cluster=1
+"""
+import os
+import sys
+import math
+import json
+import time
+import random
+import signal
+import tempfile
+import argparse
+import threading
+import subprocess
+from typing import List, Dict, Optional, Any
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "find-cluster": "/api/find-cluster",
+    "find-clusters": "/api/find-clusters",
+    "embed": "/api/embed",
+    "similarity": "/api/similarity",
+}
+
+DEFAULT_MIX = "find-cluster=6,embed=2,similarity=2"
+
+# Histogram bucket upper bounds in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+# Synthetic headlines used when no corpus file is given
+_SUBJECTS = [
+    "EU leaders", "Chinese navy", "US Senate", "Russian forces", "Iranian officials",
+    "NATO ministers", "Brazilian government", "Indian army", "UN Security Council",
+    "Japanese premier", "Gobierno de México", "Ejército israelí", "Turkish parliament",
+]
+_ACTIONS = [
+    "announce new sanctions on", "hold emergency talks with", "deploy troops near",
+    "sign trade agreement with", "condemn missile launch by", "suspend aid to",
+    "open border crossing with", "accuse cyberattack from", "reach ceasefire with",
+]
+_OBJECTS = [
+    "Ukraine", "Taiwan", "Venezuela", "Gaza", "North Korea", "Sudan", "Armenia",
+    "the Philippines", "Niger", "Serbia", "Yemen", "Colombia",
+]
+_COUNTRIES = ["US", "CN", "RU", "UA", "IR", "IL", "TW", "IN", "BR", "MX", "TR", "JP"]
+_TOPICS = ["diplomacy", "conflict", "trade", "sanctions", "energy", "elections", "cyber"]
+
+
+def load_corpus(path: Optional[str]) -> List[str]:
+    """Loads one title per line (or a JSONL file with a "title" field)"""
+    if not path:
+        return [
+            f"{s} {a} {o}"
+            for s in _SUBJECTS for a in _ACTIONS for o in _OBJECTS
+        ]
+
+    titles = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                title = json.loads(line).get("title")
+                if title:
+                    titles.append(title)
+            else:
+                titles.append(line)
+    return titles
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """Parses "find-cluster=6,embed=2" into {endpoint: weight}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'. Options: {', '.join(ENDPOINTS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def parse_int_list(spec: str) -> List[int]:
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+
+def build_payload(endpoint: str, rng: random.Random, corpus: List[str], embed_batch: int) -> Dict[str, Any]:
+    """Builds a realistic request body for an endpoint"""
+    if endpoint == "find-cluster":
+        return {
+            "title": rng.choice(corpus),
+            "snippet": " ".join(rng.sample(corpus, 2)),
+            "countries": rng.sample(_COUNTRIES, 2),
+            "topics": rng.sample(_TOPICS, 2),
+        }
+    if endpoint == "find-clusters":
+        return {"articles": [build_payload("find-cluster", rng, corpus, embed_batch) for _ in range(embed_batch)]}
+    if endpoint == "embed":
+        return {"texts": rng.sample(corpus, min(embed_batch, len(corpus)))}
+    if endpoint == "similarity":
+        text1, text2 = rng.sample(corpus, 2)
+        return {"text1": text1, "text2": text2}
+    raise ValueError(endpoint)
+
+
+class EndpointStats:
+    """Latency and error accumulator for one endpoint at one load level"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.errors = 0
+        self.error_samples: List[str] = []
+
+    def record(self, latency_ms: float, error: Optional[str] = None):
+        if error is None:
+            self.latencies_ms.append(latency_ms)
+        else:
+            self.errors += 1
+            if len(self.error_samples) < 3:
+                self.error_samples.append(error)
+
+    def merge(self, other: "EndpointStats"):
+        self.latencies_ms.extend(other.latencies_ms)
+        self.errors += other.errors
+        self.error_samples = (self.error_samples + other.error_samples)[:3]
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        ok = len(self.latencies_ms)
+        total = ok + self.errors
+        ordered = sorted(self.latencies_ms)
+
+        histogram = []
+        idx = 0
+        for bound in HISTOGRAM_BUCKETS_MS:
+            count = 0
+            while idx < ok and ordered[idx] <= bound:
+                count += 1
+                idx += 1
+            histogram.append({"le_ms": bound, "count": count})
+
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0.0,
+            "throughput_rps": ok / elapsed_s if elapsed_s > 0 else 0.0,
+            "mean_ms": sum(ordered) / ok if ok else None,
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "max_ms": ordered[-1] if ordered else None,
+            "histogram": histogram,
+            "error_samples": self.error_samples,
+        }
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile over an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def run_level(
+    base_url: str,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration_s: float,
+    corpus: List[str],
+    embed_batch: int = 8,
+    timeout_s: float = 60.0,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Runs a closed-loop load level: `concurrency` clients each send requests
+    back-to-back for `duration_s` seconds, picking endpoints by weight.
+    """
+    names = list(mix.keys())
+    weights = [mix[n] for n in names]
+    stop_at = time.perf_counter() + duration_s
+    per_thread: List[Dict[str, EndpointStats]] = []
+    lock = threading.Lock()
+
+    def client(client_id: int):
+        rng = random.Random(seed * 1000 + client_id)
+        session = requests.Session()
+        stats = {n: EndpointStats() for n in names}
+        while time.perf_counter() < stop_at:
+            endpoint = rng.choices(names, weights)[0]
+            payload = build_payload(endpoint, rng, corpus, embed_batch)
+            start = time.perf_counter()
+            error = None
+            try:
+                response = session.post(base_url + ENDPOINTS[endpoint], json=payload, timeout=timeout_s)
+                if response.status_code != 200:
+                    error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.RequestException as e:
+                error = str(e)
+            stats[endpoint].record((time.perf_counter() - start) * 1000, error)
+        session.close()
+        with lock:
+            per_thread.append(stats)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    totals = {n: EndpointStats() for n in names}
+    for stats in per_thread:
+        for n in names:
+            totals[n].merge(stats[n])
+
+    overall = EndpointStats()
+    for n in names:
+        overall.merge(totals[n])
+
+    result = {n: totals[n].summary(elapsed) for n in names}
+    result["all"] = overall.summary(elapsed)
+    return result
+
+
+def find_knee(levels: List[Dict[str, Any]], endpoint: str, tolerance: float = 0.1) -> Optional[Dict[str, Any]]:
+    """
+    Throughput knee: the lowest concurrency whose throughput is within
+    `tolerance` of the best observed throughput. Past this point extra
+    concurrency only adds queueing latency.
+    """
+    points = [
+        (lvl["concurrency"], lvl["results"][endpoint])
+        for lvl in levels
+        if endpoint in lvl["results"]
+    ]
+    if not points:
+        return None
+    best = max(p[1]["throughput_rps"] for p in points)
+    if best <= 0:
+        return None
+    for concurrency, summary in points:
+        if summary["throughput_rps"] >= (1 - tolerance) * best:
+            return {
+                "concurrency": concurrency,
+                "throughput_rps": summary["throughput_rps"],
+                "p95_ms": summary["p95_ms"],
+                "max_throughput_rps": best,
+            }
+    return None
+
+
+# ==================== SERVICE LIFECYCLE ====================
+
+def start_service(
+    workers: int,
+    port: int,
+    app_target: str = "benchmarks.stub_app:app",
+    extra_args: Optional[List[str]] = None,
+    env: Optional[Dict[str, str]] = None,
+    startup_timeout_s: float = 300.0
+) -> subprocess.Popen:
+    """Starts gunicorn with the shipped config, overriding workers and bind"""
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-c", "gunicorn_config.py",
+        "--workers", str(workers),
+        "--bind", f"127.0.0.1:{port}",
+        "--pid", os.path.join(tempfile.gettempdir(), f"ml-cluster-loadtest-{port}.pid"),
+        *(extra_args or []),
+        app_target,
+    ]
+    proc = subprocess.Popen(
+        cmd,
+        cwd=BASE_DIR,
+        env={**os.environ, **(env or {})},
+        start_new_session=True,
+    )
+
+    deadline = time.time() + startup_timeout_s
+    url = f"http://127.0.0.1:{port}/health"
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    stop_service(proc)
+    raise RuntimeError(f"Service did not become healthy within {startup_timeout_s}s")
+
+
+def stop_service(proc: subprocess.Popen):
+    if proc.poll() is not None:
+        return
+    os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+# ==================== REPORTING ====================
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_level(workers: Optional[int], concurrency: int, results: Dict[str, Any]):
+    label = f"workers={workers} " if workers is not None else ""
+    print(f"\n{label}concurrency={concurrency}")
+    print(f"  {'endpoint':<14}{'req':>7}{'err%':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in results.items():
+        print(
+            f"  {name:<14}{s['requests']:>7}{s['error_rate'] * 100:>7.1f}{s['throughput_rps']:>9.1f}"
+            f"{_fmt(s['p50_ms']):>9}{_fmt(s['p95_ms']):>9}{_fmt(s['p99_ms']):>9}{_fmt(s['max_ms']):>9}"
+        )
+        for sample in s["error_samples"]:
+            print(f"    ! {sample}")
+
+
+def print_histogram(results: Dict[str, Any], endpoint: str = "all"):
+    hist = results[endpoint]["histogram"]
+    total = sum(b["count"] for b in hist) or 1
+    print(f"  latency histogram ({endpoint}):")
+    for bucket in hist:
+        bound = "inf" if bucket["le_ms"] == float("inf") else f"{bucket['le_ms']:g}"
+        bar = "#" * int(40 * bucket["count"] / total)
+        print(f"    <= {bound:>5} ms {bucket['count']:>7} {bar}")
+
+
+def print_knees(report: List[Dict[str, Any]], endpoints: List[str], tolerance: float):
+    print(f"\nThroughput knee (lowest concurrency within {tolerance:.0%} of peak):")
+    for config in report:
+        for endpoint in endpoints + ["all"]:
+            knee = find_knee(config["levels"], endpoint, tolerance)
+            if knee:
+                label = f"workers={config['workers']}" if config["workers"] is not None else "external"
+                print(
+                    f"  {label:<12} {endpoint:<14} concurrency={knee['concurrency']:<4} "
+                    f"rps={knee['throughput_rps']:.1f} (peak {knee['max_throughput_rps']:.1f}) "
+                    f"p95={_fmt(knee['p95_ms'])}ms"
+                )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test for the ML Cluster Service")
+    parser.add_argument("--url", help="Target an already running service instead of starting one")
+    parser.add_argument("--workers", default="2", help="Comma-separated gunicorn worker counts (default: 2)")
+    parser.add_argument("--worker-class", help="Override gunicorn worker_class (e.g. gthread)")
+    parser.add_argument("--threads", type=int, help="Override gunicorn threads per worker")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated client concurrency levels")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load level")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Warmup seconds before each worker config")
+    parser.add_argument("--embed-batch", type=int, default=8, help="Texts per /api/embed and articles per /api/find-clusters request")
+    parser.add_argument("--corpus", help="Titles file (one per line, or JSONL with 'title')")
+    parser.add_argument("--port", type=int, default=5099, help="Port for the locally started service")
+    parser.add_argument("--knee-tolerance", type=float, default=0.1, help="Fraction of peak throughput for the knee")
+    parser.add_argument("--output", help="Write the full report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    levels = parse_int_list(args.concurrency)
+    corpus = load_corpus(args.corpus)
+
+    worker_configs: List[Optional[int]] = [None] if args.url else parse_int_list(args.workers)
+    extra_args = []
+    if args.worker_class:
+        extra_args += ["--worker-class", args.worker_class]
+    if args.threads:
+        extra_args += ["--threads", str(args.threads)]
+
+    report = []
+    for workers in worker_configs:
+        proc = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            print(f"\nStarting service with {workers} workers on port {args.port}...")
+            proc = start_service(workers, args.port, extra_args=extra_args)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        try:
+            if args.warmup > 0:
+                run_level(base_url, mix, max(levels), args.warmup, corpus, args.embed_batch, seed=999)
+
+            config_levels = []
+            for concurrency in levels:
+                results = run_level(base_url, mix, concurrency, args.duration, corpus, args.embed_batch)
+                print_level(workers, concurrency, results)
+                print_histogram(results)
+                config_levels.append({"concurrency": concurrency, "results": results})
+            report.append({"workers": workers, "levels": config_levels})
+        finally:
+            if proc is not None:
+                stop_service(proc)
+
+    print_knees(report, list(mix.keys()), args.knee_tolerance)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "mix": mix,
+                "duration_s": args.duration,
+                "worker_class": args.worker_class,
+                "threads": args.threads,
+                "configs": report,
+            }, f, indent=2, default=str)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: share of encode work the duplicate prefilter saves on a real feed.
+
+Pages through the articles published in the last --days (default: one day)
+from Supabase, or reads a JSON export (list of article rows) with --articles,
+and runs them through DuplicatePrefilter exactly as a cluster run would. It
+reports exact and near-exact collapses, the fraction of texts (and of
+characters) that skip the model, and the prefilter's own cost. With --encode
+the model is loaded and the actual encode time with and without the
+prefilter is measured too.
+
+Examples:
+    python benchmarks/prefilter_savings.py
+    python benchmarks/prefilter_savings.py --days 1 --jaccard 0.85 --encode
+    python benchmarks/prefilter_savings.py --articles feed.json --output savings.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.embeddings import EmbeddingService
+from services.prefilter import DuplicatePrefilter
+
+FIELDS = "id,title,snippet,full_content,countries,topics,content_hash,published_at"
+
+
+def fetch_articles(days: int, limit: int, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Articles published in the last `days`, whatever their cluster state"""
+    from supabase import create_client
+
+    client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    articles: List[Dict[str, Any]] = []
+    while len(articles) < limit:
+        size = min(page_size, limit - len(articles))
+        page = client.table("articles") \
+            .select(FIELDS) \
+            .gte("published_at", cutoff) \
+            .order("published_at") \
+            .order("id") \
+            .range(len(articles), len(articles) + size - 1) \
+            .execute().data or []
+        articles.extend(page)
+        if len(page) < size:
+            break
+    return articles
+
+
+def prepare(article: Dict[str, Any]) -> str:
+    return EmbeddingService.prepare_article_text(
+        title=article["title"],
+        snippet=article.get("snippet"),
+        content=article.get("full_content"),
+        countries=article.get("countries"),
+        topics=article.get("topics")
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Encode work saved by the duplicate prefilter")
+    parser.add_argument("--days", type=int, default=1, help="Feed window to read from Supabase")
+    parser.add_argument("--limit", type=int, default=50000)
+    parser.add_argument("--articles", help="JSON file with a list of article rows instead of Supabase")
+    parser.add_argument("--jaccard", type=float, default=Config.PREFILTER_JACCARD)
+    parser.add_argument("--encode", action="store_true", help="Also time the model with and without the prefilter")
+    parser.add_argument("--output", help="Write JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.articles:
+        with open(args.articles) as f:
+            articles = json.load(f)[:args.limit]
+    else:
+        articles = fetch_articles(args.days, args.limit)
+    if not articles:
+        print("No articles")
+        return 1
+
+    texts = [prepare(a) for a in articles]
+    prefilter = DuplicatePrefilter(threshold=args.jaccard)
+    start = time.perf_counter()
+    reps = [
+        prefilter.find_representative(a["id"], text, a.get("title"), a.get("content_hash"))
+        for a, text in zip(articles, texts)
+    ]
+    prefilter_s = time.perf_counter() - start
+
+    unique = [t for t, rep in zip(texts, reps) if rep is None]
+    total_chars = sum(len(t) for t in texts)
+    report: Dict[str, Any] = {
+        "articles": len(articles),
+        "jaccard": args.jaccard,
+        "exact": prefilter.stats["exact"],
+        "near": prefilter.stats["near"],
+        "encoded": len(unique),
+        "saved_fraction": prefilter.saved_fraction,
+        "saved_char_fraction": 1 - sum(len(t) for t in unique) / total_chars if total_chars else 0.0,
+        "prefilter_ms_per_1k": prefilter_s * 1000 / len(articles) * 1000,
+    }
+
+    if args.encode:
+        from services.embeddings import get_embedding_service
+
+        service = get_embedding_service(Config.EMBEDDING_MODEL)
+        service.encode(texts[:64], use_cache=False)  # warm up
+        start = time.perf_counter()
+        service.encode(texts, use_cache=False)
+        report["encode_all_s"] = time.perf_counter() - start
+        start = time.perf_counter()
+        service.encode(unique, use_cache=False)
+        report["encode_unique_s"] = time.perf_counter() - start + prefilter_s
+        report["saved_time_fraction"] = 1 - report["encode_unique_s"] / report["encode_all_s"]
+
+    print(f"articles={report['articles']} exact={report['exact']} near={report['near']} "
+          f"encoded={report['encoded']} (jaccard >= {args.jaccard})")
+    print(f"encode work saved: {report['saved_fraction']:.1%} of texts, "
+          f"{report['saved_char_fraction']:.1%} of characters; "
+          f"prefilter cost {report['prefilter_ms_per_1k']:.0f} ms per 1k articles")
+    if args.encode:
+        print(f"encode time: {report['encode_all_s']:.1f}s all → {report['encode_unique_s']:.1f}s "
+              f"with prefilter ({report['saved_time_fraction']:.1%} saved)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Flask app backed by in-memory stub storage, for load testing.
+
+Loads the real embedding model but replaces DatabaseService and
+EnrichmentService with stubs, so the request path (parsing, encoding, vector
+search, serialization) can be measured without Supabase, Postgres or OpenAI.
+STUB_IO_LATENCY_MS and STUB_LLM_LATENCY_MS simulate their network waits.
+
+Run it the same way as production:
+    gunicorn -c gunicorn_config.py benchmarks.stub_app:app
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Number of synthetic cluster centroids that find-cluster searches
+STUB_CLUSTERS = int(os.getenv("STUB_CLUSTERS", 500))
+STUB_SEED = int(os.getenv("STUB_SEED", 42))
+# Synthetic unclustered articles returned to /api/cluster
+STUB_ARTICLES = int(os.getenv("STUB_ARTICLES", 0))
+# Simulated latency of each PostgREST/Postgres call and each OpenAI call
+STUB_IO_LATENCY_MS = float(os.getenv("STUB_IO_LATENCY_MS", 0))
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", 0))
+
+
+def _io_wait(latency_ms: float):
+    """Stands in for a network round trip (yields under gevent, like a socket read)"""
+    if latency_ms > 0:
+        time.sleep(latency_ms / 1000.0)
+
+
+def _synthetic_articles(n: int) -> List[Dict[str, Any]]:
+    from benchmarks.load_test import load_corpus, _COUNTRIES, _TOPICS
+
+    rng = random.Random(STUB_SEED)
+    corpus = load_corpus(None)
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": rng.choice(corpus),
+            "snippet": " ".join(rng.sample(corpus, 3)),
+            "full_content": None,
+            "countries": rng.sample(_COUNTRIES, 2),
+            "topics": rng.sample(_TOPICS, 2),
+            "source_id": f"source-{rng.randrange(40)}",
+            "domain": "example.com",
+            "published_at": (now - timedelta(minutes=rng.randrange(7 * 24 * 60))).isoformat() + "Z",
+        }
+        for _ in range(n)
+    ]
+
+
+class StubDatabaseService:
+    """
+    In-memory replacement for DatabaseService.
+
+    Holds a fixed matrix of random normalized centroids so that
+    find_similar_clusters does real vector work. Writes are discarded.
+    """
+
+    def __init__(self, n_clusters: int = STUB_CLUSTERS, dim: int = Config.EMBEDDING_DIM):
+        rng = np.random.default_rng(STUB_SEED)
+        centroids = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        self._centroids = centroids
+        self._cluster_ids = [f"stub-cluster-{i}" for i in range(n_clusters)]
+        self.supabase = None
+        logger.info(f"Stub storage with {n_clusters} clusters")
+
+    def close(self):
+        pass
+
+    def get_unclustered_articles(self, days: int = 7, limit: int = 500) -> List[Dict[str, Any]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return _synthetic_articles(min(limit, STUB_ARTICLES))
+
+    def iter_unclustered_articles(self, days: int = 7, limit: int = 500, page_size: int = 200):
+        articles = _synthetic_articles(min(limit, STUB_ARTICLES))
+        for start in range(0, len(articles), page_size):
+            _io_wait(STUB_IO_LATENCY_MS)
+            yield articles[start:start + page_size]
+
+    @contextmanager
+    def advisory_lock(self, name: str):
+        yield True
+
+    def iter_claimed_articles(self, worker_id: str, lease_seconds: int = 600, **kwargs):
+        return self.iter_unclustered_articles(**kwargs)
+
+    def release_article_claims(self, worker_id: str, article_ids: List[str]) -> int:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return len(article_ids)
+
+    def get_articles_by_ids(self, article_ids: List[str]) -> List[Dict[str, Any]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return []
+
+    def update_article_cluster(self, article_id: str, cluster_id: str):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def update_articles_cluster(self, article_ids: List[str], cluster_id: str):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def create_cluster(self, embedding: Optional[np.ndarray] = None, **kwargs) -> Optional[Dict[str, Any]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return {"id": str(uuid.uuid4()), **kwargs}
+
+    def update_cluster(self, cluster_id: str, data: Dict[str, Any]):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def create_clusters_bulk(self, clusters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return [
+            {"id": str(uuid.uuid4()), **{k: v for k, v in c.items() if k not in ("embedding", "article_ids")}}
+            for c in clusters
+        ]
+
+    def update_clusters_bulk(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def store_article_embedding(self, article_id: str, embedding: np.ndarray):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def store_article_embeddings_batch(self, article_ids: List[str], embeddings: np.ndarray):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def store_cluster_embedding(self, cluster_id: str, embedding: np.ndarray):
+        _io_wait(STUB_IO_LATENCY_MS)
+
+    def find_similar_clusters(
+        self,
+        embedding: np.ndarray,
+        threshold: float = 0.75,
+        limit: int = 5
+    ) -> List[Tuple[str, float]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        similarities = self._centroids @ embedding.astype(np.float32)
+        top = np.argsort(-similarities)[:limit]
+        return [
+            (self._cluster_ids[i], float(similarities[i]))
+            for i in top
+            if similarities[i] >= threshold
+        ]
+
+    def get_recent_cluster_centroids(self, days: int = 7) -> Tuple[List[str], np.ndarray]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return list(self._cluster_ids), self._centroids
+
+    def get_article_embeddings(self, article_ids: List[str]) -> Dict[str, np.ndarray]:
+        return {}
+
+    def get_recent_article_embeddings(self, days: int = 3, updated_since=None) -> list:
+        return []
+
+    def get_article_clusters(self, article_ids: List[str]) -> Dict[str, Optional[str]]:
+        _io_wait(STUB_IO_LATENCY_MS)
+        return {}
+
+    def get_cluster_articles_embeddings(self, cluster_id: str) -> Tuple[List[str], np.ndarray]:
+        return [], np.array([])
+
+
+class StubEnrichmentService:
+    """Replacement for EnrichmentService that only simulates the OpenAI wait"""
+
+    enabled = True
+
+    def __init__(self, **kwargs):
+        pass
+
+    def enrich_cluster(self, cluster: Dict[str, Any], articles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        _io_wait(STUB_LLM_LATENCY_MS)
+        return None
+
+
+app_module.DatabaseService = StubDatabaseService
+app_module.EnrichmentService = StubEnrichmentService
+# Every load-test run starts from scratch
+Config.CHECKPOINT_DIR = ""
+# find-clusters matches against the stub centroids in memory, as with DATABASE_URL
+app_module._centroid_index = app_module.CentroidIndex(
+    app_module.get_services()[3], days=7, refresh_seconds=Config.FIND_CLUSTERS_REFRESH_SECONDS
+)
+
+# Load the model at import time so gunicorn's preload_app shares it across workers
+app_module.get_services()
+
+app = app_module.app
@@ -2,6 +2,7 @@
 ML clustering microservice configuration
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -40,6 +41,190 @@ class Config:
     
     # Embedding dimension (depends on model)
     EMBEDDING_DIM = 384  # for MiniLM
+    
+    # Micro-batching: coalesce concurrent small encode calls into one forward pass.
+    # Only helps when a worker serves several requests at once (gthread/async workers).
+    MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "0") == "1"
+    MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", 5))
+    MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", 64))
+    
+    # Concurrency
+    # OS threads allowed to run CPU-bound work (encode, HDBSCAN) at once. 0 runs it
+    # inline in the request. Required for gevent workers so the hub keeps serving I/O.
+    CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", 0))
+    # Max PostgreSQL connections per worker process (pgvector)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    # Article/cluster reads and writes over those connections (server-side
+    # cursors, batched statements) instead of the Supabase REST client, which
+    # stays as fallback. Needs DATABASE_URL.
+    DB_DIRECT_SQL = os.getenv("DB_DIRECT_SQL", "1") == "1"
+    
+    # LRU cache of query embeddings (find-cluster, similarity), in MB. 0 disables it.
+    EMBEDDING_CACHE_MB = float(os.getenv("EMBEDDING_CACHE_MB", 64))
+    
+    # Multi-process encoding for large batches (recluster). 0 disables it.
+    # Each process loads its own model copy (~500 MB with MiniLM).
+    ENCODE_PROCESSES = int(os.getenv("ENCODE_PROCESSES", 0))
+    # torch/BLAS threads per encoding process; 0 = cores / ENCODE_PROCESSES
+    ENCODE_THREADS_PER_PROCESS = int(os.getenv("ENCODE_THREADS_PER_PROCESS", 0))
+    # Smaller batches stay in-process (spawning and IPC are not worth it)
+    ENCODE_MP_MIN_TEXTS = int(os.getenv("ENCODE_MP_MIN_TEXTS", 2000))
+    ENCODE_MP_CHUNK_SIZE = int(os.getenv("ENCODE_MP_CHUNK_SIZE", 256))
+    
+    # Streaming fetch → encode → store in /api/cluster and /api/recluster:
+    # articles per fetch request and max pages/batches queued between stages
+    STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", 200))
+    STREAM_QUEUE_DEPTH = int(os.getenv("STREAM_QUEUE_DEPTH", 2))
+    
+    # Embedding-free duplicate prefilter ahead of encoding in cluster runs: exact
+    # (normalized title + content_hash, normalized text) and MinHash/LSH matches
+    # reuse the first article's vector instead of a transformer pass
+    PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "1") == "1"
+    # Min Jaccard similarity of word 3-shingles for a near-exact duplicate
+    PREFILTER_JACCARD = float(os.getenv("PREFILTER_JACCARD", 0.85))
+    
+    # Rolling in-memory index of the last N days of article_embeddings, refreshed
+    # incrementally. Cluster runs link new articles that duplicate an already
+    # clustered one (DEDUP_THRESHOLD) to its cluster; /api/deduplicate reads its
+    # cached pairs. 0 disables it.
+    RECENT_INDEX_DAYS = int(os.getenv("RECENT_INDEX_DAYS", 3))
+    
+    # pgvector search (migration 013): find_similar_clusters takes the
+    # VECTOR_SEARCH_CANDIDATES nearest centroids from the ANN index, then applies
+    # the time window and threshold (widening the candidates while stale centroids
+    # crowd out recent matches, migration 017). Per-query recall/speed knobs of the index:
+    # ivfflat.probes (lists scanned, ~sqrt(lists)) and hnsw.ef_search (>= candidates).
+    VECTOR_SEARCH_CANDIDATES = int(os.getenv("VECTOR_SEARCH_CANDIDATES", 40))
+    VECTOR_IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", 10))
+    VECTOR_HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", 40))
+    # Clusters whose window_end is within the last CLUSTER_MATCH_DAYS are the
+    # ones new articles can join: find_similar_clusters (window_days of the SQL
+    # functions, migration 019) and the /api/find-clusters centroid matrix.
+    CLUSTER_MATCH_DAYS = int(os.getenv("CLUSTER_MATCH_DAYS", 7))
+    
+    # Sharded cluster runs (migration 011): replicas lease batches of new articles
+    # to embed and match; the global stages run on one replica at a time.
+    CLUSTER_CLAIMS_ENABLED = os.getenv("CLUSTER_CLAIMS_ENABLED", "0") == "1"
+    # Leases from a crashed replica expire after this many seconds
+    CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", 600))
+    # Max unclustered articles considered by the global stage
+    CLUSTER_GLOBAL_LIMIT = int(os.getenv("CLUSTER_GLOBAL_LIMIT", 2000))
+    
+    # Stream worker (worker.py, migration 014): new articles are clustered in
+    # micro-batches of up to STREAM_WORKER_BATCH_SIZE, at most
+    # STREAM_WORKER_MAX_WAIT_SECONDS after their insert notification, against
+    # in-memory centroids reloaded every STREAM_WORKER_CENTROID_REFRESH_SECONDS.
+    # HDBSCAN over the leftovers runs every STREAM_WORKER_GLOBAL_INTERVAL_SECONDS.
+    STREAM_WORKER_BATCH_SIZE = int(os.getenv("STREAM_WORKER_BATCH_SIZE", 64))
+    STREAM_WORKER_MAX_WAIT_SECONDS = float(os.getenv("STREAM_WORKER_MAX_WAIT_SECONDS", 5))
+    STREAM_WORKER_GLOBAL_INTERVAL_SECONDS = float(os.getenv("STREAM_WORKER_GLOBAL_INTERVAL_SECONDS", 300))
+    STREAM_WORKER_CENTROID_REFRESH_SECONDS = float(os.getenv("STREAM_WORKER_CENTROID_REFRESH_SECONDS", 60))
+    STREAM_WORKER_DAYS = int(os.getenv("STREAM_WORKER_DAYS", 7))
+    # Model cascade in the stream worker: new articles are first encoded with
+    # CASCADE_MODEL (empty disables it; e.g. a static embedding model such as
+    # sentence-transformers/static-similarity-mrl-multilingual-v1) and join a cluster right away when their best similarity to that model's
+    # centroids is >= CASCADE_THRESHOLD. That similarity is on the cascade model's
+    # own scale (not SIMILARITY_THRESHOLD's): set CASCADE_THRESHOLD to the
+    # "suggested" cutoff of benchmarks/cascade_agreement.py on your feed, the
+    # lowest one whose settled decisions agree with the primary model at least
+    # --min-agreement (0.98) of the time. The rest are encoded
+    # with EMBEDDING_MODEL as usual. Duplicates are checked on the cascade vectors
+    # first (DEDUP_THRESHOLD, RECENT_INDEX_DAYS), and settled articles get their
+    # EMBEDDING_MODEL vector backfilled while no batch is pending. Needs migration 015.
+    CASCADE_MODEL = os.getenv("CASCADE_MODEL", "")
+    CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", 0.85))
+    
+    # Batch /api/find-clusters: max articles per request, and how often its
+    # in-memory centroid matrix (clusters of the last CLUSTER_MATCH_DAYS) is reloaded
+    FIND_CLUSTERS_MAX_ARTICLES = int(os.getenv("FIND_CLUSTERS_MAX_ARTICLES", 1000))
+    FIND_CLUSTERS_REFRESH_SECONDS = float(os.getenv("FIND_CLUSTERS_REFRESH_SECONDS", 30))
+    
+    # Cluster merge job (/api/merge-clusters): clusters of the last MERGE_DAYS
+    # whose centroids have a cosine similarity >= MERGE_THRESHOLD are merged.
+    # The similarity matrix is computed MERGE_BLOCK_SIZE rows at a time.
+    MERGE_THRESHOLD = float(os.getenv("MERGE_THRESHOLD", 0.9))
+    MERGE_DAYS = int(os.getenv("MERGE_DAYS", 7))
+    MERGE_BLOCK_SIZE = int(os.getenv("MERGE_BLOCK_SIZE", 1024))
+    
+    # Local re-split (/api/resplit-clusters): clusters active in the last
+    # RESPLIT_DAYS with at least RESPLIT_MIN_SIZE members whose mean cosine
+    # distance to their centroid exceeds RESPLIT_DISPERSION are re-clustered
+    RESPLIT_DISPERSION = float(os.getenv("RESPLIT_DISPERSION", 0.3))
+    RESPLIT_MIN_SIZE = int(os.getenv("RESPLIT_MIN_SIZE", 6))
+    RESPLIT_DAYS = int(os.getenv("RESPLIT_DAYS", 7))
+    
+    # Arrow/Parquet export (/api/export, export-embeddings.py): rows per
+    # server-side cursor page and per record batch / row group
+    EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 5000))
+    
+    # GPT enrichment prompt: the ENRICH_MAX_ARTICLES most central and mutually
+    # diverse members (MMR, ENRICH_DIVERSITY 0 = central only), cut at
+    # ENRICH_TOKEN_BUDGET tokens of article context
+    ENRICH_MAX_ARTICLES = int(os.getenv("ENRICH_MAX_ARTICLES", 10))
+    ENRICH_DIVERSITY = float(os.getenv("ENRICH_DIVERSITY", 0.5))
+    ENRICH_TOKEN_BUDGET = int(os.getenv("ENRICH_TOKEN_BUDGET", 2000))
+    ENRICH_SNIPPET_CHARS = int(os.getenv("ENRICH_SNIPPET_CHARS", 300))
+    
+    # Re-enrichment of clusters that grew after creation (requires migration
+    # 012_cluster_reenrichment.sql). A cluster is queued when its article count
+    # grew by REENRICH_GROWTH (fraction) or its centroid moved by REENRICH_DRIFT
+    # (cosine distance) since its last enrichment. New triggers push the entry
+    # back by REENRICH_DEBOUNCE_SECONDS, up to REENRICH_MAX_WAIT_SECONDS; a
+    # cluster is re-enriched at most once per REENRICH_MIN_INTERVAL_SECONDS.
+    REENRICH_ENABLED = os.getenv("REENRICH_ENABLED", "0") == "1"
+    REENRICH_GROWTH = float(os.getenv("REENRICH_GROWTH", 0.5))
+    REENRICH_DRIFT = float(os.getenv("REENRICH_DRIFT", 0.05))
+    REENRICH_DEBOUNCE_SECONDS = int(os.getenv("REENRICH_DEBOUNCE_SECONDS", 600))
+    REENRICH_MAX_WAIT_SECONDS = int(os.getenv("REENRICH_MAX_WAIT_SECONDS", 3600))
+    REENRICH_MIN_INTERVAL_SECONDS = int(os.getenv("REENRICH_MIN_INTERVAL_SECONDS", 3600))
+    # Max clusters re-enriched per cluster run or /api/reenrich call
+    REENRICH_BATCH_SIZE = int(os.getenv("REENRICH_BATCH_SIZE", 20))
+    
+    # Offline batch enrichment: runs creating at least BATCH_ENRICH_MIN_CLUSTERS
+    # clusters (0 = never; /api/recluster also takes "batch_enrich": true) write
+    # all prompts to one JSONL job and submit it instead of a chat call per
+    # cluster. Backend "openai" (Batch API) or "local" (file-based stand-in).
+    # Job records live in cluster_enrichment_jobs (migration 018). The "local"
+    # backend keeps each batch's input, output and heartbeat files under
+    # BATCH_ENRICH_DIR/local: with several replicas, BATCH_ENRICH_DIR must be on
+    # storage they all mount, or a replica polling another's job finds no files
+    # and marks it failed. A local batch whose heartbeat is older than
+    # BATCH_ENRICH_LOCAL_STALE_SECONDS (process died) is marked failed.
+    BATCH_ENRICH_MIN_CLUSTERS = int(os.getenv("BATCH_ENRICH_MIN_CLUSTERS", 0))
+    BATCH_ENRICH_BACKEND = os.getenv("BATCH_ENRICH_BACKEND", "openai")
+    BATCH_ENRICH_DIR = os.getenv(
+        "BATCH_ENRICH_DIR", os.path.join(tempfile.gettempdir(), "ml-cluster-batches")
+    )
+    BATCH_ENRICH_LOCAL_STALE_SECONDS = float(os.getenv("BATCH_ENRICH_LOCAL_STALE_SECONDS", 600))
+    
+    # Stage checkpoints of cluster runs (embeddings, dedup, labels, created ids,
+    # enrichments). An interrupted run resumes from its last completed stage.
+    # Empty disables checkpointing.
+    CHECKPOINT_DIR = os.getenv(
+        "CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "ml-cluster-checkpoints")
+    )
+    # Older checkpoints are discarded (the fetched article set is stale)
+    CHECKPOINT_MAX_AGE_SECONDS = int(os.getenv("CHECKPOINT_MAX_AGE_SECONDS", 3600))
+    
+    # HDBSCAN tree of the last cluster run over at least HIERARCHY_MIN_ARTICLES
+    # articles, re-cut by /api/hierarchy at other granularities. Empty disables it.
+    HIERARCHY_DIR = os.getenv(
+        "HIERARCHY_DIR", os.path.join(tempfile.gettempdir(), "ml-cluster-hierarchy")
+    )
+    HIERARCHY_MIN_ARTICLES = int(os.getenv("HIERARCHY_MIN_ARTICLES", 50))
+    
+    # Blocked clustering: windows of at least BLOCKED_MIN_ARTICLES articles (0
+    # disables it) run HDBSCAN per primary country (countries under
+    # BLOCKED_MIN_BLOCK articles share a block) and per time slice of about
+    # BLOCKED_MAX_BLOCK articles overlapping by BLOCKED_OVERLAP_HOURS, in
+    # BLOCKED_PROCESSES processes (0 = in-process). Clusters of different blocks
+    # with a centroid similarity >= BLOCKED_STITCH_THRESHOLD are joined.
+    BLOCKED_MIN_ARTICLES = int(os.getenv("BLOCKED_MIN_ARTICLES", 20000))
+    BLOCKED_MAX_BLOCK = int(os.getenv("BLOCKED_MAX_BLOCK", 5000))
+    BLOCKED_MIN_BLOCK = int(os.getenv("BLOCKED_MIN_BLOCK", 500))
+    BLOCKED_OVERLAP_HOURS = float(os.getenv("BLOCKED_OVERLAP_HOURS", 12))
+    BLOCKED_STITCH_THRESHOLD = float(os.getenv("BLOCKED_STITCH_THRESHOLD", 0.85))
+    BLOCKED_PROCESSES = int(os.getenv("BLOCKED_PROCESSES", 0))
 
     @classmethod
     def validate(cls):
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Export article embeddings, cluster assignments and metadata for a time window
+as Arrow IPC (.arrow) or Parquet (.parquet), paging through article_embeddings
+in bounded memory. Same output as GET /api/export. Requires DATABASE_URL and
+pyarrow.
+
+Examples:
+    python export-embeddings.py embeddings.parquet --days 30
+    python export-embeddings.py clustered.arrow --days 7 --clustered-only
+
+Reading it back (NumPy matrix without copies):
+    import pyarrow.parquet as pq
+    table = pq.read_table("embeddings.parquet")
+    X = table["embedding"].combine_chunks().flatten().to_numpy().reshape(len(table), -1)
+"""
+import sys
+import time
+import argparse
+
+from config import Config
+from services.database import DatabaseService
+from services.export import FORMATS, write_export
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Arrow/Parquet export of article embeddings")
+    parser.add_argument("output", help="output file (.arrow or .parquet)")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--format", choices=tuple(FORMATS), help="default: from the file extension")
+    parser.add_argument("--clustered-only", action="store_true")
+    parser.add_argument("--page-size", type=int, default=Config.EXPORT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    if not Config.DATABASE_URL:
+        print("DATABASE_URL no configurada", file=sys.stderr)
+        return 2
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "arrow")
+
+    db = DatabaseService()
+    start = time.perf_counter()
+    pages = db.iter_article_embeddings(
+        days=args.days,
+        page_size=args.page_size,
+        clustered_only=args.clustered_only
+    )
+    with open(args.output, "wb") as out:
+        written = write_export(pages, Config.EMBEDDING_DIM, out, fmt)
+    print(f"✓ {args.output}: {written / 1e6:.1f} MB ({fmt}) in {time.perf_counter() - start:.1f}s")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
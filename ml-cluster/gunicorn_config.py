@@ -11,8 +11,23 @@ BASE_DIR = Path(__file__).parent
 # Número de workers (ajusta según CPU del servidor)
 # Para servidores pequeños: 2-4 workers
 # Para servidores grandes: CPU cores * 2 + 1
-workers = min(multiprocessing.cpu_count() * 2 + 1, 8)  # Máximo 8 workers
-worker_class = "sync"
+# GUNICORN_WORKERS permite fijarlo con datos de benchmarks/load_test.py
+workers = int(os.getenv("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))  # Máximo 8 workers
+# "gthread" + threads > 1 permite que el micro-batching (MICRO_BATCH_ENABLED) agrupe peticiones
+# "gevent" = modo asíncrono: la E/S (PostgREST, Postgres, OpenAI) cede el worker y el
+# trabajo de CPU (encode, HDBSCAN) corre en un pool acotado de CPU_POOL_SIZE hilos
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))  # Solo gevent
+
+if worker_class == "gevent":
+    # Parchear antes de cargar la app (preload_app), si no los sockets ya importados no ceden
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+    os.environ.setdefault("CPU_POOL_SIZE", "2")
+    os.environ.setdefault("MICRO_BATCH_ENABLED", "1")
 bind = "127.0.0.1:5001"  # Solo escuchar en localhost (usar nginx como proxy)
 timeout = 300  # 5 minutos (para procesamiento ML que puede tardar)
 keepalive = 5
@@ -40,7 +55,7 @@ graceful_timeout = 30
 def when_ready(server):
     """Callback cuando el servidor está listo"""
     server.log.info("ML Cluster Service iniciado con Gunicorn")
-    server.log.info(f"Workers: {workers}")
+    server.log.info(f"Workers: {workers} ({worker_class}, threads={threads})")
     server.log.info(f"Bind: {bind}")
 
 def on_exit(server):
@@ -0,0 +1,264 @@
+"""
+Offline batch enrichment of new clusters (OpenAI Batch API or a local stand-in)
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Callable, List, Dict, Any, Optional, Iterator
+
+from .pipeline import enrichment_update
+
+logger = logging.getLogger(__name__)
+
+# Batch states after which nothing else will happen
+_FINAL = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatchBackend:
+    """Jobs through the OpenAI Batch API (/v1/chat/completions, 24h window)"""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in with the same request/output line format. The batch
+    runs in a background thread started by submit(), through `responder`
+    (chat body → message content), e.g. a synchronous OpenAI client or a
+    canned answer in tests. Its files live under `root`, so replicas that
+    poll each other's jobs need `root` on shared storage.
+
+    The thread touches a `heartbeat` file after every line. A batch whose
+    heartbeat is older than `stale_seconds` (its process died or was
+    restarted) is reported as failed instead of in progress forever.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str,
+        responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+        stale_seconds: float = 600
+    ):
+        self.root = root
+        self.responder = responder
+        self.stale_seconds = stale_seconds
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.root, batch_id, name)
+
+    def submit(self, requests_path: str) -> str:
+        batch_id = f"local-{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.root, batch_id))
+        shutil.copyfile(requests_path, self._path(batch_id, "input.jsonl"))
+        self._heartbeat(batch_id)
+        if self.responder is not None:
+            threading.Thread(target=self._run, args=(batch_id,), name=f"batch-{batch_id}", daemon=True).start()
+        return batch_id
+
+    def _run(self, batch_id: str):
+        tmp = self._path(batch_id, "output.jsonl.tmp")
+        try:
+            with open(self._path(batch_id, "input.jsonl")) as src, open(tmp, "w") as out:
+                for line in src:
+                    request = json.loads(line)
+                    entry = {"id": uuid.uuid4().hex, "custom_id": request["custom_id"], "response": None, "error": None}
+                    try:
+                        content = self.responder(request["body"])
+                        entry["response"] = {
+                            "status_code": 200,
+                            "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}
+                        }
+                    except Exception as e:
+                        entry["error"] = {"message": str(e)}
+                    out.write(json.dumps(entry) + "\n")
+                    self._heartbeat(batch_id)
+            os.replace(tmp, self._path(batch_id, "output.jsonl"))
+        except Exception as e:
+            logger.error(f"Local batch {batch_id} failed: {e}", exc_info=True)
+            self._fail(batch_id, str(e))
+
+    def _heartbeat(self, batch_id: str):
+        with open(self._path(batch_id, "heartbeat"), "w") as f:
+            f.write(str(time.time()))
+
+    def _fail(self, batch_id: str, reason: str):
+        with open(self._path(batch_id, "failed"), "w") as f:
+            f.write(reason)
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(self._path(batch_id, "output.jsonl")):
+            return "completed"
+        if self.responder is None or os.path.exists(self._path(batch_id, "failed")):
+            return "failed"
+        try:
+            idle = time.time() - os.path.getmtime(self._path(batch_id, "heartbeat"))
+        except OSError:
+            idle = float("inf")
+        if idle > self.stale_seconds:
+            logger.warning(f"Local batch {batch_id}: no heartbeat for {idle:.0f}s, marking it failed")
+            self._fail(batch_id, "stale heartbeat")
+            return "failed"
+        return "in_progress"
+
+    def results(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        with open(self._path(batch_id, "output.jsonl")) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class BatchEnricher:
+    """
+    Enriches the clusters of a run as one offline batch job instead of one
+    synchronous chat call per cluster.
+
+    submit() writes every prompt to <root>/<job_id>/requests.jsonl (one
+    line per cluster, custom_id = cluster id) and hands the file to the
+    backend. The job record and the computed cluster fields are stored in
+    cluster_enrichment_jobs (migration 018), so any replica can poll it.
+    poll() checks the backend and, once the batch is done, applies all
+    results to `clusters` in one bulk update. Clusters keep their
+    provisional summary until then (and for good if their line failed).
+    """
+
+    def __init__(self, root: str, backend, enrichment_service, db_service, reenrich_queue=None):
+        self.root = root
+        self.backend = backend
+        self.enrichment_service = enrichment_service
+        self.db_service = db_service
+        self.reenrich_queue = reenrich_queue
+
+    def _job_path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.root, job_id, name)
+
+    def load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        record = self.db_service.get_enrichment_job(job_id)
+        return record["job"] if record else None
+
+    def submit(self, items: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Args:
+            items: {"cluster": created cluster row, "spec": computed fields,
+                "articles": representatives, most central first}
+
+        Returns:
+            Job id, or None if there was nothing to submit
+        """
+        job_id = f"enrich-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        os.makedirs(os.path.join(self.root, job_id))
+
+        specs = {}
+        with open(self._job_path(job_id, "requests.jsonl"), "w") as f:
+            for item in items:
+                body = self.enrichment_service.build_request(item["cluster"], item["articles"])
+                if body is None:
+                    continue
+                cluster_id = item["cluster"]["id"]
+                f.write(json.dumps({
+                    "custom_id": cluster_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": body
+                }) + "\n")
+                specs[cluster_id] = {
+                    "id": cluster_id,
+                    **{k: item["spec"][k] for k in ("canonical_title", "countries", "topics", "severity", "confidence")}
+                }
+        if not specs:
+            return None
+
+        batch_id = self.backend.submit(self._job_path(job_id, "requests.jsonl"))
+        self.db_service.save_enrichment_job({
+            "job_id": job_id,
+            "backend": self.backend.name,
+            "batch_id": batch_id,
+            "status": "submitted",
+            "clusters": len(specs),
+            "submitted_at": time.time()
+        }, specs=specs)
+        logger.info(f"Batch enrichment {job_id}: {len(specs)} clusters submitted ({self.backend.name} {batch_id})")
+        return job_id
+
+    def poll(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state; applies the results the first time the batch is found complete"""
+        job = self.load_job(job_id)
+        if job is None or job["status"] in ("applied", "failed"):
+            return job
+
+        status = self.backend.status(job["batch_id"])
+        job["batch_status"] = status
+        if status not in _FINAL:
+            return job
+        if status != "completed":
+            job["status"] = "failed"
+            self.db_service.save_enrichment_job(job)
+            if self.reenrich_queue is not None:
+                specs = self.db_service.get_enrichment_job(job_id, with_specs=True)["specs"]
+                self.reenrich_queue.retry(list(specs))
+            logger.warning(f"Batch enrichment {job_id} ended as {status}; clusters keep provisional summaries")
+            return job
+
+        specs = self.db_service.get_enrichment_job(job_id, with_specs=True)["specs"]
+        updates = []
+        for line in self.backend.results(job["batch_id"]):
+            spec = specs.get(line.get("custom_id"))
+            response = line.get("response") or {}
+            if spec is None or line.get("error") or response.get("status_code") != 200:
+                continue
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+                enrichment = self.enrichment_service.parse_analysis(content, spec)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.warning(f"Batch enrichment {job_id}: bad result for {spec['id']}: {e}")
+                enrichment = None
+            if enrichment:
+                updates.append((spec["id"], enrichment_update(enrichment, spec)))
+
+        self.db_service.update_clusters_bulk(updates)
+        if self.reenrich_queue is not None and updates:
+            self.reenrich_queue.mark_enriched([cid for cid, _ in updates])
+
+        job.update(status="applied", enriched=len(updates), failed=len(specs) - len(updates), applied_at=time.time())
+        self.db_service.save_enrichment_job(job)
+        logger.info(f"Batch enrichment {job_id}: {len(updates)}/{len(specs)} clusters enriched")
+        return job
+
+    def poll_all(self) -> List[Dict[str, Any]]:
+        """Poll every job not yet applied (cron)"""
+        jobs = []
+        for job_id in self.db_service.get_submitted_enrichment_jobs():
+            try:
+                jobs.append(self.poll(job_id))
+            except Exception as e:
+                logger.error(f"Error polling batch enrichment {job_id}: {e}", exc_info=True)
+        return jobs
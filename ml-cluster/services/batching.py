@@ -0,0 +1,148 @@
+"""
+Dynamic micro-batching of concurrent embedding requests
+"""
+import os
+import time
+import queue
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces texts from concurrent requests into a single forward pass.
+
+    Callers submit a small list of texts and get a Future. A background
+    thread takes the first pending request, keeps collecting requests for up
+    to `max_wait_ms` or until `max_batch_size` texts are queued, runs one
+    batched encode and fans the rows back out to each caller.
+
+    Works with threaded workers (`encode`) and asyncio code (`encode_async`).
+    The background thread is started lazily and restarted after a fork, so
+    it is safe with gunicorn's preload_app.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 64
+    ):
+        """
+        Args:
+            encode_fn: Function that encodes a list of texts into a 2D array
+            max_wait_ms: Maximum time to hold a request while collecting others
+            max_batch_size: Maximum texts per forward pass
+        """
+        self.encode_fn = encode_fn
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+        # Statistics
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    # ==================== PUBLIC API ====================
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding. The Future resolves to (len(texts), dim)."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking encode through the coalescer"""
+        return self.submit(texts).result(timeout=timeout)
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        """Non-blocking encode for asyncio callers"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "avg_texts_per_batch": self.texts / self.batches if self.batches else 0.0,
+        }
+
+    # ==================== WORKER ====================
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            if self._pid is not None and self._pid != pid:
+                # Forked child: the parent's thread and queued futures do not exist here
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name="embedding-batcher",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """Blocks for the first request, then gathers more until full or timed out"""
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_s
+
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            count += len(item[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Skip requests whose callers already gave up
+            batch = [(texts, fut) for texts, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            all_texts = [t for texts, _ in batch for t in texts]
+            try:
+                embeddings = self.encode_fn(all_texts)
+            except Exception as e:
+                logger.error(f"Error in batched encode ({len(all_texts)} texts): {e}")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            offset = 0
+            for texts, fut in batch:
+                fut.set_result(embeddings[offset:offset + len(texts)])
+                offset += len(texts)
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(all_texts)
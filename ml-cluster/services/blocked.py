@@ -0,0 +1,261 @@
+"""
+Blocked HDBSCAN for large windows: per country and time slice, stitched by centroid
+"""
+import os
+import time
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .grouping import PUBLISHED_TS, annotate_timestamps
+from .merge import UnionFind, find_merge_groups
+
+logger = logging.getLogger(__name__)
+
+# Block of the articles whose primary country has too few articles (or none)
+MIXED = "*"
+
+
+def _fit_block(clustering_service, shm_name: Optional[str], shape: tuple, rows: np.ndarray, matrix=None) -> np.ndarray:
+    """HDBSCAN labels of some rows of the shared embedding matrix"""
+    shm = None
+    if matrix is None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    try:
+        return clustering_service.fit_labels(matrix[rows])
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+def primary_keys(articles: List[Dict[str, Any]], min_block: int) -> List[str]:
+    """First country of each article; countries with fewer than min_block articles → MIXED"""
+    keys = []
+    for a in articles:
+        countries = a.get("countries") or []
+        keys.append(str(countries[0]).upper() if countries else MIXED)
+    counts: Dict[str, int] = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+    return [key if counts[key] >= min_block else MIXED for key in keys]
+
+
+def time_slices(timestamps: np.ndarray, max_block: int, overlap_seconds: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Splits rows into consecutive time slices of about max_block rows
+    (boundaries at quantiles). Each slice also takes the rows published up to
+    overlap_seconds after its end, so stories that cross a boundary appear
+    whole in one block. Rows without a date go to the slice of the median.
+
+    Returns:
+        [(rows, owned)]: rows of the slice, and which of them belong to it
+        (not to the next slice through the overlap)
+    """
+    n = len(timestamps)
+    ts = np.where(np.isnan(timestamps), np.nanmedian(timestamps) if np.isfinite(timestamps).any() else 0.0, timestamps)
+    k = -(-n // max_block)
+    if k <= 1:
+        return [(np.arange(n), np.ones(n, dtype=bool))]
+
+    edges = np.quantile(ts, np.linspace(0, 1, k + 1)[1:-1])
+    slice_of = np.searchsorted(edges, ts, side="right")
+    slices = []
+    for s in range(k):
+        owned = slice_of == s
+        extra = slice_of > s
+        if s < k - 1:
+            extra &= ts < edges[s] + overlap_seconds
+        rows = np.flatnonzero(owned | extra)
+        if len(rows):
+            slices.append((rows, owned[rows]))
+    return slices
+
+
+def partition_blocks(
+    articles: List[Dict[str, Any]],
+    max_block: int = 5000,
+    min_block: int = 500,
+    overlap_seconds: float = 12 * 3600
+) -> List[Dict[str, Any]]:
+    """
+    Blocks of rows clustered independently: one per primary country (MIXED
+    for small ones), split into overlapping time slices when larger than
+    max_block.
+
+    Returns:
+        [{"key", "rows", "owned"}]; every row is owned by exactly one block
+    """
+    annotate_timestamps(articles)
+    keys = primary_keys(articles, min_block)
+    timestamps = np.fromiter((a[PUBLISHED_TS] for a in articles), dtype=np.float64, count=len(articles))
+
+    by_key: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        by_key.setdefault(key, []).append(i)
+
+    blocks = []
+    for key, members in sorted(by_key.items()):
+        members = np.array(members, dtype=np.int64)
+        for rows, owned in time_slices(timestamps[members], max_block, overlap_seconds):
+            blocks.append({"key": key, "rows": members[rows], "owned": owned})
+    return blocks
+
+
+def stitch_blocks(
+    blocks: List[Dict[str, Any]],
+    block_labels: List[np.ndarray],
+    embeddings: np.ndarray,
+    threshold: float,
+    n_rows: int
+) -> Tuple[np.ndarray, int]:
+    """
+    Global labels from per-block labels. Clusters of different blocks are
+    joined when their centroids have a cosine similarity >= threshold or,
+    across a time overlap, when they share at least half of the smaller one.
+    Each row takes the cluster of the block that owns it, or, if it was an
+    outlier there, the one it got in an overlapping block.
+
+    Returns:
+        (labels, clusters joined by stitching)
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms > 0, norms, 1)
+
+    members: List[np.ndarray] = []
+    block_of: List[int] = []
+    owned_label = np.full(n_rows, -1, dtype=np.int64)
+    extra_label = np.full(n_rows, -1, dtype=np.int64)
+    for b, (block, labels) in enumerate(zip(blocks, block_labels)):
+        for label in np.unique(labels[labels >= 0]):
+            local = len(members)
+            in_cluster = labels == label
+            rows = block["rows"][in_cluster]
+            members.append(rows)
+            block_of.append(b)
+            owned_label[rows[block["owned"][in_cluster]]] = local
+            extra_label[rows[~block["owned"][in_cluster]]] = local
+
+    n_local = len(members)
+    if not n_local:
+        return np.full(n_rows, -1, dtype=np.int64), 0
+
+    uf = UnionFind(n_local)
+    centroids = np.stack([unit[rows].mean(axis=0) for rows in members])
+    for group in find_merge_groups(centroids, threshold, groups=np.array(block_of)):
+        for other in group[1:]:
+            uf.union(group[0], other)
+
+    # Mismo artículo en dos bloques solapados: misma historia si comparten la mitad
+    shared: Dict[Tuple[int, int], int] = {}
+    both = np.flatnonzero((owned_label >= 0) & (extra_label >= 0))
+    for a, b in zip(owned_label[both].tolist(), extra_label[both].tolist()):
+        shared[(a, b)] = shared.get((a, b), 0) + 1
+    for (a, b), count in shared.items():
+        if count * 2 >= min(len(members[a]), len(members[b])):
+            uf.union(a, b)
+
+    local = np.where(owned_label >= 0, owned_label, extra_label)
+    roots = np.array([uf.find(i) for i in range(n_local)], dtype=np.int64)
+    _, compact = np.unique(roots, return_inverse=True)
+    labels = np.where(local >= 0, compact[np.maximum(local, 0)], -1)
+    return labels.astype(np.int64), n_local - (int(compact.max()) + 1)
+
+
+class BlockedClusterer:
+    """
+    HDBSCAN over blocks of a large window instead of the whole window.
+
+    One global HDBSCAN over N articles in 384 dimensions grows close to
+    quadratically with N. Here rows are split by primary country (the first
+    of `countries`; countries under `min_block` articles share one block)
+    and, for blocks over `max_block` rows, into time slices that overlap by
+    `overlap_hours`. Blocks are clustered in parallel (the configured
+    ClusteringService in `processes` worker processes reading the embedding
+    matrix from shared memory; 0 runs them in-process one after another) and
+    stitched back together by centroid similarity (`stitch_threshold`), so a
+    story reported under two countries or across a slice boundary stays one
+    cluster.
+
+    Windows under `min_articles` rows use one global HDBSCAN as before.
+    """
+
+    def __init__(
+        self,
+        clustering_service,
+        min_articles: int = 20000,
+        max_block: int = 5000,
+        min_block: int = 500,
+        overlap_hours: float = 12,
+        stitch_threshold: float = 0.85,
+        processes: int = 0
+    ):
+        self.clustering_service = clustering_service
+        self.min_articles = min_articles
+        self.max_block = max_block
+        self.min_block = min_block
+        self.overlap_hours = overlap_hours
+        self.stitch_threshold = stitch_threshold
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def applies(self, n: int) -> bool:
+        return n >= self.min_articles
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            # Spawn, like the encode pool: no inherited thread pools or locks
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=mp.get_context("spawn"))
+            self._pid = pid
+            logger.info(f"Blocked clustering pool started: {self.processes} processes")
+        return self._executor
+
+    def fit_labels(self, embeddings: np.ndarray, articles: List[Dict[str, Any]]) -> np.ndarray:
+        """Labels for the rows of embeddings (aligned with articles), like ClusteringService.fit_labels"""
+        start = time.perf_counter()
+        n = len(embeddings)
+        blocks = partition_blocks(articles, self.max_block, self.min_block, self.overlap_hours * 3600)
+        logger.info(
+            f"Blocked clustering of {n} articles: {len(blocks)} blocks "
+            f"(largest {max(len(b['rows']) for b in blocks)})"
+        )
+
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.processes > 0 and len(blocks) > 1:
+            shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+            try:
+                np.ndarray(matrix.shape, dtype=np.float32, buffer=shm.buf)[:] = matrix
+                executor = self._get_executor()
+                # Los bloques grandes primero, para no acabar esperando a uno solo
+                order = sorted(range(len(blocks)), key=lambda b: -len(blocks[b]["rows"]))
+                futures = {
+                    b: executor.submit(_fit_block, self.clustering_service, shm.name, matrix.shape, blocks[b]["rows"])
+                    for b in order
+                }
+                block_labels = [futures[b].result() for b in range(len(blocks))]
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            block_labels = [
+                _fit_block(self.clustering_service, None, matrix.shape, block["rows"], matrix=matrix)
+                for block in blocks
+            ]
+
+        labels, stitched = stitch_blocks(blocks, block_labels, matrix, self.stitch_threshold, n)
+        logger.info(
+            f"Blocked clustering: {int(labels.max()) + 1} clusters ({stitched} joined across blocks), "
+            f"{int(np.count_nonzero(labels < 0))} outliers in {time.perf_counter() - start:.1f}s"
+        )
+        return labels
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
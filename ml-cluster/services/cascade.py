@@ -0,0 +1,126 @@
+"""
+Two-tier model cascade: a cheap model settles clear cluster matches first
+"""
+import time
+import logging
+from typing import List, Dict, Any, Tuple
+
+from .pipeline import link_recent_duplicates
+from .prefilter import article_texts
+from .recent_index import RecentEmbeddingIndex
+from .stream_worker import CentroidIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCascade:
+    """
+    First tier of the stream worker's micro-batches.
+
+    Every new article is encoded with the cascade model (EmbeddingService.
+    enable_cascade) and its vector stored in article_model_embeddings, tagged
+    with the model name. The article is compared with the centroids of that
+    model, which are the average of the members' cascade vectors. When its best
+    similarity reaches `threshold`, the match is clear and the article joins
+    that cluster without going through the primary model. The cutoff is on the
+    cascade model's similarity scale, which differs from the primary model's,
+    so it is calibrated on its own (benchmarks/cascade_agreement.py).
+
+    Duplicates are handled on the cascade vectors first, as the primary path
+    would: with `recent_days`, an article that duplicates a recent clustered
+    one (dedup_service.threshold) joins that article's cluster, and articles
+    with a near-duplicate in the same batch never settle here, so the
+    primary dedup sees the whole group.
+
+    Everything else (articles below the cutoff) goes on to the primary model. The primary vectors are
+    needed anyway for the primary centroid match, for dedup, and for
+    HDBSCAN. Articles settled here have only their cascade vector until the
+    stream worker backfills their primary one off the hot path.
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        db_service,
+        dedup_service,
+        threshold: float = 0.85,
+        days: int = 7,
+        refresh_seconds: float = 60,
+        recent_days: int = 0
+    ):
+        self.embedding_service = embedding_service
+        self.db_service = db_service
+        self.dedup_service = dedup_service
+        self.model = embedding_service.fast_model_name
+        self.threshold = threshold
+        self.days = days
+        self.centroids = CentroidIndex(
+            db_service,
+            days=days,
+            refresh_seconds=refresh_seconds,
+            loader=lambda d: db_service.get_model_cluster_centroids(self.model, days=d)
+        )
+        self.recent_index = None
+        if recent_days > 0:
+            self.recent_index = RecentEmbeddingIndex(
+                db_service,
+                days=recent_days,
+                threshold=dedup_service.threshold,
+                loader=lambda **kwargs: db_service.get_recent_model_embeddings(self.model, **kwargs)
+            )
+        self.stats = {"encoded": 0, "linked": 0, "matched": 0, "escalated": 0}
+
+    def split(
+        self,
+        articles: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, List[str]], List[str], List[Dict[str, Any]]]:
+        """
+        Returns:
+            Tuple ({cluster_id: article_ids} of clear matches, ids linked to the
+            cluster of a recent duplicate, articles for the primary model)
+        """
+        if not articles:
+            return {}, [], []
+        start = time.perf_counter()
+        ids = [a["id"] for a in articles]
+        embeddings = self.embedding_service.encode_fast(article_texts(self.embedding_service, articles))
+        self.db_service.store_model_embeddings(self.model, ids, embeddings)
+
+        linked: List[str] = []
+        if self.recent_index is not None:
+            mask, _ = link_recent_duplicates(self.db_service, self.recent_index, ids, embeddings)
+            linked = [aid for aid, keep in zip(ids, mask) if not keep]
+
+        # Near-duplicates within the batch go to the primary model together
+        duplicated = {
+            aid
+            for pair in self.dedup_service.find_duplicates(embeddings, ids)
+            for aid in pair[:2]
+        }
+
+        self.centroids.refresh()
+        matched: Dict[str, List[str]] = {}
+        rest: List[Dict[str, Any]] = []
+        skip = set(linked)
+        for article, hit in zip(articles, self.centroids.match(embeddings, self.threshold)):
+            if article["id"] in skip:
+                continue
+            if hit and article["id"] not in duplicated:
+                matched.setdefault(hit[0], []).append(article["id"])
+            else:
+                rest.append(article)
+
+        n_matched = len(articles) - len(linked) - len(rest)
+        self.stats["encoded"] += len(articles)
+        self.stats["linked"] += len(linked)
+        self.stats["matched"] += n_matched
+        self.stats["escalated"] += len(rest)
+        logger.info(
+            f"Cascade ({self.model}): {len(linked)} linked to a recent duplicate, {n_matched} of "
+            f"{len(articles)} articles matched, {len(rest)} to the primary model in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        return matched, linked, rest
+
+    def invalidate(self):
+        self.centroids.invalidate()
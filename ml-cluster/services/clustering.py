@@ -7,9 +7,19 @@ from sklearn.cluster import DBSCAN
 from typing import List, Dict, Tuple, Optional
 import logging
 
+from .concurrency import run_cpu_bound
+
 logger = logging.getLogger(__name__)
 
 
+def labels_to_clusters(labels: np.ndarray, article_ids: List[str]) -> Dict[int, List[str]]:
+    """Label array → {label: article ids}, members in input order"""
+    clusters: Dict[int, List[str]] = {}
+    for aid, label in zip(article_ids, labels.tolist()):
+        clusters.setdefault(label, []).append(aid)
+    return clusters
+
+
 class ClusteringService:
     """
     Implements hierarchical clustering using HDBSCAN.
@@ -40,25 +50,22 @@ class ClusteringService:
         self.metric = metric
         self.cluster_selection_epsilon = cluster_selection_epsilon
     
-    def cluster_embeddings(
-        self,
-        embeddings: np.ndarray,
-        article_ids: List[str]
-    ) -> Dict[int, List[str]]:
+    def fit_labels(self, embeddings: np.ndarray) -> np.ndarray:
         """
-        Group embeddings into clusters.
-        
-        Args:
-            embeddings: Embedding matrix (N x dim)
-            article_ids: Corresponding article IDs
-            
-        Returns:
-            Dict mapping cluster_id -> list of article_ids
-            cluster_id -1 represents outliers (not grouped)
+        Run HDBSCAN and return the label of each row as an int array
+        (-1 = outlier). Feed it to grouping.group_clusters for cluster metadata.
+        """
+        return self.fit_hierarchy(embeddings)[0]
+    
+    def fit_hierarchy(self, embeddings: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        fit_labels plus the single-linkage tree HDBSCAN built (scipy linkage
+        format, (N-1) x 4), from which hierarchy.HierarchyStore re-cuts flat
+        clusterings at other granularities. The tree is None for too few rows.
         """
         if len(embeddings) < self.min_cluster_size:
             logger.info(f"Solo {len(embeddings)} artículos, muy pocos para clustering")
-            return {-1: article_ids}
+            return np.full(len(embeddings), -1, dtype=np.int64), None
         
         logger.info(f"Clustering {len(embeddings)} articles...")
         
@@ -75,22 +82,32 @@ class ClusteringService:
         # For normalized embeddings, we convert to distance
         # cosine_distance = 1 - cosine_similarity
         # But since they're normalized, we use euclidean which is equivalent
-        cluster_labels = clusterer.fit_predict(embeddings)
-        
-        # Group articles by cluster
-        clusters: Dict[int, List[str]] = {}
-        for idx, label in enumerate(cluster_labels):
-            label = int(label)
-            if label not in clusters:
-                clusters[label] = []
-            clusters[label].append(article_ids[idx])
+        cluster_labels = np.asarray(run_cpu_bound(clusterer.fit_predict, embeddings), dtype=np.int64)
         
         # Statistics
-        n_clusters = len([k for k in clusters.keys() if k != -1])
-        n_outliers = len(clusters.get(-1, []))
+        n_clusters = len(np.unique(cluster_labels[cluster_labels >= 0]))
+        n_outliers = int(np.count_nonzero(cluster_labels == -1))
         logger.info(f"Found {n_clusters} clusters, {n_outliers} outliers")
         
-        return clusters
+        return cluster_labels, clusterer.single_linkage_tree_.to_numpy()
+    
+    def cluster_embeddings(
+        self,
+        embeddings: np.ndarray,
+        article_ids: List[str]
+    ) -> Dict[int, List[str]]:
+        """
+        Group embeddings into clusters.
+        
+        Args:
+            embeddings: Embedding matrix (N x dim)
+            article_ids: Corresponding article IDs
+            
+        Returns:
+            Dict mapping cluster_id -> list of article_ids
+            cluster_id -1 represents outliers (not grouped)
+        """
+        return labels_to_clusters(self.fit_labels(embeddings), article_ids)
     
     def cluster_with_probabilities(
         self,
@@ -115,7 +132,7 @@ class ClusteringService:
             prediction_data=True
         )
         
-        cluster_labels = clusterer.fit_predict(embeddings)
+        cluster_labels = run_cpu_bound(clusterer.fit_predict, embeddings)
         probabilities = clusterer.probabilities_
         
         clusters: Dict[int, List[str]] = {}
@@ -183,18 +200,48 @@ class DeduplicationService:
         duplicates = []
         n = len(embeddings)
         
-        # Matriz de similitud
-        similarity_matrix = np.dot(embeddings, embeddings.T)
-        
-        # Encontrar pares sobre el umbral
-        for i in range(n):
-            for j in range(i + 1, n):
-                sim = similarity_matrix[i, j]
-                if sim >= self.threshold:
-                    duplicates.append((article_ids[i], article_ids[j], float(sim)))
+        # Matriz de similitud por bloques de filas (memoria acotada), solo i < j
+        block = 1024
+        for start in range(0, n, block):
+            sims = np.dot(embeddings[start:start + block], embeddings.T)
+            mask = sims >= self.threshold
+            mask &= np.arange(n)[None, :] > np.arange(start, start + len(sims))[:, None]
+            for i, j in zip(*np.nonzero(mask)):
+                duplicates.append((article_ids[start + i], article_ids[j], float(sims[i, j])))
         
         return duplicates
     
+    def find_duplicates_of(
+        self,
+        embeddings: np.ndarray,
+        article_ids: List[str],
+        rows: List[int]
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Pares duplicados en los que participa al menos una de `rows`, en el
+        orden de find_duplicates. Compares only those rows against the whole
+        matrix (len(rows) × n instead of n × n).
+        """
+        n = len(embeddings)
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        in_rows = np.zeros(n, dtype=bool)
+        in_rows[rows] = True
+        
+        found = []
+        block = 1024
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            sims = np.dot(embeddings[chunk], embeddings.T)
+            mask = sims >= self.threshold
+            mask[np.arange(len(chunk)), chunk] = False
+            # Un par entre dos filas de `rows` se cuenta solo desde la menor
+            mask &= ~(in_rows[None, :] & (np.arange(n)[None, :] < chunk[:, None]))
+            for i, j in zip(*np.nonzero(mask)):
+                found.append((min(chunk[i], j), max(chunk[i], j), float(sims[i, j])))
+        
+        found.sort()
+        return [(article_ids[i], article_ids[j], sim) for i, j, sim in found]
+    
     def deduplicate(
         self,
         embeddings: np.ndarray,
@@ -0,0 +1,77 @@
+"""
+Offloading of CPU-bound work for threaded and gevent workers
+"""
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_pool_size = 0
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def gevent_active() -> bool:
+    """True when running inside a gevent-patched worker"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def configure_cpu_pool(size: int):
+    """
+    Sets the number of OS threads allowed to run CPU-bound work (model
+    forward passes, HDBSCAN) at the same time. 0 runs it inline.
+    """
+    global _pool_size, _executor
+    with _executor_lock:
+        _pool_size = max(0, size)
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    logger.info(f"CPU pool size: {_pool_size or 'inline'}")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                # A pool inherited through fork has no live threads in this process
+                _executor = ThreadPoolExecutor(max_workers=_pool_size, thread_name_prefix="cpu")
+                _executor_pid = pid
+    return _executor
+
+
+def run_cpu_bound(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs fn on the bounded CPU pool and waits for the result.
+
+    Under gevent the work goes to the hub's native threadpool, so the calling
+    greenlet yields and the worker keeps serving I/O-bound requests (database,
+    OpenAI) while the model or HDBSCAN runs. Under threaded workers it bounds
+    how many requests compute at once. With no pool configured it runs inline.
+    """
+    if not _pool_size:
+        return fn(*args, **kwargs)
+
+    if gevent_active():
+        import gevent
+        threadpool = gevent.get_hub().threadpool
+        if threadpool.maxsize != _pool_size:
+            # Hubs are per process (and recreated after fork), so size lazily
+            threadpool.maxsize = _pool_size
+        return threadpool.apply(fn, args, kwargs)
+
+    if threading.current_thread().name.startswith("cpu"):
+        # Already on a pool thread: avoid deadlocking on our own pool
+        return fn(*args, **kwargs)
+
+    return _get_executor().submit(fn, *args, **kwargs).result()
@@ -2,17 +2,32 @@
 Database service for Supabase + pgvector
 """
 import numpy as np
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, Iterator
 from supabase import create_client, Client
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.extras import execute_values, Json
+import os
 import logging
-import json
+import threading
+import uuid
+from datetime import datetime
+from contextlib import contextmanager
 
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+_inherited_connections: List[Any] = []
+
+
+def _parse_vectors(texts: List[str]) -> np.ndarray:
+    """pgvector text values ('[0.1,...]') as a float32 matrix, in one C-level parse"""
+    if not texts:
+        return np.empty((0, Config.EMBEDDING_DIM), dtype=np.float32)
+    return np.fromstring(
+        ",".join(text[1:-1] for text in texts), dtype=np.float32, sep=","
+    ).reshape(len(texts), -1)
+
 
 class DatabaseService:
     """
@@ -24,79 +39,182 @@ class DatabaseService:
             Config.SUPABASE_URL,
             Config.SUPABASE_SERVICE_KEY
         )
-        self._pg_conn = None
+        # Pool of PostgreSQL connections for pgvector. Each request (thread or
+        # greenlet) borrows its own connection, so concurrent requests never
+        # interleave statements or commits on a shared connection.
+        self._pg_idle: List[Any] = []
+        self._pg_lock = threading.Lock()
+        self._pg_slots = threading.BoundedSemaphore(Config.DB_POOL_SIZE)
+        self._pg_pid = os.getpid()
     
-    def _get_pg_connection(self):
+    def _connect_pg(self):
         """
-        Get PostgreSQL connection for pgvector.
+        Open a new PostgreSQL connection for pgvector.
         Uses Session Pooler or Direct Connection (both compatible with pgvector).
         Does NOT use Transaction Mode (port 6543) because it doesn't support prepared statements.
         """
-        # If connection exists but is in invalid state, reset it
-        if self._pg_conn and not self._pg_conn.closed:
-            try:
-                # Verificar si la conexión está en un estado válido
-                with self._pg_conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-            except (psycopg2.InterfaceError, psycopg2.OperationalError, psycopg2.InternalError, psycopg2.ProgrammingError):
-                # Connection is in invalid state, close it and create a new one
+        if not Config.DATABASE_URL:
+            raise ValueError(
+                "DATABASE_URL no configurada. Las operaciones de pgvector no estarán disponibles.\n"
+                "Obtén la connection string de Supabase Dashboard > Connect > Session pooler"
+            )
+        try:
+            # Verify it's not transaction mode (port 6543)
+            if ":6543" in Config.DATABASE_URL:
+                logger.warning(
+                    "⚠️ Transaction Mode (port 6543) detected. "
+                    "pgvector works better with Session Mode (port 5432) or Direct Connection.\n"
+                    "Get the connection string from: Supabase Dashboard > Connect > Session pooler"
+                )
+            
+            conn = psycopg2.connect(
+                Config.DATABASE_URL,
+                connect_timeout=10,
+                # Disable prepared statements if using transaction mode
+                options="-c statement_timeout=30000"
+            )
+            logger.info("✓ Conexión a PostgreSQL establecida para pgvector")
+            return conn
+        except psycopg2.OperationalError as e:
+            error_msg = str(e)
+            if "could not translate host name" in error_msg:
+                logger.error(
+                    "❌ Cannot resolve database hostname.\n"
+                    "Solution:\n"
+                    "1. Verify DATABASE_URL is correct\n"
+                    "2. Use Session Pooler (port 5432) instead of Direct Connection\n"
+                    "3. Get the connection string from: Supabase Dashboard > Connect > Session pooler"
+                )
+            elif "Password authentication failed" in error_msg:
+                logger.error(
+                    "❌ Autenticación fallida.\n"
+                    "Verifica la contraseña en Supabase Dashboard > Settings > Database"
+                )
+            else:
+                logger.error(f"❌ Connection error: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Unexpected error connecting to PostgreSQL: {e}")
+            raise
+    
+    @contextmanager
+    def pg_connection(self):
+        """
+        Borrow a PostgreSQL connection from the pool.
+        
+        Blocks while DB_POOL_SIZE connections are in use. Open transactions are
+        rolled back on return; on error the connection is discarded, so the
+        next borrower gets a fresh one.
+        """
+        self._reset_pool_after_fork()
+        self._pg_slots.acquire()
+        conn = None
+        try:
+            with self._pg_lock:
+                while self._pg_idle and conn is None:
+                    candidate = self._pg_idle.pop()
+                    if not candidate.closed:
+                        conn = candidate
+            if conn is None:
+                conn = self._connect_pg()
+            
+            yield conn
+            
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with self._pg_lock:
+                self._pg_idle.append(conn)
+            conn = None
+        finally:
+            if conn is not None:
+                # Error while borrowed: the connection may be in an invalid state
                 try:
-                    self._pg_conn.rollback()
-                    self._pg_conn.close()
-                except:
+                    conn.rollback()
+                    conn.close()
+                except Exception:
                     pass
-                self._pg_conn = None
+            self._pg_slots.release()
+    
+    def _reset_pool_after_fork(self):
+        """Connections opened before a fork belong to the parent process"""
+        pid = os.getpid()
+        if pid != self._pg_pid:
+            with self._pg_lock:
+                if pid != self._pg_pid:
+                    # Keep references so garbage collection never closes the parent's sockets
+                    _inherited_connections.extend(self._pg_idle)
+                    self._pg_idle = []
+                    self._pg_slots = threading.BoundedSemaphore(Config.DB_POOL_SIZE)
+                    self._pg_pid = pid
+    
+    @contextmanager
+    def advisory_lock(self, name: str):
+        """
+        Session-level PostgreSQL advisory lock, held while the block runs.
         
-        if self._pg_conn is None or self._pg_conn.closed:
-            if not Config.DATABASE_URL:
-                raise ValueError(
-                    "DATABASE_URL no configurada. Las operaciones de pgvector no estarán disponibles.\n"
-                    "Obtén la connection string de Supabase Dashboard > Connect > Session pooler"
-                )
+        Yields False (without waiting) if another session holds it. The lock
+        lives on a borrowed pool connection, so it is released on exit or
+        when the process dies and its session closes.
+        """
+        if not Config.DATABASE_URL:
+            logger.warning(f"DATABASE_URL no configurada: '{name}' runs without a lock")
+            yield True
+            return
+        
+        with self.pg_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+                acquired = cur.fetchone()[0]
+            conn.commit()
             try:
-                # Verify it's not transaction mode (port 6543)
-                if ":6543" in Config.DATABASE_URL:
-                    logger.warning(
-                        "⚠️ Transaction Mode (port 6543) detected. "
-                        "pgvector works better with Session Mode (port 5432) or Direct Connection.\n"
-                        "Get the connection string from: Supabase Dashboard > Connect > Session pooler"
-                    )
-                
-                self._pg_conn = psycopg2.connect(
-                    Config.DATABASE_URL,
-                    connect_timeout=10,
-                    # Disable prepared statements if using transaction mode
-                    options="-c statement_timeout=30000"
-                )
-                logger.info("✓ Conexión a PostgreSQL establecida para pgvector")
-            except psycopg2.OperationalError as e:
-                error_msg = str(e)
-                if "could not translate host name" in error_msg:
-                    logger.error(
-                        "❌ Cannot resolve database hostname.\n"
-                        "Solution:\n"
-                        "1. Verify DATABASE_URL is correct\n"
-                        "2. Use Session Pooler (port 5432) instead of Direct Connection\n"
-                        "3. Get the connection string from: Supabase Dashboard > Connect > Session pooler"
-                    )
-                elif "Password authentication failed" in error_msg:
-                    logger.error(
-                        "❌ Autenticación fallida.\n"
-                        "Verifica la contraseña en Supabase Dashboard > Settings > Database"
-                    )
-                else:
-                    logger.error(f"❌ Connection error: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"❌ Unexpected error connecting to PostgreSQL: {e}")
-                raise
-        return self._pg_conn
+                yield acquired
+            finally:
+                if acquired and not conn.closed:
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+                        conn.commit()
+                    except Exception as e:
+                        # Closing the session releases the lock; the pool skips closed connections
+                        logger.warning(f"Could not release advisory lock '{name}': {e}")
+                        conn.close()
+    
+    def open_listener(self, channel: str):
+        """
+        Dedicated autocommit connection LISTENing on `channel` (outside the
+        pool: it stays open for the life of the listener). Notifications
+        arrive in conn.notifies after conn.poll().
+        """
+        from psycopg2 import sql
+        
+        conn = self._connect_pg()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+        return conn
     
     def close(self):
         """Close connections"""
-        if self._pg_conn and not self._pg_conn.closed:
-            self._pg_conn.close()
+        with self._pg_lock:
+            for conn in self._pg_idle:
+                if not conn.closed:
+                    conn.close()
+            self._pg_idle = []
+    
+    @property
+    def direct_sql(self) -> bool:
+        """Article/cluster reads and writes go over the pooled PostgreSQL connection"""
+        return Config.DB_DIRECT_SQL and bool(Config.DATABASE_URL)
+    
+    def _fetch_json_rows(self, query: str, params: Any = None) -> List[Dict[str, Any]]:
+        """
+        Rows of a `SELECT to_json(t) ...` query. Postgres serializes them the
+        way PostgREST does (ISO timestamps, uuids as strings), so callers get
+        the same dicts as from the REST client.
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(query, params)
+            return [row[0] for row in cur.fetchall()]
     
     # ==================== ARTÍCULOS ====================
     
@@ -108,6 +226,18 @@ class DatabaseService:
         """
         Obtiene artículos sin cluster de los últimos N días.
         """
+        if self.direct_sql:
+            try:
+                return self._fetch_json_rows("""
+                    SELECT to_json(a) FROM articles a
+                    WHERE a.cluster_id IS NULL
+                    AND a.created_at >= NOW() - make_interval(days => %s)
+                    ORDER BY a.published_at DESC
+                    LIMIT %s
+                """, (days, limit))
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
         from datetime import datetime, timedelta
         cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
         
@@ -121,11 +251,212 @@ class DatabaseService:
         
         return response.data or []
     
+    def iter_unclustered_articles(
+        self,
+        days: int = 7,
+        limit: int = 500,
+        page_size: int = 200,
+        exclude_claimed: bool = False
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Same selection as get_unclustered_articles, yielded in pages so the
+        caller can start encoding before the whole result set has arrived.
+        With exclude_claimed, articles under an active lease are skipped.
+        
+        With direct SQL the pages come from one server-side cursor (a single
+        snapshot, no offsets). If it fails, REST continues after the rows
+        already yielded.
+        """
+        offset = 0
+        if self.direct_sql:
+            pages = self._iter_unclustered_sql(days, limit, page_size, exclude_claimed)
+            try:
+                while True:
+                    try:
+                        page = next(pages)
+                    except StopIteration:
+                        return
+                    except Exception as e:
+                        logger.warning(f"Direct SQL read failed after {offset} articles, falling back to REST: {e}")
+                        break
+                    offset += len(page)
+                    yield page
+            finally:
+                pages.close()
+        
+        from datetime import datetime, timedelta
+        now = datetime.utcnow()
+        cutoff = (now - timedelta(days=days)).isoformat()
+        
+        while offset < limit:
+            size = min(page_size, limit - offset)
+            query = self.supabase.table("articles") \
+                .select("*") \
+                .is_("cluster_id", "null") \
+                .gte("created_at", cutoff)
+            if exclude_claimed:
+                query = query.or_(f"claimed_until.is.null,claimed_until.lt.{now.isoformat()}")
+            response = query \
+                .order("published_at", desc=True) \
+                .order("id") \
+                .range(offset, offset + size - 1) \
+                .execute()
+            
+            page = response.data or []
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            offset += len(page)
+    
+    def _iter_unclustered_sql(
+        self,
+        days: int,
+        limit: int,
+        page_size: int,
+        exclude_claimed: bool
+    ) -> Iterator[List[Dict[str, Any]]]:
+        with self.pg_connection() as conn:
+            with conn.cursor(name=f"unclustered_{uuid.uuid4().hex}") as cur:
+                cur.itersize = page_size
+                cur.execute(f"""
+                    SELECT to_json(a) FROM articles a
+                    WHERE a.cluster_id IS NULL
+                    AND a.created_at >= NOW() - make_interval(days => %s)
+                    {"AND (a.claimed_until IS NULL OR a.claimed_until < NOW())" if exclude_claimed else ""}
+                    ORDER BY a.published_at DESC, a.id
+                    LIMIT %s
+                """, (days, limit))
+                while True:
+                    rows = cur.fetchmany(page_size)
+                    if not rows:
+                        break
+                    try:
+                        yield [row[0] for row in rows]
+                    except GeneratorExit:
+                        # Caller stopped early: close the cursor and keep the connection
+                        return
+    
+    def claim_unclustered_articles(
+        self,
+        worker_id: str,
+        days: int = 7,
+        limit: int = 200,
+        lease_seconds: int = 600
+    ) -> List[Dict[str, Any]]:
+        """
+        Leases up to `limit` unclustered articles without an embedding
+        (FOR UPDATE SKIP LOCKED, see migration 011). Other replicas skip them
+        until they are released or the lease expires.
+        """
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "SELECT to_json(c) FROM claim_unclustered_articles(%s, %s, %s, %s) c",
+                            (worker_id, days, limit, lease_seconds)
+                        )
+                        claimed = [row[0] for row in cur.fetchall()]
+                    conn.commit()
+                return claimed
+            except Exception as e:
+                logger.warning(f"Direct SQL claim failed, falling back to REST: {e}")
+        
+        response = self.supabase.rpc("claim_unclustered_articles", {
+            "p_worker": worker_id,
+            "p_days": days,
+            "p_limit": limit,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        
+        return response.data or []
+    
+    def iter_claimed_articles(
+        self,
+        worker_id: str,
+        days: int = 7,
+        limit: int = 500,
+        page_size: int = 200,
+        lease_seconds: int = 600
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Claims pages of work until `limit` articles or nothing is left"""
+        claimed = 0
+        while claimed < limit:
+            size = min(page_size, limit - claimed)
+            page = self.claim_unclustered_articles(worker_id, days, size, lease_seconds)
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            claimed += len(page)
+    
+    def claim_articles(self, worker_id: str, article_ids: List[str], lease_seconds: int = 600) -> List[Dict[str, Any]]:
+        """
+        Leases the given articles (migration 016). Only unclustered articles
+        not leased by another worker are returned.
+        """
+        if not article_ids:
+            return []
+        
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "SELECT to_json(c) FROM claim_articles(%s, %s::uuid[], %s) c",
+                            (worker_id, article_ids, lease_seconds)
+                        )
+                        claimed = [row[0] for row in cur.fetchall()]
+                    conn.commit()
+                return claimed
+            except Exception as e:
+                logger.warning(f"Direct SQL claim failed, falling back to REST: {e}")
+        
+        response = self.supabase.rpc("claim_articles", {
+            "p_worker": worker_id,
+            "p_ids": article_ids,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        
+        return response.data or []
+    
+    def release_article_claims(self, worker_id: str, article_ids: List[str]) -> int:
+        """Releases this worker's leases on the given articles"""
+        if not article_ids:
+            return 0
+        
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT release_article_claims(%s, %s::uuid[])", (worker_id, article_ids))
+                        released = cur.fetchone()[0]
+                    conn.commit()
+                return released or 0
+            except Exception as e:
+                logger.warning(f"Direct SQL release failed, falling back to REST: {e}")
+        
+        response = self.supabase.rpc("release_article_claims", {
+            "p_worker": worker_id,
+            "p_ids": article_ids
+        }).execute()
+        
+        return response.data or 0
+    
     def get_articles_by_ids(self, article_ids: List[str]) -> List[Dict[str, Any]]:
         """Obtiene artículos por sus IDs"""
         if not article_ids:
             return []
         
+        if self.direct_sql:
+            try:
+                return self._fetch_json_rows(
+                    "SELECT to_json(a) FROM articles a WHERE a.id = ANY(%s::uuid[])", (article_ids,)
+                )
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
         response = self.supabase.table("articles") \
             .select("*") \
             .in_("id", article_ids) \
@@ -135,20 +466,31 @@ class DatabaseService:
     
     def update_article_cluster(self, article_id: str, cluster_id: str):
         """Asigna un artículo a un cluster"""
-        self.supabase.table("articles") \
-            .update({"cluster_id": cluster_id}) \
-            .eq("id", article_id) \
-            .execute()
+        self.update_articles_cluster([article_id], cluster_id)
     
-    def update_articles_cluster(self, article_ids: List[str], cluster_id: str):
-        """Asigna múltiples artículos a un cluster"""
+    def update_articles_cluster(self, article_ids: List[str], cluster_id: Optional[str]):
+        """Asigna múltiples artículos a un cluster (None los desasigna)"""
         if not article_ids:
             return
         
-        self.supabase.table("articles") \
-            .update({"cluster_id": cluster_id}) \
-            .in_("id", article_ids) \
-            .execute()
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "UPDATE articles SET cluster_id = %s::uuid WHERE id = ANY(%s::uuid[])",
+                            (cluster_id, article_ids)
+                        )
+                    conn.commit()
+                return
+            except Exception as e:
+                logger.warning(f"Direct SQL update failed, falling back to REST: {e}")
+        
+        for i in range(0, len(article_ids), 100):
+            self.supabase.table("articles") \
+                .update({"cluster_id": cluster_id}) \
+                .in_("id", article_ids[i:i + 100]) \
+                .execute()
     
     def mark_articles_as_duplicate(self, article_ids: List[str], keep_id: str):
         """
@@ -162,6 +504,17 @@ class DatabaseService:
     
     def get_recent_clusters(self, days: int = 7, limit: int = 100) -> List[Dict[str, Any]]:
         """Obtiene clusters recientes"""
+        if self.direct_sql:
+            try:
+                return self._fetch_json_rows("""
+                    SELECT to_json(c) FROM clusters c
+                    WHERE c.window_end >= NOW() - make_interval(days => %s)
+                    ORDER BY c.updated_at DESC
+                    LIMIT %s
+                """, (days, limit))
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
         from datetime import datetime, timedelta
         cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
         
@@ -187,10 +540,14 @@ class DatabaseService:
         severity: int = 50,
         confidence: int = 50,
         entities: Optional[Dict] = None,
-        embedding: Optional[np.ndarray] = None
+        embedding: Optional[np.ndarray] = None,
+        cluster_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Crea un nuevo cluster.
+        
+        With cluster_id the insert is idempotent: if that cluster already
+        exists it is kept as is (a resumed run repeating its create stage).
         """
         data = {
             "canonical_title": canonical_title,
@@ -206,11 +563,50 @@ class DatabaseService:
             "entities": entities or {}
         }
         
-        response = self.supabase.table("clusters") \
-            .insert(data) \
-            .execute()
+        if self.direct_sql:
+            try:
+                # Fila y centroide en la misma transacción
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            INSERT INTO clusters AS c (
+                                id, canonical_title, summary, countries, topics,
+                                article_count, source_count, window_start, window_end,
+                                severity, confidence, entities
+                            )
+                            VALUES (COALESCE(%s::uuid, uuid_generate_v4()), %s, %s, %s::text[], %s::text[], %s, %s,
+                                    %s::timestamptz, %s::timestamptz, %s, %s, %s::jsonb)
+                            ON CONFLICT (id) DO NOTHING
+                            RETURNING to_json(c)
+                        """, (
+                            cluster_id, canonical_title, summary, countries, topics,
+                            article_count, source_count, window_start, window_end,
+                            severity, confidence, Json(data["entities"])
+                        ))
+                        row = cur.fetchone()
+                        cluster = row[0] if row else {"id": cluster_id, **data}
+                        if embedding is not None:
+                            cur.execute("""
+                                INSERT INTO cluster_embeddings (cluster_id, embedding)
+                                VALUES (%s::uuid, %s::vector)
+                                ON CONFLICT (cluster_id)
+                                DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
+                            """, (cluster["id"], np.asarray(embedding).tolist()))
+                    conn.commit()
+                return cluster
+            except Exception as e:
+                logger.warning(f"Direct SQL insert failed, falling back to REST: {e}")
         
-        cluster = response.data[0] if response.data else None
+        if cluster_id:
+            response = self.supabase.table("clusters") \
+                .upsert({"id": cluster_id, **data}, on_conflict="id", ignore_duplicates=True) \
+                .execute()
+            cluster = response.data[0] if response.data else {"id": cluster_id, **data}
+        else:
+            response = self.supabase.table("clusters") \
+                .insert(data) \
+                .execute()
+            cluster = response.data[0] if response.data else None
         
         # Si tenemos embedding, guardarlo en pgvector
         if cluster and embedding is not None:
@@ -220,18 +616,375 @@ class DatabaseService:
     
     def update_cluster(self, cluster_id: str, data: Dict[str, Any]):
         """Actualiza un cluster"""
+        if not data:
+            return
+        
+        if self.direct_sql:
+            try:
+                from psycopg2 import sql
+                
+                assignments = sql.SQL(", ").join(
+                    sql.SQL("{} = %s").format(sql.Identifier(column)) for column in data
+                )
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            sql.SQL("UPDATE clusters SET {} WHERE id = %s::uuid").format(assignments),
+                            [Json(v) if isinstance(v, dict) else v for v in data.values()] + [cluster_id]
+                        )
+                    conn.commit()
+                return
+            except Exception as e:
+                logger.warning(f"Direct SQL update failed, falling back to REST: {e}")
+        
         self.supabase.table("clusters") \
             .update(data) \
             .eq("id", cluster_id) \
             .execute()
     
+    def create_clusters_bulk(self, clusters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Crea varios clusters en una sola transacción.
+        
+        Each item has the create_cluster fields plus "embedding" (centroid) and
+        "article_ids" (members). Cluster rows, centroids and article assignments
+        are written over one PostgreSQL connection and committed together, so a
+        failure leaves nothing half-created. Items may carry their "id"
+        (generated here otherwise); clusters that already exist are left as
+        they are, so repeating the same call is harmless.
+        
+        Without DATABASE_URL (or if the transaction fails) it falls back to
+        create_cluster + update_articles_cluster per cluster.
+        
+        Returns:
+            Created clusters ({"id": ..., **fields}) in input order; None where a
+            REST fallback insert returned no row
+        """
+        if not clusters:
+            return []
+        
+        rows = [
+            {
+                "id": c.get("id") or str(uuid.uuid4()),
+                "canonical_title": c["canonical_title"],
+                "summary": c["summary"],
+                "countries": c["countries"],
+                "topics": c["topics"],
+                "article_count": c["article_count"],
+                "source_count": c["source_count"],
+                "window_start": c["window_start"],
+                "window_end": c["window_end"],
+                "severity": c.get("severity", 50),
+                "confidence": c.get("confidence", 50),
+                "entities": c.get("entities") or {}
+            }
+            for c in clusters
+        ]
+        
+        if Config.DATABASE_URL:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        execute_values(
+                            cur,
+                            """
+                            INSERT INTO clusters (
+                                id, canonical_title, summary, countries, topics,
+                                article_count, source_count, window_start, window_end,
+                                severity, confidence, entities
+                            )
+                            VALUES %s
+                            ON CONFLICT (id) DO NOTHING
+                            """,
+                            [
+                                (r["id"], r["canonical_title"], r["summary"], r["countries"], r["topics"],
+                                 r["article_count"], r["source_count"], r["window_start"], r["window_end"],
+                                 r["severity"], r["confidence"], Json(r["entities"]))
+                                for r in rows
+                            ],
+                            template="(%s::uuid, %s, %s, %s::text[], %s::text[], %s, %s, "
+                                     "%s::timestamptz, %s::timestamptz, %s, %s, %s::jsonb)"
+                        )
+                        
+                        centroids = [
+                            (r["id"], np.asarray(c["embedding"]).tolist())
+                            for r, c in zip(rows, clusters)
+                            if c.get("embedding") is not None
+                        ]
+                        if centroids:
+                            execute_values(
+                                cur,
+                                """
+                                INSERT INTO cluster_embeddings (cluster_id, embedding)
+                                VALUES %s
+                                ON CONFLICT (cluster_id)
+                                DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
+                                """,
+                                centroids,
+                                template="(%s::uuid, %s::vector)"
+                            )
+                        
+                        members = [
+                            (aid, r["id"])
+                            for r, c in zip(rows, clusters)
+                            for aid in c.get("article_ids", [])
+                        ]
+                        if members:
+                            execute_values(
+                                cur,
+                                """
+                                UPDATE articles AS a
+                                SET cluster_id = v.cluster_id
+                                FROM (VALUES %s) AS v(article_id, cluster_id)
+                                WHERE a.id = v.article_id
+                                """,
+                                members,
+                                template="(%s::uuid, %s::uuid)",
+                                page_size=1000
+                            )
+                    conn.commit()
+                
+                logger.info(f"Creados {len(rows)} clusters en una transacción")
+                return rows
+            except Exception as e:
+                logger.warning(f"Bulk cluster insert failed, falling back to REST: {e}")
+        
+        created = []
+        for c in clusters:
+            fields = {
+                k: v for k, v in c.items() if k not in ("id", "embedding", "article_ids", "representative_ids")
+            }
+            cluster = self.create_cluster(**fields, embedding=c.get("embedding"), cluster_id=c.get("id"))
+            if cluster:
+                self.update_articles_cluster(c.get("article_ids", []), cluster["id"])
+            created.append(cluster)
+        return created
+    
+    def update_clusters_bulk(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        """
+        Aplica las actualizaciones de enriquecimiento de varios clusters en una
+        sola sentencia. Every update carries the same fields (see
+        app.enrichment_update). Falls back to update_cluster per cluster.
+        """
+        if not updates:
+            return
+        
+        if Config.DATABASE_URL:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        execute_values(
+                            cur,
+                            """
+                            UPDATE clusters AS c
+                            SET canonical_title = v.canonical_title,
+                                summary = v.summary,
+                                countries = v.countries,
+                                topics = v.topics,
+                                severity = v.severity,
+                                confidence = v.confidence,
+                                entities = v.entities,
+                                updated_at = NOW()
+                            FROM (VALUES %s) AS v(
+                                id, canonical_title, summary, countries, topics,
+                                severity, confidence, entities
+                            )
+                            WHERE c.id = v.id
+                            """,
+                            [
+                                (cid, d["canonical_title"], d["summary"], d["countries"], d["topics"],
+                                 d["severity"], d["confidence"], Json(d["entities"]))
+                                for cid, d in updates
+                            ],
+                            template="(%s::uuid, %s, %s, %s::text[], %s::text[], %s::int, %s::int, %s::jsonb)"
+                        )
+                    conn.commit()
+                logger.info(f"Actualizados {len(updates)} clusters enriquecidos")
+                return
+            except Exception as e:
+                logger.warning(f"Bulk cluster update failed, falling back to REST: {e}")
+        
+        for cluster_id, data in updates:
+            try:
+                self.update_cluster(cluster_id, data)
+            except Exception as e:
+                logger.error(f"Error updating cluster {cluster_id}: {e}")
+    
+    def unassign_all_articles(self) -> int:
+        """Clears cluster_id on every article; returns how many were unassigned"""
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("UPDATE articles SET cluster_id = NULL WHERE cluster_id IS NOT NULL")
+                        unassigned = cur.rowcount
+                    conn.commit()
+                return unassigned
+            except Exception as e:
+                logger.warning(f"Direct SQL update failed, falling back to REST: {e}")
+        
+        unassigned = 0
+        # Page through the articles still assigned until none are left (a
+        # single select is capped by PostgREST's max rows)
+        while True:
+            response = self.supabase.table("articles").select("id").not_.is_("cluster_id", "null").limit(1000).execute()
+            article_ids = [a["id"] for a in (response.data or [])]
+            if not article_ids:
+                return unassigned
+            
+            page_unassigned = 0
+            # Update in smaller batches (long URLs cause 400 errors)
+            BATCH_SIZE = 50
+            for i in range(0, len(article_ids), BATCH_SIZE):
+                batch = article_ids[i:i + BATCH_SIZE]
+                try:
+                    self.supabase.table("articles").update({"cluster_id": None}).in_("id", batch).execute()
+                    page_unassigned += len(batch)
+                except Exception as e:
+                    logger.warning(f"Error actualizando batch {i//BATCH_SIZE + 1}: {e}")
+                    # Continuar con el siguiente batch
+            if not page_unassigned:
+                # Every batch failed: stop instead of selecting the same page again
+                return unassigned
+            unassigned += page_unassigned
+    
+    def delete_all_clusters(self) -> int:
+        """Deletes every cluster; returns how many were deleted"""
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("DELETE FROM clusters")
+                        deleted = cur.rowcount
+                    conn.commit()
+                return deleted
+            except Exception as e:
+                logger.warning(f"Direct SQL delete failed, falling back to REST: {e}")
+        
+        deleted = 0
+        # Page through the remaining clusters until none are left
+        while True:
+            response = self.supabase.table("clusters").select("id").limit(1000).execute()
+            cluster_ids = [c["id"] for c in (response.data or [])]
+            if not cluster_ids:
+                return deleted
+            
+            page_deleted = 0
+            # Delete in smaller batches (long URLs cause 400 errors)
+            BATCH_SIZE = 50
+            for i in range(0, len(cluster_ids), BATCH_SIZE):
+                batch = cluster_ids[i:i + BATCH_SIZE]
+                try:
+                    self.supabase.table("clusters").delete().in_("id", batch).execute()
+                    page_deleted += len(batch)
+                except Exception as e:
+                    logger.warning(f"Error deleting batch {i//BATCH_SIZE + 1}: {e}")
+                    # Continuar con el siguiente batch
+            if not page_deleted:
+                # Every batch failed: stop instead of selecting the same page again
+                return deleted
+            deleted += page_deleted
+    
+    def merge_clusters(self, merges: List[Tuple[str, List[str]]]) -> int:
+        """
+        Merge each list of absorbed clusters into its surviving cluster, in
+        one transaction: articles, entity mentions and market links move to
+        the survivor, which takes the union of windows, countries and topics
+        and gets its counts and centroid recomputed; the absorbed clusters are
+        deleted. Requires DATABASE_URL.
+        
+        Returns:
+            Articles moved
+        """
+        pairs = [(source, target) for target, absorbed in merges for source in absorbed if source != target]
+        if not pairs:
+            return 0
+        
+        with self.pg_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE cluster_merges (source UUID PRIMARY KEY, target UUID NOT NULL)
+                    ON COMMIT DROP
+                """)
+                execute_values(cur, "INSERT INTO cluster_merges (source, target) VALUES %s", pairs,
+                               template="(%s::uuid, %s::uuid)")
+                
+                cur.execute("""
+                    UPDATE articles a SET cluster_id = m.target
+                    FROM cluster_merges m
+                    WHERE a.cluster_id = m.source
+                """)
+                moved = cur.rowcount
+                cur.execute("""
+                    UPDATE entity_mentions e SET cluster_id = m.target
+                    FROM cluster_merges m
+                    WHERE e.cluster_id = m.source
+                """)
+                # One link per (symbol, cluster): keep the oldest, the rest go with the deleted clusters
+                cur.execute("""
+                    UPDATE market_event_links l SET cluster_id = m.target
+                    FROM cluster_merges m
+                    WHERE l.cluster_id = m.source
+                    AND NOT EXISTS (
+                        SELECT 1 FROM market_event_links x
+                        WHERE x.symbol_id = l.symbol_id AND x.cluster_id = m.target
+                    )
+                    AND l.id = (
+                        SELECT x.id FROM market_event_links x
+                        JOIN cluster_merges mx ON mx.source = x.cluster_id
+                        WHERE x.symbol_id = l.symbol_id AND mx.target = m.target
+                        ORDER BY x.created_at, x.id
+                        LIMIT 1
+                    )
+                """)
+                
+                cur.execute("""
+                    UPDATE clusters t SET
+                        window_start = LEAST(t.window_start, g.window_start),
+                        window_end = GREATEST(t.window_end, g.window_end),
+                        countries = ARRAY(
+                            SELECT DISTINCT x FROM clusters c, unnest(c.countries) x
+                            WHERE c.id = t.id OR c.id = ANY(g.sources) ORDER BY x
+                        ),
+                        topics = ARRAY(
+                            SELECT DISTINCT x FROM clusters c, unnest(c.topics) x
+                            WHERE c.id = t.id OR c.id = ANY(g.sources) ORDER BY x
+                        ),
+                        article_count = (SELECT COUNT(*) FROM articles a WHERE a.cluster_id = t.id),
+                        source_count = (SELECT COUNT(DISTINCT a.source_id) FROM articles a WHERE a.cluster_id = t.id),
+                        updated_at = NOW()
+                    FROM (
+                        SELECT m.target, array_agg(m.source) AS sources,
+                               MIN(c.window_start) AS window_start, MAX(c.window_end) AS window_end
+                        FROM cluster_merges m
+                        JOIN clusters c ON c.id = m.source
+                        GROUP BY m.target
+                    ) g
+                    WHERE t.id = g.target
+                """)
+                cur.execute("""
+                    INSERT INTO cluster_embeddings (cluster_id, embedding)
+                    SELECT a.cluster_id, AVG(ae.embedding)
+                    FROM articles a
+                    JOIN article_embeddings ae ON ae.article_id = a.id
+                    WHERE a.cluster_id IN (SELECT DISTINCT target FROM cluster_merges)
+                    GROUP BY a.cluster_id
+                    ON CONFLICT (cluster_id)
+                    DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
+                """)
+                # cluster_embeddings, la cola de re-enriquecimiento y los links restantes van en cascada
+                cur.execute("DELETE FROM clusters WHERE id IN (SELECT source FROM cluster_merges)")
+            conn.commit()
+        
+        logger.info(f"Merged {len(pairs)} clusters into {len({t for _, t in pairs})}, {moved} articles moved")
+        return moved
+    
     # ==================== EMBEDDINGS (pgvector) ====================
     
     def store_article_embedding(self, article_id: str, embedding: np.ndarray):
         """Guarda el embedding de un artículo"""
         try:
-            conn = self._get_pg_connection()
-            try:
+            with self.pg_connection() as conn:
                 with conn.cursor() as cur:
                     # Upsert embedding
                     cur.execute("""
@@ -241,15 +994,6 @@ class DatabaseService:
                         DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
                     """, (article_id, embedding.tolist()))
                     conn.commit()
-            except Exception as e:
-                # Si hay un error, hacer rollback y reiniciar la conexión
-                try:
-                    conn.rollback()
-                except:
-                    pass
-                # Marcar la conexión como inválida para que se reinicie en el próximo intento
-                self._pg_conn = None
-                raise
         except Exception as e:
             logger.warning(f"No se pudo guardar embedding (pgvector no disponible): {e}")
             # No lanzar error, solo loguear
@@ -264,8 +1008,7 @@ class DatabaseService:
             return
         
         try:
-            conn = self._get_pg_connection()
-            try:
+            with self.pg_connection() as conn:
                 with conn.cursor() as cur:
                     data = [(aid, emb.tolist()) for aid, emb in zip(article_ids, embeddings)]
                     execute_values(
@@ -281,15 +1024,6 @@ class DatabaseService:
                     )
                     conn.commit()
                     logger.info(f"Guardados {len(article_ids)} embeddings de artículos")
-            except Exception as e:
-                # Si hay un error, hacer rollback y reiniciar la conexión
-                try:
-                    conn.rollback()
-                except:
-                    pass
-                # Marcar la conexión como inválida para que se reinicie en el próximo intento
-                self._pg_conn = None
-                raise
         except Exception as e:
             logger.warning(f"No se pudieron guardar embeddings (pgvector no disponible): {e}")
             # Continuar sin embeddings, el clustering seguirá funcionando
@@ -297,8 +1031,7 @@ class DatabaseService:
     def store_cluster_embedding(self, cluster_id: str, embedding: np.ndarray):
         """Guarda el embedding de un cluster (centroide)"""
         try:
-            conn = self._get_pg_connection()
-            try:
+            with self.pg_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("""
                         INSERT INTO cluster_embeddings (cluster_id, embedding)
@@ -307,50 +1040,79 @@ class DatabaseService:
                         DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
                     """, (cluster_id, embedding.tolist()))
                     conn.commit()
-            except Exception as e:
-                # Si hay un error, hacer rollback y reiniciar la conexión
-                try:
-                    conn.rollback()
-                except:
-                    pass
-                # Marcar la conexión como inválida para que se reinicie en el próximo intento
-                self._pg_conn = None
-                raise
         except Exception as e:
             logger.warning(f"No se pudo guardar embedding de cluster (pgvector no disponible): {e}")
             # No lanzar error, el clustering seguirá funcionando sin embeddings
     
+    def _set_vector_search_params(self, cur, k: int):
+        """
+        Per-transaction ANN search settings (SET LOCAL). Only the parameter of
+        the index type in use matters; hnsw.ef_search must be >= k or the scan
+        returns fewer than k rows.
+        """
+        cur.execute(
+            "SELECT set_config('ivfflat.probes', %s, true), set_config('hnsw.ef_search', %s, true)",
+            (str(Config.VECTOR_IVFFLAT_PROBES), str(max(Config.VECTOR_HNSW_EF_SEARCH, k)))
+        )
+    
     def find_similar_clusters(
         self,
         embedding: np.ndarray,
         threshold: float = 0.75,
-        limit: int = 5
+        limit: int = 5,
+        window_days: Optional[int] = None
     ) -> List[Tuple[str, float]]:
         """
         Encuentra clusters similares usando pgvector.
         
+        The inner query is a plain `ORDER BY embedding <=> q LIMIT k` so the
+        ivfflat/HNSW index can serve it; the time window (clusters whose
+        window_end is within `window_days`, default CLUSTER_MATCH_DAYS) and
+        the threshold are applied to those k nearest centroids (k = VECTOR_SEARCH_CANDIDATES,
+        at least `limit`). Old centroids stay in the index, so when fewer than
+        `limit` recent ones pass while the k-th candidate is still within the
+        threshold, k is widened (up to _VECTOR_SEARCH_MAX_CANDIDATES) and the
+        search repeated.
+        
         Returns:
             Lista de (cluster_id, similarity_score)
         """
+        candidates = max(limit, Config.VECTOR_SEARCH_CANDIDATES)
+        if window_days is None:
+            window_days = Config.CLUSTER_MATCH_DAYS
         try:
-            conn = self._get_pg_connection()
-            with conn.cursor() as cur:
-                # Usar operador <=> para distancia coseno
-                # 1 - distancia = similitud
-                cur.execute("""
-                    SELECT 
-                        ce.cluster_id,
-                        1 - (ce.embedding <=> %s::vector) as similarity
-                    FROM cluster_embeddings ce
-                    JOIN clusters c ON c.id = ce.cluster_id
-                    WHERE c.window_end > NOW() - INTERVAL '7 days'
-                    AND 1 - (ce.embedding <=> %s::vector) >= %s
-                    ORDER BY similarity DESC
-                    LIMIT %s
-                """, (embedding.tolist(), embedding.tolist(), threshold, limit))
-                
-                results = cur.fetchall()
-                return [(row[0], row[1]) for row in results]
+            with self.pg_connection() as conn, conn.cursor() as cur:
+                while True:
+                    self._set_vector_search_params(cur, candidates)
+                    # Usar operador <=> para distancia coseno
+                    # 1 - distancia = similitud
+                    cur.execute("""
+                        SELECT nn.cluster_id, nn.distance, c.window_end > NOW() - make_interval(days => %s)
+                        FROM (
+                            SELECT ce.cluster_id, ce.embedding <=> %s::vector as distance
+                            FROM cluster_embeddings ce
+                            ORDER BY distance
+                            LIMIT %s
+                        ) nn
+                        LEFT JOIN clusters c ON c.id = nn.cluster_id
+                        ORDER BY nn.distance
+                    """, (window_days, embedding.tolist(), candidates))
+                    rows = cur.fetchall()
+                    
+                    results = [
+                        (row[0], 1 - row[1])
+                        for row in rows
+                        if row[2] and row[1] <= 1 - threshold
+                    ][:limit]
+                    if (
+                        len(results) >= limit
+                        or len(rows) < candidates
+                        or rows[-1][1] > 1 - threshold
+                        or candidates >= self._VECTOR_SEARCH_MAX_CANDIDATES
+                    ):
+                        return results
+                    # Centroides antiguos ocupan los candidatos: ampliar k
+                    candidates = min(candidates * 4, self._VECTOR_SEARCH_MAX_CANDIDATES)
         except Exception as e:
             logger.warning(f"Búsqueda de clusters similares no disponible (pgvector no configurado): {e}")
             return []  # Retornar lista vacía, el clustering seguirá funcionando
@@ -364,22 +1126,207 @@ class DatabaseService:
             return {}
         
         try:
-            conn = self._get_pg_connection()
-            with conn.cursor() as cur:
+            with self.pg_connection() as conn, conn.cursor() as cur:
                 cur.execute("""
-                    SELECT article_id, embedding
+                    SELECT article_id, embedding::text
                     FROM article_embeddings
-                    WHERE article_id = ANY(%s)
+                    WHERE article_id = ANY(%s::uuid[])
                 """, (article_ids,))
                 
-                results = {}
-                for row in cur.fetchall():
-                    results[row[0]] = np.array(row[1])
-                return results
+                rows = cur.fetchall()
+                vectors = _parse_vectors([row[1] for row in rows])
+                return {str(row[0]): vector for row, vector in zip(rows, vectors)}
         except Exception as e:
             logger.error(f"Error obteniendo embeddings: {e}")
             return {}
     
+    def get_recent_cluster_centroids(self, days: int = 7) -> Tuple[List[str], np.ndarray]:
+        """
+        Centroids of the clusters find_similar_clusters considers (window_end
+        in the last `days`), for in-memory matching.
+        
+        Returns:
+            Tuple (cluster_ids, centroid_matrix)
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT ce.cluster_id::text, ce.embedding::text
+                FROM cluster_embeddings ce
+                JOIN clusters c ON c.id = ce.cluster_id
+                WHERE c.window_end > NOW() - make_interval(days => %s)
+            """, (days,))
+            rows = cur.fetchall()
+        if not rows:
+            return [], np.empty((0, Config.EMBEDDING_DIM), dtype=np.float32)
+        return [row[0] for row in rows], _parse_vectors([row[1] for row in rows])
+    
+    def store_model_embeddings(self, model: str, article_ids: List[str], embeddings: np.ndarray):
+        """Vectors of a secondary (cascade) model, tagged by model name (migration 015)"""
+        if len(article_ids) == 0:
+            return
+    
+        try:
+            with self.pg_connection() as conn, conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO article_model_embeddings (article_id, model, embedding)
+                    VALUES %s
+                    ON CONFLICT (article_id, model)
+                    DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
+                    """,
+                    [(aid, model, emb.tolist()) for aid, emb in zip(article_ids, embeddings)],
+                    template="(%s, %s, %s::vector)"
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not store {model} embeddings: {e}")
+    
+    def get_model_cluster_centroids(self, model: str, days: int = 7) -> Tuple[List[str], np.ndarray]:
+        """
+        get_recent_cluster_centroids in the space of a secondary model: the
+        average of the members' vectors of that model, per cluster.
+    
+        Returns:
+            Tuple (cluster_ids, centroid_matrix)
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT a.cluster_id::text, AVG(me.embedding)::text
+                FROM clusters c
+                JOIN articles a ON a.cluster_id = c.id
+                JOIN article_model_embeddings me ON me.article_id = a.id AND me.model = %s
+                WHERE c.window_end > NOW() - make_interval(days => %s)
+                GROUP BY a.cluster_id
+            """, (model, days))
+            rows = cur.fetchall()
+        return [row[0] for row in rows], _parse_vectors([row[1] for row in rows])
+    
+    def get_recent_model_embeddings(
+        self,
+        model: str,
+        days: int = 3,
+        updated_since: Optional[datetime] = None
+    ) -> List[Tuple[str, datetime, datetime, np.ndarray]]:
+        """get_recent_article_embeddings for the vectors of a secondary (cascade) model"""
+        try:
+            with self.pg_connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT article_id, created_at, updated_at, embedding::text
+                    FROM article_model_embeddings
+                    WHERE model = %s
+                      AND created_at >= NOW() - make_interval(days => %s)
+                      AND (%s::timestamptz IS NULL OR updated_at > %s::timestamptz)
+                    ORDER BY updated_at
+                """, (model, days, updated_since, updated_since))
+                
+                rows = cur.fetchall()
+                vectors = _parse_vectors([row[3] for row in rows])
+                return [
+                    (str(row[0]), row[1], row[2], vector)
+                    for row, vector in zip(rows, vectors)
+                ]
+        except Exception as e:
+            logger.warning(f"Could not read recent {model} embeddings: {e}")
+            return []
+    
+    def get_articles_missing_embeddings(self, model: str, days: int = 7, limit: int = 5000) -> List[str]:
+        """
+        Clustered articles of the last `days` with a `model` vector but no
+        primary one (settled by the cascade, backfill still pending).
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT me.article_id::text
+                FROM article_model_embeddings me
+                JOIN articles a ON a.id = me.article_id
+                WHERE me.model = %s
+                  AND me.created_at >= NOW() - make_interval(days => %s)
+                  AND a.cluster_id IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM article_embeddings ae WHERE ae.article_id = me.article_id)
+                ORDER BY me.created_at
+                LIMIT %s
+            """, (model, days, limit))
+            return [row[0] for row in cur.fetchall()]
+    
+    def get_active_cluster_members(self, days: int = 7) -> Tuple[List[str], List[str], np.ndarray]:
+        """
+        Member embeddings of every cluster active in the last `days` (window_end),
+        in one read, grouped by cluster. Requires DATABASE_URL.
+        
+        Returns:
+            Tuple (cluster_id per row, article_id per row, embeddings_matrix)
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT a.cluster_id::text, a.id::text, ae.embedding::text
+                FROM clusters c
+                JOIN articles a ON a.cluster_id = c.id
+                JOIN article_embeddings ae ON ae.article_id = a.id
+                WHERE c.window_end > NOW() - make_interval(days => %s)
+                ORDER BY a.cluster_id, a.id
+            """, (days,))
+            rows = cur.fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows], _parse_vectors([row[2] for row in rows])
+    
+    def get_recent_article_embeddings(
+        self,
+        days: int = 3,
+        updated_since: Optional[datetime] = None
+    ) -> List[Tuple[str, datetime, datetime, np.ndarray]]:
+        """
+        Article embeddings created in the last `days`, optionally only those
+        written after `updated_since` (incremental refresh of the recent index).
+        Returns (article_id, created_at, updated_at, embedding) by updated_at.
+        """
+        if not Config.DATABASE_URL:
+            return []
+        
+        try:
+            with self.pg_connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT article_id, created_at, updated_at, embedding::text
+                    FROM article_embeddings
+                    WHERE created_at >= NOW() - make_interval(days => %s)
+                      AND (%s::timestamptz IS NULL OR updated_at > %s::timestamptz)
+                    ORDER BY updated_at
+                """, (days, updated_since, updated_since))
+                
+                rows = cur.fetchall()
+                vectors = _parse_vectors([row[3] for row in rows])
+                return [
+                    (str(row[0]), row[1], row[2], vector)
+                    for row, vector in zip(rows, vectors)
+                ]
+        except Exception as e:
+            logger.warning(f"No se pudieron leer embeddings recientes: {e}")
+            return []
+    
+    def get_article_clusters(self, article_ids: List[str]) -> Dict[str, Optional[str]]:
+        """cluster_id (or None) of each article"""
+        if not article_ids:
+            return {}
+        
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn, conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT id::text, cluster_id::text FROM articles WHERE id = ANY(%s::uuid[])",
+                        (article_ids,)
+                    )
+                    return dict(cur.fetchall())
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
+        clusters: Dict[str, Optional[str]] = {}
+        for i in range(0, len(article_ids), 100):
+            response = self.supabase.table("articles") \
+                .select("id, cluster_id") \
+                .in_("id", article_ids[i:i + 100]) \
+                .execute()
+            clusters.update({a["id"]: a.get("cluster_id") for a in (response.data or [])})
+        return clusters
+    
     def get_cluster_articles_embeddings(
         self,
         cluster_id: str
@@ -390,6 +1337,24 @@ class DatabaseService:
         Returns:
             Tuple (article_ids, embeddings_matrix)
         """
+        if self.direct_sql:
+            try:
+                # Un solo JOIN en lugar de ids por REST + embeddings por SQL
+                with self.pg_connection() as conn, conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT a.id::text, ae.embedding::text
+                        FROM articles a
+                        JOIN article_embeddings ae ON ae.article_id = a.id
+                        WHERE a.cluster_id = %s::uuid
+                        ORDER BY a.id
+                    """, (cluster_id,))
+                    rows = cur.fetchall()
+                if not rows:
+                    return [], np.array([])
+                return [row[0] for row in rows], _parse_vectors([row[1] for row in rows])
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
         try:
             # Primero obtener IDs de artículos del cluster
             response = self.supabase.table("articles") \
@@ -413,3 +1378,451 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error obteniendo embeddings del cluster: {e}")
             return [], np.array([])
+    
+    # Metadata columns of iter_article_embeddings (in SELECT order)
+    EXPORT_COLUMNS = (
+        "article_id", "cluster_id", "title", "source_id", "domain", "language",
+        "published_at", "created_at", "countries", "topics",
+        "cluster_title", "cluster_severity", "cluster_article_count"
+    )
+    
+    def iter_article_embeddings(
+        self,
+        days: int = 7,
+        page_size: int = 5000,
+        clustered_only: bool = False
+    ) -> Iterator[Tuple[Dict[str, List[Any]], np.ndarray]]:
+        """
+        Embeddings of the articles created in the last `days` with their
+        metadata and cluster, oldest first, one page at a time through a
+        server-side cursor (bounded memory for any window). Requires DATABASE_URL.
+        
+        Yields:
+            Tuple ({column: values} for EXPORT_COLUMNS, float32 embeddings_matrix)
+        """
+        with self.pg_connection() as conn:
+            with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+                cur.itersize = page_size
+                cur.execute(f"""
+                    SELECT
+                        ae.article_id::text, a.cluster_id::text, a.title, a.source_id::text,
+                        a.domain, a.language, a.published_at, a.created_at, a.countries, a.topics,
+                        c.canonical_title, c.severity, c.article_count,
+                        ae.embedding::text
+                    FROM article_embeddings ae
+                    JOIN articles a ON a.id = ae.article_id
+                    LEFT JOIN clusters c ON c.id = a.cluster_id
+                    WHERE a.created_at >= NOW() - make_interval(days => %s)
+                    {"AND a.cluster_id IS NOT NULL" if clustered_only else ""}
+                    ORDER BY a.created_at, a.id
+                """, (days,))
+                while True:
+                    rows = cur.fetchmany(page_size)
+                    if not rows:
+                        break
+                    columns = dict(zip(self.EXPORT_COLUMNS, (list(col) for col in zip(*rows))))
+                    embeddings = _parse_vectors([row[-1] for row in rows])
+                    try:
+                        yield columns, embeddings
+                    except GeneratorExit:
+                        return
+    
+    # ==================== RE-ENRICHMENT (migración 012) ====================
+    
+    def refresh_cluster_stats(self, cluster_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Recompute article_count and the centroid of clusters that gained
+        articles, and return them with their last-enrichment baseline.
+        Clusters without a baseline (created before migration 012) take the
+        current values as baseline.
+        
+        Returns:
+            Dicts with id, article_count, centroid, enriched_article_count,
+            enriched_embedding (None if unknown) and enriched_at
+        """
+        if not cluster_ids or not Config.DATABASE_URL:
+            return []
+        
+        try:
+            with self.pg_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        WITH members AS (
+                            SELECT a.cluster_id, COUNT(*) AS n, AVG(ae.embedding) AS centroid
+                            FROM articles a
+                            LEFT JOIN article_embeddings ae ON ae.article_id = a.id
+                            WHERE a.cluster_id = ANY(%s::uuid[])
+                            GROUP BY a.cluster_id
+                        ),
+                        counted AS (
+                            UPDATE clusters c
+                            SET article_count = m.n,
+                                enriched_article_count = COALESCE(c.enriched_article_count, m.n)
+                            FROM members m
+                            WHERE c.id = m.cluster_id
+                            RETURNING c.id, c.article_count, c.enriched_article_count, c.enriched_at
+                        )
+                        SELECT counted.id, counted.article_count, counted.enriched_article_count,
+                               counted.enriched_at, m.centroid::text, ce.enriched_embedding::text
+                        FROM counted
+                        JOIN members m ON m.cluster_id = counted.id
+                        LEFT JOIN cluster_embeddings ce ON ce.cluster_id = counted.id
+                    """, (cluster_ids,))
+                    
+                    stats = []
+                    for row in cur.fetchall():
+                        centroid = None
+                        if row[4] is not None:
+                            centroid = _parse_vectors([row[4]])[0]
+                            norm = np.linalg.norm(centroid)
+                            centroid = centroid / norm if norm else centroid
+                        stats.append({
+                            "id": str(row[0]),
+                            "article_count": row[1],
+                            "enriched_article_count": row[2],
+                            "enriched_at": row[3],
+                            "centroid": centroid,
+                            "enriched_embedding": (
+                                _parse_vectors([row[5]])[0] if row[5] is not None else None
+                            )
+                        })
+                    
+                    # Centroides actualizados (también los usa find_similar_clusters)
+                    centroids = [(s["id"], s["centroid"].tolist()) for s in stats if s["centroid"] is not None]
+                    if centroids:
+                        execute_values(
+                            cur,
+                            """
+                            INSERT INTO cluster_embeddings (cluster_id, embedding, enriched_embedding)
+                            VALUES %s
+                            ON CONFLICT (cluster_id)
+                            DO UPDATE SET embedding = EXCLUDED.embedding,
+                                          enriched_embedding = COALESCE(
+                                              cluster_embeddings.enriched_embedding, EXCLUDED.embedding
+                                          ),
+                                          updated_at = NOW()
+                            """,
+                            [(cid, centroid, centroid) for cid, centroid in centroids],
+                            template="(%s::uuid, %s::vector, %s::vector)"
+                        )
+                conn.commit()
+            return stats
+        except Exception as e:
+            logger.warning(f"No se pudieron actualizar estadísticas de clusters (¿migración 012?): {e}")
+            return []
+    
+    def enqueue_cluster_reenrichment(
+        self,
+        items: List[Tuple[str, str]],
+        debounce_seconds: int = 600,
+        max_wait_seconds: int = 3600
+    ):
+        """
+        Queue (cluster_id, reason) for re-enrichment. A cluster already queued
+        has its due_at pushed back by debounce_seconds, but never beyond
+        max_wait_seconds after it was first queued.
+        """
+        if not items or not Config.DATABASE_URL:
+            return
+        
+        try:
+            with self.pg_connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        f"""
+                        INSERT INTO cluster_reenrichment_queue AS q (cluster_id, reason, first_queued_at, due_at)
+                        VALUES %s
+                        ON CONFLICT (cluster_id)
+                        DO UPDATE SET reason = EXCLUDED.reason,
+                                      due_at = LEAST(
+                                          q.first_queued_at + make_interval(secs => {int(max_wait_seconds)}),
+                                          EXCLUDED.due_at
+                                      )
+                        """,
+                        [(cid, reason, debounce_seconds) for cid, reason in items],
+                        template="(%s::uuid, %s, NOW(), NOW() + make_interval(secs => %s))"
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"No se pudieron encolar clusters para re-enriquecer: {e}")
+    
+    def claim_due_reenrichments(self, limit: int = 20, min_interval_seconds: int = 3600) -> List[str]:
+        """
+        Take up to `limit` queued clusters whose debounce has expired and that
+        were not enriched in the last min_interval_seconds. Claimed entries
+        are removed from the queue (SKIP LOCKED: replicas never take the same one).
+        """
+        if not Config.DATABASE_URL:
+            return []
+        
+        try:
+            with self.pg_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        DELETE FROM cluster_reenrichment_queue
+                        WHERE cluster_id IN (
+                            SELECT q.cluster_id
+                            FROM cluster_reenrichment_queue q
+                            JOIN clusters c ON c.id = q.cluster_id
+                            WHERE q.due_at <= NOW()
+                              AND (c.enriched_at IS NULL
+                                   OR c.enriched_at <= NOW() - make_interval(secs => %s))
+                            ORDER BY q.due_at
+                            LIMIT %s
+                            FOR UPDATE OF q SKIP LOCKED
+                        )
+                        RETURNING cluster_id
+                    """, (min_interval_seconds, limit))
+                    claimed = [str(row[0]) for row in cur.fetchall()]
+                conn.commit()
+            return claimed
+        except Exception as e:
+            logger.warning(f"No se pudo leer la cola de re-enriquecimiento: {e}")
+            return []
+    
+    def mark_clusters_enriched(self, cluster_ids: List[str]):
+        """Record the current article count and centroid as the enrichment baseline"""
+        if not cluster_ids or not Config.DATABASE_URL:
+            return
+        
+        try:
+            with self.pg_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        UPDATE clusters
+                        SET enriched_at = NOW(), enriched_article_count = article_count
+                        WHERE id = ANY(%s::uuid[])
+                    """, (cluster_ids,))
+                    cur.execute("""
+                        UPDATE cluster_embeddings
+                        SET enriched_embedding = embedding
+                        WHERE cluster_id = ANY(%s::uuid[])
+                    """, (cluster_ids,))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"No se pudo registrar el enriquecimiento (¿migración 012?): {e}")
+    
+    def get_clusters_by_ids(self, cluster_ids: List[str]) -> List[Dict[str, Any]]:
+        """Obtiene clusters por sus IDs"""
+        if not cluster_ids:
+            return []
+        
+        if self.direct_sql:
+            try:
+                return self._fetch_json_rows(
+                    "SELECT to_json(c) FROM clusters c WHERE c.id = ANY(%s::uuid[])", (cluster_ids,)
+                )
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
+        response = self.supabase.table("clusters") \
+            .select("*") \
+            .in_("id", cluster_ids) \
+            .execute()
+        
+        return response.data or []
+    
+    # ==================== ENRICHMENT JOBS (migración 018) ====================
+    
+    def save_enrichment_job(self, job: Dict[str, Any], specs: Optional[Dict[str, Any]] = None):
+        """
+        Insert or update an offline enrichment job record. `specs` (computed
+        fields per cluster id) is written with the first save and kept after.
+        """
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            INSERT INTO cluster_enrichment_jobs (job_id, status, job, specs)
+                            VALUES (%s, %s, %s::jsonb, COALESCE(%s::jsonb, '{}'::jsonb))
+                            ON CONFLICT (job_id)
+                            DO UPDATE SET status = EXCLUDED.status, job = EXCLUDED.job, updated_at = NOW()
+                        """, (job["job_id"], job["status"], Json(job), Json(specs) if specs is not None else None))
+                    conn.commit()
+                return
+            except Exception as e:
+                logger.warning(f"Direct SQL write failed, falling back to REST: {e}")
+        
+        row = {"job_id": job["job_id"], "status": job["status"], "job": job}
+        if specs is not None:
+            row["specs"] = specs
+        self.supabase.table("cluster_enrichment_jobs") \
+            .upsert(row, on_conflict="job_id") \
+            .execute()
+    
+    def get_enrichment_job(self, job_id: str, with_specs: bool = False) -> Optional[Dict[str, Any]]:
+        """Job record saved by save_enrichment_job ({"job": ..., "specs": ...} with_specs), or None"""
+        columns = "job, specs" if with_specs else "job"
+        if self.direct_sql:
+            try:
+                rows = self._fetch_json_rows(
+                    f"SELECT to_json(j) FROM (SELECT {columns} FROM cluster_enrichment_jobs WHERE job_id = %s) j",
+                    (job_id,)
+                )
+                return rows[0] if rows else None
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
+        response = self.supabase.table("cluster_enrichment_jobs") \
+            .select(columns) \
+            .eq("job_id", job_id) \
+            .limit(1) \
+            .execute()
+        
+        return response.data[0] if response.data else None
+    
+    def get_submitted_enrichment_jobs(self) -> List[str]:
+        """Ids of the jobs whose results are not applied yet, oldest first"""
+        if self.direct_sql:
+            try:
+                with self.pg_connection() as conn, conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT job_id FROM cluster_enrichment_jobs WHERE status = 'submitted' ORDER BY created_at"
+                    )
+                    return [row[0] for row in cur.fetchall()]
+            except Exception as e:
+                logger.warning(f"Direct SQL read failed, falling back to REST: {e}")
+        
+        response = self.supabase.table("cluster_enrichment_jobs") \
+            .select("job_id") \
+            .eq("status", "submitted") \
+            .order("created_at") \
+            .execute()
+        
+        return [row["job_id"] for row in response.data or []]
+    
+    # ==================== VECTOR INDEXES (migración 013) ====================
+    
+    _VECTOR_TABLES = ("article_embeddings", "cluster_embeddings")
+    # Upper bound of hnsw.ef_search, so the most a widened search can fetch
+    _VECTOR_SEARCH_MAX_CANDIDATES = 1000
+    
+    def get_vector_index_status(self) -> List[Dict[str, Any]]:
+        """
+        ANN indexes on the embedding tables: table, index, method (ivfflat or
+        hnsw), options (lists, m, ef_construction), estimated rows and size.
+        Tables without an index are listed with index None.
+        """
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT t.relname, i.relname, am.amname, i.reloptions,
+                       GREATEST(t.reltuples, 0)::bigint, pg_relation_size(i.oid)
+                FROM pg_class t
+                LEFT JOIN (
+                    pg_index x
+                    JOIN pg_class i ON i.oid = x.indexrelid
+                    JOIN pg_am am ON am.oid = i.relam AND am.amname IN ('ivfflat', 'hnsw')
+                ) ON x.indrelid = t.oid
+                WHERE t.relname = ANY(%s) AND t.relkind = 'r'
+                ORDER BY t.relname, i.relname
+            """, (list(self._VECTOR_TABLES),))
+            return [
+                {
+                    "table": table,
+                    "index": index,
+                    "method": method,
+                    "options": dict(opt.split("=", 1) for opt in (options or [])),
+                    "rows": rows,
+                    "size_bytes": size
+                }
+                for table, index, method, options, rows, size in cur.fetchall()
+            ]
+    
+    def rebuild_vector_index(
+        self,
+        table: str,
+        method: str = "hnsw",
+        lists: int = 100,
+        m: int = 16,
+        ef_construction: int = 64,
+        maintenance_work_mem: Optional[str] = None
+    ) -> str:
+        """
+        Build a new cosine ANN index on `table`.embedding (CREATE INDEX
+        CONCURRENTLY, so writes continue meanwhile), then drop the ANN
+        indexes it replaces. ivfflat centroids are trained on the rows present
+        at build time, so rebuild with lists ≈ rows / 1000 as the table grows;
+        HNSW needs no rebuild.
+        
+        Returns:
+            Name of the new index
+        """
+        from psycopg2 import sql
+        
+        if table not in self._VECTOR_TABLES:
+            raise ValueError(f"Not an embedding table: {table}")
+        if method == "hnsw":
+            options = sql.SQL("m = {}, ef_construction = {}").format(sql.Literal(int(m)), sql.Literal(int(ef_construction)))
+        elif method == "ivfflat":
+            options = sql.SQL("lists = {}").format(sql.Literal(int(lists)))
+        else:
+            raise ValueError(f"Unknown index method: {method}")
+        
+        name = f"{table}_embedding_{method}_idx"
+        with self.pg_connection() as conn:
+            conn.autocommit = True  # CONCURRENTLY no admite transacción
+            try:
+                with conn.cursor() as cur:
+                    if maintenance_work_mem:
+                        cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+                    cur.execute("""
+                        SELECT i.relname
+                        FROM pg_index x
+                        JOIN pg_class i ON i.oid = x.indexrelid
+                        JOIN pg_am am ON am.oid = i.relam
+                        WHERE x.indrelid = %s::regclass AND am.amname IN ('ivfflat', 'hnsw')
+                    """, (table,))
+                    old = [row[0] for row in cur.fetchall()]
+                    
+                    build = f"{name}_new" if name in old else name
+                    cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(build)))
+                    started = datetime.now()
+                    cur.execute(sql.SQL(
+                        "CREATE INDEX CONCURRENTLY {} ON {} USING {} (embedding vector_cosine_ops) WITH ({})"
+                    ).format(sql.Identifier(build), sql.Identifier(table), sql.SQL(method), options))
+                    
+                    for index in old:
+                        cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(index)))
+                    if build != name:
+                        cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(build), sql.Identifier(name)))
+                    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+            finally:
+                # CONCURRENTLY runs outside a transaction, so the setting is
+                # session-wide: reset it even when the build failed
+                if maintenance_work_mem and not conn.closed:
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute("RESET maintenance_work_mem")
+                    except Exception:
+                        conn.close()  # The pool skips closed connections
+                if not conn.closed:
+                    conn.autocommit = False
+        
+        logger.info(
+            f"Vector index {name} built in {(datetime.now() - started).total_seconds():.1f}s "
+            f"(replaced: {', '.join(old) or 'none'})"
+        )
+        return name
+    
+    def explain_vector_search(self, table: str, embedding: np.ndarray, k: int) -> List[str]:
+        """
+        EXPLAIN of the k-nearest-neighbour query find_similar_clusters runs
+        (on `table`), with the same search settings. An "Index Scan using …"
+        line means the ANN index serves it.
+        """
+        from psycopg2 import sql
+        
+        if table not in self._VECTOR_TABLES:
+            raise ValueError(f"Not an embedding table: {table}")
+        with self.pg_connection() as conn, conn.cursor() as cur:
+            self._set_vector_search_params(cur, k)
+            cur.execute(sql.SQL("""
+                EXPLAIN
+                SELECT embedding <=> %s::vector as distance
+                FROM {}
+                ORDER BY distance
+                LIMIT %s
+            """).format(sql.Identifier(table)), (embedding.tolist(), k))
+            return [row[0] for row in cur.fetchall()]
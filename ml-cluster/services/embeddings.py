@@ -1,14 +1,92 @@
 """
 Embedding service using Sentence Transformers
 """
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional
+from typing import List, Optional, Dict
 import logging
 
+from .batching import EmbeddingBatcher
+from .concurrency import run_cpu_bound
+from .encode_pool import EncodePool
+
 logger = logging.getLogger(__name__)
 
 
+def normalize_text(text: str) -> str:
+    """Cache key for a text: NFC-normalized with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of normalized text -> float32 embedding.
+    
+    Bounded by total size in bytes (vector plus key), not entry count, so
+    the memory budget holds regardless of embedding dimension.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _entry_size(key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key.encode("utf-8"))
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+    
+    def put(self, key: str, vector: np.ndarray):
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._entry_size(key, old)
+            self._entries[key] = vector
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
 class EmbeddingService:
     """
     Generates semantic embeddings using multilingual models.
@@ -21,6 +99,12 @@ class EmbeddingService:
     
     _instance: Optional['EmbeddingService'] = None
     _model: Optional[SentenceTransformer] = None
+    _batcher: Optional[EmbeddingBatcher] = None
+    _cache: Optional[EmbeddingCache] = None
+    _encode_pool: Optional[EncodePool] = None
+    _encode_pool_min_texts: int = 0
+    _fast_model: Optional[SentenceTransformer] = None
+    _fast_model_name: Optional[str] = None
     
     def __new__(cls, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"):
         """Singleton pattern to avoid loading the model multiple times"""
@@ -40,13 +124,106 @@ class EmbeddingService:
         """Embedding dimension of the model"""
         return self._model.get_sentence_embedding_dimension()
     
-    def encode(self, texts: List[str], show_progress: bool = False) -> np.ndarray:
+    def enable_micro_batching(self, max_wait_ms: float = 5.0, max_batch_size: int = 64):
+        """
+        Route small encode calls through a coalescer so that concurrent
+        requests (threaded or async workers) share one forward pass.
+        """
+        self._batcher = EmbeddingBatcher(
+            self._encode_batch,
+            max_wait_ms=max_wait_ms,
+            max_batch_size=max_batch_size
+        )
+        logger.info(f"Micro-batching enabled (max_wait={max_wait_ms}ms, max_batch={max_batch_size})")
+    
+    def enable_cache(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Cache query embeddings (find-cluster, similarity) by normalized text.
+        Syndicated stories repeat the same titles across many sources.
+        """
+        self._cache = EmbeddingCache(max_bytes=max_bytes)
+        logger.info(f"Embedding cache enabled ({max_bytes / (1024 * 1024):.0f} MB)")
+    
+    def enable_multiprocess(
+        self,
+        processes: int,
+        threads_per_process: Optional[int] = None,
+        chunk_size: int = 256,
+        min_texts: int = 2000
+    ):
+        """
+        Encode large batches (recluster, backfills) on a pool of processes,
+        each with its own model copy. Processes are spawned on first use.
+        """
+        self._encode_pool = EncodePool(
+            self._model_name,
+            self.embedding_dim,
+            processes,
+            threads_per_process=threads_per_process,
+            chunk_size=chunk_size
+        )
+        self._encode_pool_min_texts = min_texts
+        logger.info(
+            f"Multi-process encoding enabled ({processes} processes, "
+            f"batches of {min_texts}+ texts)"
+        )
+    
+    def enable_cascade(self, model_name: str):
+        """
+        Load a cheaper first-tier model for the model cascade. encode_fast
+        uses it; encode keeps using the primary model, whose vectors are the
+        only ones clustering and the stored centroids understand.
+        """
+        logger.info(f"Loading cascade model: {model_name}")
+        self._fast_model = SentenceTransformer(model_name)
+        self._fast_model_name = model_name
+        logger.info(
+            f"Cascade model loaded. Dimension: {self._fast_model.get_sentence_embedding_dimension()}"
+        )
+    
+    @property
+    def fast_model_name(self) -> Optional[str]:
+        """Name of the cascade model (None when the cascade is disabled)"""
+        return self._fast_model_name
+    
+    def encode_fast(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings from the cascade model (not cached, not comparable with encode)"""
+        if self._fast_model is None:
+            raise RuntimeError("Cascade model not loaded (enable_cascade)")
+        if not texts:
+            return np.array([])
+        
+        embeddings = run_cpu_bound(
+            self._fast_model.encode,
+            texts,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+    
+    def cache_stats(self) -> Optional[Dict[str, float]]:
+        return self._cache.stats() if self._cache is not None else None
+    
+    def encode(
+        self,
+        texts: List[str],
+        show_progress: bool = False,
+        use_cache: bool = True
+    ) -> np.ndarray:
         """
         Generate embeddings for a list of texts.
         
+        Cached texts are served from the LRU cache and only the misses are
+        encoded (duplicates within the call are encoded once). Small requests
+        go through the micro-batcher when enabled; large batches (e.g. from
+        /api/cluster) already fill the model and run directly.
+        
         Args:
             texts: List of texts to encode
             show_progress: Show progress bar
+            use_cache: Read and populate the query cache (bulk runs pass False
+                so they don't evict hot query titles)
             
         Returns:
             np.ndarray of shape (len(texts), embedding_dim)
@@ -54,14 +231,59 @@ class EmbeddingService:
         if not texts:
             return np.array([])
         
-        embeddings = self._model.encode(
+        if self._cache is None or not use_cache:
+            return self._encode_uncached(texts, show_progress)
+        
+        keys = [normalize_text(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self._cache.get(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                found[key] = vector
+        
+        if missing:
+            encoded = self._encode_uncached(list(missing.values()), show_progress)
+            for key, vector in zip(missing.keys(), encoded):
+                self._cache.put(key, vector)
+                found[key] = vector
+        
+        return np.vstack([found[key] for key in keys]).astype(np.float32, copy=False)
+    
+    def _encode_uncached(self, texts: List[str], show_progress: bool = False) -> np.ndarray:
+        if self._batcher is not None and not show_progress and len(texts) < self._batcher.max_batch_size:
+            return self._batcher.encode(texts)
+        
+        return self._encode_batch(texts, show_progress)
+    
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        """Async variant of encode; awaits the micro-batcher instead of blocking"""
+        if not texts:
+            return np.array([])
+        
+        if self._batcher is not None and len(texts) < self._batcher.max_batch_size:
+            return await self._batcher.encode_async(texts)
+        
+        return await asyncio.to_thread(self._encode_batch, texts)
+    
+    def _encode_batch(self, texts: List[str], show_progress: bool = False) -> np.ndarray:
+        """Single forward pass over all texts (or the process pool for large inputs)"""
+        if self._encode_pool is not None and len(texts) >= self._encode_pool_min_texts:
+            return run_cpu_bound(self._encode_pool.encode, texts)
+        
+        embeddings = run_cpu_bound(
+            self._model.encode,
             texts,
             show_progress_bar=show_progress,
             convert_to_numpy=True,
             normalize_embeddings=True  # Normalize for cosine similarity
         )
         
-        return embeddings
+        return embeddings.astype(np.float32, copy=False)
     
     def encode_single(self, text: str) -> np.ndarray:
         """Generate embedding for a single text"""
@@ -91,8 +313,8 @@ class EmbeddingService:
         """
         return np.dot(embeddings, query_embedding)
     
+    @staticmethod
     def prepare_article_text(
-        self, 
         title: str, 
         snippet: Optional[str] = None,
         content: Optional[str] = None,
@@ -0,0 +1,146 @@
+"""
+Multi-process encoding for large batches (reclusters, backfills)
+"""
+import os
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per-process state (set by the initializer inside each encoding process)
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int, core_sets: "mp.Queue"):
+    """
+    Loads the model in an encoding process and pins it to its own cores.
+    Runs in a freshly spawned interpreter, so thread env vars apply before torch loads.
+    """
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    try:
+        cores = core_sets.get_nowait()
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+    except Exception:
+        pass
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_chunk(shm_name: str, shape: tuple, start: int, texts: List[str]) -> int:
+    """Encodes texts and writes them into rows [start, start + len) of the shared output"""
+    embeddings = _worker_model.encode(
+        texts,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = embeddings
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EncodePool:
+    """
+    Pool of encoding processes, each with its own model copy and pinned to
+    a disjoint set of cores.
+
+    Inputs are split into chunks that are encoded in parallel and written
+    straight into a shared-memory output matrix, so results are assembled in
+    input order without pickling the vectors back.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        embedding_dim: int,
+        processes: int,
+        threads_per_process: Optional[int] = None,
+        chunk_size: int = 256
+    ):
+        """
+        Args:
+            model_name: Sentence Transformers model to load in each process
+            embedding_dim: Output dimension of the model
+            processes: Number of encoding processes
+            threads_per_process: torch/BLAS threads per process (default: cores / processes)
+            chunk_size: Texts per task
+        """
+        cpu_count = os.cpu_count() or 1
+        self.model_name = model_name
+        self.embedding_dim = embedding_dim
+        self.processes = processes
+        self.threads_per_process = threads_per_process or max(1, cpu_count // processes)
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _core_sets(self, ctx) -> "mp.Queue":
+        """Disjoint core sets, one per process, taken from the cores available to us"""
+        queue = ctx.Queue()
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = []
+        per_process = self.threads_per_process
+        for i in range(self.processes):
+            chunk = cores[i * per_process:(i + 1) * per_process]
+            queue.put(set(chunk) if len(chunk) == per_process else None)
+        return queue
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            # Spawn (not fork) so children never inherit torch thread pools or locks
+            ctx = mp.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_process, self._core_sets(ctx))
+            )
+            self._pid = pid
+            logger.info(
+                f"Encode pool started: {self.processes} processes × "
+                f"{self.threads_per_process} threads"
+            )
+        return self._executor
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts in parallel chunks; output rows follow input order"""
+        n = len(texts)
+        shape = (n, self.embedding_dim)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, n * self.embedding_dim * 4))
+        try:
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_encode_chunk, shm.name, shape, start, texts[start:start + self.chunk_size])
+                for start in range(0, n, self.chunk_size)
+            ]
+            for future in futures:
+                future.result()
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
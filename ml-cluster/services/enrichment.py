@@ -4,11 +4,16 @@ Cluster enrichment service with GPT
 import os
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
+ENRICHMENT_MODEL = "gpt-4o-mini"
+
+_tokenizer = None
+_tokenizer_loaded = False
+
 CLUSTER_ENRICHMENT_PROMPT = """Eres un analista de inteligencia geopolítica y mercados para Intel Desk.
 Analiza este grupo de artículos de noticias y proporciona un análisis completo y estructurado.
 
@@ -89,10 +94,76 @@ REGLAS CRÍTICAS:
 IMPORTANTE: Responde SOLO con el JSON, sin texto adicional."""
 
 
+def count_tokens(text: str) -> int:
+    """
+    Tokens of `text` for ENRICHMENT_MODEL (tiktoken). Without tiktoken or its
+    vocabulary file (offline), estimated as one token per 4 characters.
+    """
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.encoding_for_model(ENRICHMENT_MODEL)
+        except Exception as e:
+            logger.warning(f"tiktoken no disponible, estimando tokens por caracteres: {e}")
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(text))
+    return (len(text) + 3) // 4
+
+
+def format_articles_context(
+    articles: List[Dict[str, Any]],
+    max_articles: int = 10,
+    token_budget: int = 2000,
+    snippet_chars: int = 300
+) -> Tuple[str, int, int]:
+    """
+    Article blocks for the enrichment prompt, in the given order (most
+    representative first), until `max_articles` or `token_budget` is reached.
+    The first article is always included.
+
+    Returns:
+        (text, articles included, tokens)
+    """
+    blocks = []
+    tokens = 0
+    for i, article in enumerate(articles[:max_articles], 1):
+        countries = ", ".join(article.get("countries") or []) or "N/A"
+        topics = ", ".join(article.get("topics") or []) or "N/A"
+        snippet = (article.get("snippet") or "")[:snippet_chars] or "N/A"
+        published_at = article.get("published_at") or "N/A"
+        
+        block = f"""Artículo {i}:
+Título: {article.get('title', 'N/A')}
+Fuente: {article.get('domain', 'N/A')}
+Fecha: {published_at}
+Países: {countries}
+Temas: {topics}
+Snippet: {snippet}"""
+        # +2 por el separador entre bloques
+        block_tokens = count_tokens(block) + 2
+        if blocks and tokens + block_tokens > token_budget:
+            break
+        blocks.append(block)
+        tokens += block_tokens
+    return "\n\n".join(blocks), len(blocks), tokens
+
+
 class EnrichmentService:
     """Servicio para enriquecer clusters con análisis de GPT"""
     
-    def __init__(self):
+    def __init__(self, max_articles: int = 10, token_budget: int = 2000, snippet_chars: int = 300):
+        """
+        Args:
+            max_articles: Max articles in the prompt
+            token_budget: Max tokens of the article blocks in the prompt
+            snippet_chars: Snippet characters per article
+        """
+        self.max_articles = max_articles
+        self.token_budget = token_budget
+        self.snippet_chars = snippet_chars
+        
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             logger.warning("OPENAI_API_KEY no configurada - el enriquecimiento no estará disponible")
@@ -100,98 +171,129 @@ class EnrichmentService:
         else:
             self.client = OpenAI(api_key=api_key)
     
-    def enrich_cluster(
+    @property
+    def enabled(self) -> bool:
+        """False without OPENAI_API_KEY (enrich_cluster always returns None)"""
+        return self.client is not None
+    
+    def build_request(
         self,
         cluster: Dict[str, Any],
         articles: List[Dict[str, Any]]
     ) -> Optional[Dict[str, Any]]:
         """
-        Enriquece un cluster con análisis de GPT.
+        Body of the chat completion for one cluster (also a line of a batch job).
         
         Args:
             cluster: Diccionario con datos del cluster
-            articles: Lista de artículos del cluster
+            articles: Artículos del cluster, los más representativos primero
+                (ver select_representatives); se usan en ese orden
             
         Returns:
-            Diccionario con el análisis enriquecido o None si falla
+            model, messages, temperature, response_format; None sin artículos
         """
-        if not self.client:
-            logger.debug("OpenAI no disponible, saltando enriquecimiento")
-            return None
-        
         if not articles:
             logger.warning(f"Cluster {cluster.get('id')} no tiene artículos")
             return None
         
-        try:
-            # Preparar contexto de artículos (máximo 10)
-            articles_context = []
-            for i, article in enumerate(articles[:10], 1):
-                countries = ", ".join(article.get("countries", [])) or "N/A"
-                topics = ", ".join(article.get("topics", [])) or "N/A"
-                snippet = (article.get("snippet") or "")[:300] or "N/A"
-                published_at = article.get("published_at") or "N/A"
-                
-                article_text = f"""Artículo {i}:
-Título: {article.get('title', 'N/A')}
-Fuente: {article.get('domain', 'N/A')}
-Fecha: {published_at}
-Países: {countries}
-Temas: {topics}
-Snippet: {snippet}"""
-                articles_context.append(article_text)
-            
-            articles_text = "\n\n".join(articles_context)
-            
-            prompt = f"""{CLUSTER_ENRICHMENT_PROMPT}
+        # Preparar contexto de artículos (límite de artículos y de tokens)
+        articles_text, n_used, n_tokens = format_articles_context(
+            articles,
+            max_articles=self.max_articles,
+            token_budget=self.token_budget,
+            snippet_chars=self.snippet_chars
+        )
+        logger.debug(
+            f"Cluster {cluster.get('id')}: {n_used}/{len(articles)} artículos en el prompt (~{n_tokens} tokens)"
+        )
+        
+        prompt = f"""{CLUSTER_ENRICHMENT_PROMPT}
 
 ARTÍCULOS A ANALIZAR:
 {articles_text}
 
 Analiza estos artículos y proporciona el análisis completo en formato JSON."""
+        
+        return {
+            "model": ENRICHMENT_MODEL,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Eres un analista experto de inteligencia geopolítica y mercados. Responde siempre en formato JSON válido."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"}
+        }
+    
+    def parse_analysis(self, content: Optional[str], cluster: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Valida y limpia la respuesta JSON del modelo.
+        
+        Returns:
+            Diccionario con el análisis enriquecido o None si la respuesta no es válida
+        """
+        if not content:
+            logger.error("Respuesta vacía de OpenAI")
+            return None
+        
+        try:
+            analysis = json.loads(content)
+        except ValueError as e:
+            logger.error(f"Respuesta no JSON para cluster {cluster.get('id')}: {e}")
+            return None
+        
+        # Validar y limpiar el análisis
+        return {
+            "canonical_title": analysis.get("canonical_title") or cluster.get("canonical_title", ""),
+            "summary": analysis.get("summary") or "",
+            "countries": analysis.get("countries", [])[:15] if isinstance(analysis.get("countries"), list) else [],
+            "topics": analysis.get("topics", [])[:15] if isinstance(analysis.get("topics"), list) else [],
+            "entities": {
+                "people": analysis.get("entities", {}).get("people", [])[:20] if isinstance(analysis.get("entities", {}).get("people"), list) else [],
+                "organizations": analysis.get("entities", {}).get("organizations", [])[:20] if isinstance(analysis.get("entities", {}).get("organizations"), list) else [],
+                "locations": analysis.get("entities", {}).get("locations", [])[:20] if isinstance(analysis.get("entities", {}).get("locations"), list) else [],
+                "events": analysis.get("entities", {}).get("events", [])[:10] if isinstance(analysis.get("entities", {}).get("events"), list) else [],
+            },
+            "severity": max(0, min(100, analysis.get("severity", 50))),
+            "confidence": max(0, min(100, analysis.get("confidence", 50))),
+            "geopolitical_implications": analysis.get("geopolitical_implications", [])[:10] if isinstance(analysis.get("geopolitical_implications"), list) else [],
+            "key_signals": analysis.get("key_signals", [])[:10] if isinstance(analysis.get("key_signals"), list) else [],
+            "market_impact": analysis.get("market_impact"),
+            "map_data": analysis.get("map_data")
+        }
+    
+    def enrich_cluster(
+        self,
+        cluster: Dict[str, Any],
+        articles: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Enriquece un cluster con análisis de GPT.
+        
+        Args:
+            cluster: Diccionario con datos del cluster
+            articles: Artículos del cluster, los más representativos primero
+                (ver select_representatives); se usan en ese orden
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un analista experto de inteligencia geopolítica y mercados. Responde siempre en formato JSON válido."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            if not content:
-                logger.error("Respuesta vacía de OpenAI")
+        Returns:
+            Diccionario con el análisis enriquecido o None si falla
+        """
+        if not self.client:
+            logger.debug("OpenAI no disponible, saltando enriquecimiento")
+            return None
+        
+        try:
+            body = self.build_request(cluster, articles)
+            if body is None:
                 return None
             
-            analysis = json.loads(content)
-            
-            # Validar y limpiar el análisis
-            return {
-                "canonical_title": analysis.get("canonical_title") or cluster.get("canonical_title", ""),
-                "summary": analysis.get("summary") or "",
-                "countries": analysis.get("countries", [])[:15] if isinstance(analysis.get("countries"), list) else [],
-                "topics": analysis.get("topics", [])[:15] if isinstance(analysis.get("topics"), list) else [],
-                "entities": {
-                    "people": analysis.get("entities", {}).get("people", [])[:20] if isinstance(analysis.get("entities", {}).get("people"), list) else [],
-                    "organizations": analysis.get("entities", {}).get("organizations", [])[:20] if isinstance(analysis.get("entities", {}).get("organizations"), list) else [],
-                    "locations": analysis.get("entities", {}).get("locations", [])[:20] if isinstance(analysis.get("entities", {}).get("locations"), list) else [],
-                    "events": analysis.get("entities", {}).get("events", [])[:10] if isinstance(analysis.get("entities", {}).get("events"), list) else [],
-                },
-                "severity": max(0, min(100, analysis.get("severity", 50))),
-                "confidence": max(0, min(100, analysis.get("confidence", 50))),
-                "geopolitical_implications": analysis.get("geopolitical_implications", [])[:10] if isinstance(analysis.get("geopolitical_implications"), list) else [],
-                "key_signals": analysis.get("key_signals", [])[:10] if isinstance(analysis.get("key_signals"), list) else [],
-                "market_impact": analysis.get("market_impact"),
-                "map_data": analysis.get("map_data")
-            }
+            response = self.client.chat.completions.create(**body)
+            return self.parse_analysis(response.choices[0].message.content, cluster)
             
         except Exception as e:
             logger.error(f"Error enriqueciendo cluster {cluster.get('id')}: {e}", exc_info=True)
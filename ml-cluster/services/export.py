@@ -0,0 +1,134 @@
+"""
+Arrow IPC / Parquet export of article embeddings and cluster assignments
+"""
+import logging
+from typing import Iterator, Dict, List, Any, Tuple, BinaryIO
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _pyarrow():
+    # Optional dependency: only the export needs it
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Export requires pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+
+def export_schema(dim: int):
+    """One row per article; the embedding is a fixed-size list of float32"""
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ("article_id", pa.string()),
+        ("cluster_id", pa.string()),
+        ("title", pa.string()),
+        ("source_id", pa.string()),
+        ("domain", pa.string()),
+        ("language", pa.string()),
+        ("published_at", pa.timestamp("us", tz="UTC")),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("countries", pa.list_(pa.string())),
+        ("topics", pa.list_(pa.string())),
+        ("cluster_title", pa.string()),
+        ("cluster_severity", pa.int32()),
+        ("cluster_article_count", pa.int32()),
+        ("embedding", pa.list_(pa.float32(), dim)),
+    ])
+
+
+def to_record_batch(columns: Dict[str, List[Any]], embeddings: np.ndarray, schema):
+    """
+    Page of iter_article_embeddings as a RecordBatch. The embedding column
+    wraps the matrix buffer without copying it (contiguous float32).
+    """
+    pa, _ = _pyarrow()
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    flat = pa.array(embeddings.reshape(-1), type=pa.float32())
+    arrays = [
+        pa.array(columns[field.name], type=field.type)
+        for field in schema if field.name != "embedding"
+    ]
+    arrays.append(pa.FixedSizeListArray.from_arrays(flat, embeddings.shape[1]))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object whose bytes are drained between batches"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _open_writer(fmt: str, sink, schema):
+    pa, pq = _pyarrow()
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def stream_export(
+    pages: Iterator[Tuple[Dict[str, List[Any]], np.ndarray]],
+    dim: int,
+    fmt: str = "arrow"
+) -> Iterator[bytes]:
+    """
+    Encodes the pages as one Arrow IPC stream or Parquet file, yielding the
+    bytes of each page as soon as it is written (one row group per page).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Options: {', '.join(FORMATS)}")
+    schema = export_schema(dim)
+    sink = _ChunkSink()
+    writer = _open_writer(fmt, sink, schema)
+    rows = 0
+    try:
+        for columns, embeddings in pages:
+            writer.write_batch(to_record_batch(columns, embeddings, schema))
+            rows += len(embeddings)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+        if hasattr(pages, "close"):
+            pages.close()  # Returns the cursor's connection if the client went away
+    yield sink.drain()
+    logger.info(f"Exported {rows} article embeddings ({fmt})")
+
+
+def write_export(
+    pages: Iterator[Tuple[Dict[str, List[Any]], np.ndarray]],
+    dim: int,
+    out: BinaryIO,
+    fmt: str = "arrow"
+) -> int:
+    """Writes the export to a binary file; returns the bytes written"""
+    written = 0
+    for data in stream_export(pages, dim, fmt):
+        out.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,232 @@
+"""
+Vectorized aggregation of HDBSCAN labels into cluster metadata
+"""
+import numpy as np
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key under which the parsed publication time (epoch seconds, NaN if unknown)
+# is cached on each article dict
+PUBLISHED_TS = "published_ts"
+
+
+def parse_published_at(value: Any) -> float:
+    """ISO 8601 published_at → epoch seconds (NaN if missing or unparseable)"""
+    if not value:
+        return np.nan
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return np.nan
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def annotate_timestamps(articles: Iterable[Dict[str, Any]]) -> None:
+    """
+    Parse published_at once, when articles are loaded, so later stages read
+    a float instead of re-parsing the string per cluster.
+    """
+    for a in articles:
+        if PUBLISHED_TS not in a:
+            a[PUBLISHED_TS] = parse_published_at(a.get("published_at"))
+
+
+def _timestamps(articles: List[Dict[str, Any]]) -> np.ndarray:
+    annotate_timestamps(articles)
+    return np.fromiter((a[PUBLISHED_TS] for a in articles), dtype=np.float64, count=len(articles))
+
+
+def _codes(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Factorize hashable values; None → -1"""
+    vocab: Dict[Any, int] = {}
+    codes = np.fromiter(
+        (-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values),
+        dtype=np.int64,
+        count=len(values)
+    )
+    return codes, list(vocab)
+
+
+def _histograms(
+    groups: np.ndarray,
+    articles: List[Dict[str, Any]],
+    field: str,
+    n_groups: int,
+    top: int
+) -> List[List[str]]:
+    """
+    Most frequent values of a list field per group (at most `top`, ties by
+    first appearance). groups[i] is the group of articles[i].
+    """
+    owners = []
+    terms = []
+    for i, a in enumerate(articles):
+        values = [v for v in (a.get(field) or []) if v]
+        owners.extend([i] * len(values))
+        terms.extend(values)
+
+    result: List[List[str]] = [[] for _ in range(n_groups)]
+    if not terms:
+        return result
+
+    term_codes, vocab = _codes(terms)
+
+    # Count each (group, term) pair once per article, like the previous set()
+    n_terms = len(vocab)
+    keys = np.unique(np.asarray(owners, dtype=np.int64) * n_terms + term_codes)
+    pair_groups = groups[keys // n_terms]
+    pair_terms = keys % n_terms
+    pair_keys, counts = np.unique(pair_groups * n_terms + pair_terms, return_counts=True)
+    g = pair_keys // n_terms
+    t = pair_keys % n_terms
+
+    # Per group: highest count first, then term code (= first appearance)
+    order = np.lexsort((t, -counts, g))
+    g, t = g[order], t[order]
+    starts = np.searchsorted(g, np.arange(n_groups))
+    ends = np.searchsorted(g, np.arange(n_groups), side="right")
+    for k in range(n_groups):
+        result[k] = [vocab[c] for c in t[starts[k]:min(ends[k], starts[k] + top)]]
+
+    return result
+
+
+def select_representatives(
+    embeddings: np.ndarray,
+    centroid: np.ndarray,
+    k: int = 10,
+    diversity: float = 0.5
+) -> np.ndarray:
+    """
+    Maximal marginal relevance over centroid similarity: each pick maximizes
+    (1 - diversity) * sim(article, centroid) - diversity * max sim(article, picked).
+    The first pick is the most central article. One matrix-vector product per
+    pick, so the cost is O(k * N * dim).
+
+    Args:
+        embeddings: Normalized embeddings of the cluster members
+        centroid: Cluster centroid
+        k: Max articles selected
+        diversity: 0 = most central only, 1 = most mutually different
+
+    Returns:
+        Row indices into `embeddings`, in selection order
+    """
+    n = len(embeddings)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    norm = np.linalg.norm(centroid)
+    relevance = embeddings @ (centroid / norm if norm else centroid)
+    redundancy = np.zeros(n, dtype=relevance.dtype)
+    available = np.ones(n, dtype=bool)
+    selected = np.empty(k, dtype=np.int64)
+    for j in range(k):
+        scores = np.where(available, (1 - diversity) * relevance - diversity * redundancy, -np.inf)
+        pick = int(np.argmax(scores))
+        selected[j] = pick
+        available[pick] = False
+        np.maximum(redundancy, embeddings @ embeddings[pick], out=redundancy)
+    return selected
+
+
+def group_clusters(
+    labels: np.ndarray,
+    embeddings: np.ndarray,
+    articles: List[Dict[str, Any]],
+    min_size: int = 2,
+    top_terms: int = 10,
+    representatives: int = 10,
+    diversity: float = 0.5
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate HDBSCAN labels into per-cluster metadata in one pass.
+
+    Members are found with a single argsort of the labels, centroids with one
+    segmented reduction (np.add.reduceat), date windows with fmin/fmax
+    reductions over the cached timestamps, and sources / countries / topics
+    from integer-coded (cluster, value) pairs. Runtime is linear in the
+    number of articles (plus the sort).
+
+    Args:
+        labels: Cluster label per row (-1 = outlier)
+        embeddings: Normalized embedding matrix (N x dim), rows aligned with labels
+        articles: Article dicts aligned with labels
+        min_size: Clusters with fewer members are dropped
+        top_terms: Max countries / topics kept per cluster (most frequent first)
+        representatives: Max members picked by select_representatives
+        diversity: MMR trade-off for the representatives
+
+    Returns:
+        One dict per cluster, by label: label, indices (rows, ascending),
+        representatives (rows, most central first), centroid, window_start,
+        window_end (ISO), source_count, countries, topics
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    rows = np.flatnonzero(labels >= 0)
+    if len(rows) == 0:
+        return []
+
+    # Miembros: un argsort estable mantiene el orden original dentro de cada cluster
+    order = rows[np.argsort(labels[rows], kind="stable")]
+    sorted_labels = labels[order]
+    cluster_labels, starts, sizes = np.unique(sorted_labels, return_index=True, return_counts=True)
+
+    keep = sizes >= min_size
+    if not keep.any():
+        return []
+
+    # Centroides: suma segmentada y normalización
+    sums = np.add.reduceat(embeddings[order].astype(np.float32, copy=False), starts, axis=0)
+    centroids = sums / sizes[:, None]
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids = centroids / np.where(norms == 0, 1, norms)
+
+    # Ventanas temporales (NaN = sin fecha; fmin/fmax lo ignoran)
+    timestamps = _timestamps(articles)[order]
+    window_start = np.fmin.reduceat(timestamps, starts)
+    window_end = np.fmax.reduceat(timestamps, starts)
+
+    # Grupo (0..k-1) de cada fila ordenada
+    group_of = np.repeat(np.arange(len(cluster_labels)), sizes)
+    sorted_articles = [articles[i] for i in order]
+
+    # Fuentes únicas por cluster
+    source_codes, sources = _codes([a.get("source_id") or None for a in sorted_articles])
+    has_source = source_codes >= 0
+    pairs = np.unique(group_of[has_source] * max(len(sources), 1) + source_codes[has_source])
+    source_counts = np.bincount(pairs // max(len(sources), 1), minlength=len(cluster_labels))
+
+    countries = _histograms(group_of, sorted_articles, "countries", len(cluster_labels), top_terms)
+    topics = _histograms(group_of, sorted_articles, "topics", len(cluster_labels), top_terms)
+
+    now = datetime.now(timezone.utc).isoformat()
+
+    def iso(ts: float) -> str:
+        return now if np.isnan(ts) else datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+    groups = []
+    for k in np.flatnonzero(keep):
+        start = starts[k]
+        indices = order[start:start + sizes[k]]
+        picks = select_representatives(embeddings[indices], centroids[k], representatives, diversity)
+        groups.append({
+            "label": int(cluster_labels[k]),
+            "indices": indices,
+            "representatives": indices[picks],
+            "centroid": centroids[k],
+            "window_start": iso(window_start[k]),
+            "window_end": iso(window_end[k]),
+            "source_count": int(source_counts[k]),
+            "countries": countries[k],
+            "topics": topics[k]
+        })
+
+    logger.info(f"Agrupados {len(rows)} artículos en {len(groups)} clusters")
+    return groups
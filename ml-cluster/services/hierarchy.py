@@ -0,0 +1,152 @@
+"""
+Cached HDBSCAN hierarchy of the last clustering run, re-cut at any granularity
+"""
+import os
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from hdbscan._hdbscan_tree import condense_tree, compute_stability, get_clusters
+
+logger = logging.getLogger(__name__)
+
+
+class HierarchyStore:
+    """
+    Single-linkage tree of the last clustering run, on disk and in memory.
+
+    HDBSCAN builds this tree (over mutual reachability distances, so it
+    depends on min_samples only) before condensing it with min_cluster_size
+    and picking a flat cut. Keeping it, instead of the condensed tree of one
+    min_cluster_size, lets cut() produce the flat clustering for any
+    min_cluster_size, cluster_selection_epsilon or selection method without
+    touching the embeddings again. Condensed trees are memoized per
+    min_cluster_size (`max_cached` of them).
+
+    The tree is saved to `root` (atomic rename), so every worker process on
+    the host serves the latest one; runs over fewer than `min_articles`
+    articles do not replace it.
+    """
+
+    FILENAME = "hierarchy.npz"
+
+    def __init__(self, root: str, min_articles: int = 50, max_cached: int = 8):
+        self.root = root
+        self.min_articles = min_articles
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._tree: Optional[Dict[str, Any]] = None
+        self._mtime = 0.0
+        self._condensed: "OrderedDict[int, Tuple[np.ndarray, Dict[int, float]]]" = OrderedDict()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, self.FILENAME)
+
+    def save(self, article_ids: List[str], linkage: np.ndarray, min_cluster_size: int, min_samples: int) -> bool:
+        """Persist a run's tree; False if the run was too small to replace the current one"""
+        if linkage is None or len(article_ids) < max(self.min_articles, 2):
+            return False
+        meta = {
+            "created_at": time.time(),
+            "articles": len(article_ids),
+            "min_cluster_size": min_cluster_size,
+            "min_samples": min_samples,
+        }
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".{self.FILENAME}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, linkage=linkage, article_ids=np.array(article_ids), meta=np.array(json.dumps(meta)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._set(linkage, list(article_ids), meta, os.stat(self.path).st_mtime)
+        logger.info(f"Hierarchy of {len(article_ids)} articles cached")
+        return True
+
+    def _set(self, linkage: np.ndarray, article_ids: List[str], meta: Dict[str, Any], mtime: float):
+        self._tree = {"linkage": linkage, "article_ids": article_ids, "meta": meta}
+        self._mtime = mtime
+        self._condensed.clear()
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Current tree, re-read if another process saved a newer one"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return self._tree
+        if self._tree is None or mtime > self._mtime:
+            with np.load(self.path) as data:
+                self._set(
+                    data["linkage"],
+                    data["article_ids"].tolist(),
+                    json.loads(str(data["meta"])),
+                    mtime
+                )
+        return self._tree
+
+    def info(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            tree = self._load()
+        return dict(tree["meta"]) if tree else None
+
+    def cut(
+        self,
+        min_cluster_size: Optional[int] = None,
+        epsilon: float = 0.0,
+        method: str = "eom"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Flat clustering of the cached run at another granularity.
+
+        Args:
+            min_cluster_size: Smallest group (default: the run's)
+            epsilon: cluster_selection_epsilon; groups closer than this merge
+            method: "eom" (stable, larger groups) or "leaf" (finest groups)
+
+        Returns:
+            None without a cached tree; otherwise meta, article_ids and
+            labels (-1 = outlier, aligned with article_ids) and the stability
+            of each label
+        """
+        if method not in ("eom", "leaf"):
+            raise ValueError("method must be 'eom' or 'leaf'")
+        with self._lock:
+            tree = self._load()
+            if tree is None:
+                return None
+            size = int(min_cluster_size or tree["meta"]["min_cluster_size"])
+            if size < 2:
+                raise ValueError("min_cluster_size must be at least 2")
+            condensed, stability = self._condensed_tree(tree["linkage"], size)
+
+        # get_clusters rewrites the stability dict in place: the memo gets a copy
+        labels, _, stabilities = get_clusters(
+            condensed,
+            dict(stability),
+            cluster_selection_method=method,
+            cluster_selection_epsilon=float(epsilon)
+        )
+        return {
+            "meta": tree["meta"],
+            "article_ids": tree["article_ids"],
+            "labels": np.asarray(labels, dtype=np.int64),
+            "stability": {label: float(s) for label, s in enumerate(np.asarray(stabilities).tolist())}
+        }
+
+    def _condensed_tree(self, linkage: np.ndarray, size: int) -> Tuple[np.ndarray, Dict[int, float]]:
+        cached = self._condensed.get(size)
+        if cached is None:
+            condensed = condense_tree(linkage, size)
+            cached = (condensed, compute_stability(condensed))
+            self._condensed[size] = cached
+            if len(self._condensed) > self.max_cached:
+                self._condensed.popitem(last=False)
+        else:
+            self._condensed.move_to_end(size)
+        return cached
@@ -0,0 +1,138 @@
+"""
+Merge of clusters that split the same story across runs (centroid similarity)
+"""
+import time
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (path halving, union by size)"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def groups(self) -> List[List[int]]:
+        """Sets with more than one member"""
+        members: Dict[int, List[int]] = {}
+        for i in range(len(self.parent)):
+            members.setdefault(self.find(i), []).append(i)
+        return [group for group in members.values() if len(group) > 1]
+
+
+def find_merge_groups(
+    centroids: np.ndarray,
+    threshold: float,
+    block_size: int = 1024,
+    groups: Optional[np.ndarray] = None
+) -> List[List[int]]:
+    """
+    Rows of `centroids` connected by a similarity >= threshold (transitively).
+    The similarity matrix is computed in row blocks against the rows after
+    them only (upper triangle), so memory stays at block_size x n. With
+    `groups` (one key per row), pairs with the same key are not linked.
+    """
+    n = len(centroids)
+    if n < 2:
+        return []
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    matrix = np.asarray(centroids / np.where(norms > 0, norms, 1), dtype=np.float32)
+
+    uf = UnionFind(n)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = matrix[start:stop] @ matrix[start:].T
+        # Solo pares (i, j) con j > i
+        sims[np.tril_indices(stop - start, 0, sims.shape[1])] = -1
+        if groups is not None:
+            sims[groups[start:stop, None] == groups[None, start:]] = -1
+        rows, cols = np.nonzero(sims >= threshold)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            uf.union(start + r, start + c)
+    return uf.groups()
+
+
+class ClusterMerger:
+    """
+    Maintenance job that merges clusters whose centroids are near-duplicates.
+
+    Only new articles are clustered on each run, so one story often ends up
+    in several clusters created on different runs. The centroids of the
+    clusters active in the last `days` are compared all-pairs; clusters
+    linked by a similarity >= threshold are merged into the one with the most
+    articles (oldest on ties), which takes over their articles, windows,
+    countries and topics, and the others are deleted.
+    """
+
+    def __init__(self, db_service, threshold: float = 0.9, days: int = 7, block_size: int = 1024, reenrich_queue=None):
+        self.db_service = db_service
+        self.threshold = threshold
+        self.days = days
+        self.block_size = block_size
+        self.reenrich_queue = reenrich_queue
+
+    def plan(self) -> Tuple[int, List[Tuple[str, List[str]]]]:
+        """(clusters compared, [(surviving_id, absorbed_ids)])"""
+        ids, centroids = self.db_service.get_recent_cluster_centroids(days=self.days)
+        groups = find_merge_groups(centroids, self.threshold, self.block_size)
+        if not groups:
+            return len(ids), []
+
+        involved = [ids[i] for group in groups for i in group]
+        clusters = {c["id"]: c for c in self.db_service.get_clusters_by_ids(involved)}
+
+        def rank(cid: str):
+            c = clusters.get(cid, {})
+            return (-(c.get("article_count") or 0), c.get("created_at") or "", cid)
+
+        merges = []
+        for group in groups:
+            members = sorted((ids[i] for i in group if ids[i] in clusters), key=rank)
+            if len(members) > 1:
+                merges.append((members[0], members[1:]))
+        return len(ids), merges
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        start = time.perf_counter()
+        compared, merges = self.plan()
+        result = {
+            "clusters": compared,
+            "groups": len(merges),
+            "removed": sum(len(absorbed) for _, absorbed in merges),
+            "articles_moved": 0,
+            "dry_run": dry_run,
+        }
+        if merges and not dry_run:
+            result["articles_moved"] = self.db_service.merge_clusters(merges)
+            if self.reenrich_queue is not None:
+                # Merged clusters grew: their analysis may be stale
+                result["reenrich_queued"] = self.reenrich_queue.note_clusters([target for target, _ in merges])
+        if dry_run:
+            result["merges"] = [{"into": target, "absorbed": absorbed} for target, absorbed in merges]
+
+        logger.info(
+            f"Cluster merge: {result['removed']} of {compared} clusters merged into "
+            f"{len(merges)} ({result['articles_moved']} articles moved"
+            f"{', dry run' if dry_run else ''}) in {time.perf_counter() - start:.2f}s"
+        )
+        return result
@@ -0,0 +1,627 @@
+"""
+Clustering run as explicit stages with on-disk checkpoints
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from .clustering import labels_to_clusters
+from .grouping import group_clusters
+
+logger = logging.getLogger(__name__)
+
+# fetch() → (articles, article_ids, embeddings)
+FetchFn = Callable[[], Tuple[List[Dict[str, Any]], List[str], np.ndarray]]
+
+
+def match_existing_clusters(db_service, article_ids: List[str], embeddings: np.ndarray) -> Tuple[List[bool], int]:
+    """
+    Assign articles to existing clusters above SIMILARITY_THRESHOLD.
+    Returns (remaining_mask, updated): True in the mask for unassigned articles.
+    """
+    updated = 0
+    remaining_mask = [True] * len(article_ids)
+
+    try:
+        for idx, (aid, emb) in enumerate(zip(article_ids, embeddings)):
+            similar_clusters = db_service.find_similar_clusters(
+                emb,
+                threshold=Config.SIMILARITY_THRESHOLD
+            )
+
+            if similar_clusters:
+                best_cluster_id, similarity = similar_clusters[0]
+                logger.info(f"Artículo {aid} → Cluster {best_cluster_id} (sim={similarity:.3f})")
+
+                # Asignar al cluster existente
+                db_service.update_article_cluster(aid, best_cluster_id)
+
+                remaining_mask[idx] = False
+                updated += 1
+    except Exception as e:
+        logger.warning(f"Similar cluster search unavailable: {e}")
+        # Continuar sin matching, crear nuevos clusters
+
+    return remaining_mask, updated
+
+
+def link_recent_duplicates(
+    db_service,
+    recent_index,
+    article_ids: List[str],
+    embeddings: np.ndarray
+) -> Tuple[np.ndarray, int]:
+    """
+    Put articles that duplicate an already-clustered article from the recent
+    window (an earlier batch) straight into that article's cluster, so they
+    skip HDBSCAN and enrichment. Articles of this batch are never used as
+    originals; duplicates within the batch are the dedup stage's job.
+    Returns (remaining_mask, linked): True in the mask for articles not linked.
+    """
+    remaining_mask = np.ones(len(article_ids), dtype=bool)
+    if not article_ids:
+        return remaining_mask, 0
+
+    try:
+        recent_index.refresh()
+        hits = recent_index.search(embeddings, exclude=article_ids)
+        originals = list({hit[0] for hit in hits if hit})
+        if not originals:
+            return remaining_mask, 0
+        cluster_of = db_service.get_article_clusters(originals)
+
+        by_cluster: Dict[str, List[str]] = {}
+        for idx, (aid, hit) in enumerate(zip(article_ids, hits)):
+            cluster_id = cluster_of.get(hit[0]) if hit else None
+            if cluster_id:
+                logger.debug(f"Artículo {aid} duplica {hit[0]} (sim={hit[1]:.3f}) → Cluster {cluster_id}")
+                by_cluster.setdefault(cluster_id, []).append(aid)
+                remaining_mask[idx] = False
+        for cluster_id, ids in by_cluster.items():
+            db_service.update_articles_cluster(ids, cluster_id)
+    except Exception as e:
+        logger.warning(f"Recent duplicate lookup unavailable: {e}")
+        return np.ones(len(article_ids), dtype=bool), 0
+
+    return remaining_mask, int((~remaining_mask).sum())
+
+
+def provisional_summary(representatives: List[Dict[str, Any]], n_articles: int, n_sources: int) -> str:
+    """Heuristic summary until GPT enrichment lands: lead of the most central article + coverage"""
+    coverage = f"Event covered by {n_articles} articles from {n_sources} sources"
+    lead = next((a["snippet"] for a in representatives if a.get("snippet")), None)
+    if not lead:
+        return coverage
+    lead = " ".join(lead.split())
+    if len(lead) > 280:
+        lead = lead[:280].rsplit(" ", 1)[0] + "…"
+    return f"{lead} ({coverage})"
+
+
+def cluster_spec(group: Dict[str, Any], articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """create_clusters_bulk spec for a group_clusters group (rows index `articles`)"""
+    cluster_articles = [articles[i] for i in group["indices"]]
+    representatives = [articles[i] for i in group["representatives"]]
+    n_articles = len(cluster_articles)
+    n_sources = group["source_count"]
+
+    # Calculate severity and confidence
+    severity = min(100, 30 + n_articles * 10 + n_sources * 5)
+    confidence = min(100, 40 + n_articles * 8 + n_sources * 6)
+
+    return {
+        # Fixed up front, so a resumed create stage inserts the same clusters
+        "id": str(uuid.uuid4()),
+        # Provisional title and summary (until GPT enrichment)
+        "canonical_title": representatives[0]["title"],
+        "summary": provisional_summary(representatives, n_articles, n_sources),
+        "countries": group["countries"],
+        "topics": group["topics"],
+        "article_count": n_articles,
+        "source_count": n_sources,
+        "window_start": group["window_start"],
+        "window_end": group["window_end"],
+        "severity": severity,
+        "confidence": confidence,
+        "embedding": group["centroid"],
+        "article_ids": [a["id"] for a in cluster_articles],
+        # Evidence for the enrichment prompt (central and mutually diverse)
+        "representative_ids": [a["id"] for a in representatives]
+    }
+
+
+def enrichment_update(enrichment: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Cluster fields from a GPT enrichment, falling back to the computed values"""
+    entities = enrichment.get("entities") or {}
+    return {
+        "canonical_title": enrichment.get("canonical_title", spec["canonical_title"]),
+        "summary": enrichment.get("summary", ""),
+        "countries": enrichment.get("countries", spec["countries"]),
+        "topics": enrichment.get("topics", spec["topics"]),
+        "severity": _score(enrichment.get("severity"), spec["severity"]),
+        "confidence": _score(enrichment.get("confidence"), spec["confidence"]),
+        "entities": {
+            "people": entities.get("people", []),
+            "organizations": entities.get("organizations", []),
+            "locations": entities.get("locations", []),
+            "events": entities.get("events", []),
+            "geopolitical_implications": enrichment.get("geopolitical_implications", []),
+            "key_signals": enrichment.get("key_signals", []),
+            "market_impact": enrichment.get("market_impact"),
+            "map_data": enrichment.get("map_data")
+        }
+    }
+
+
+def _score(value: Any, default: int) -> int:
+    """0-100 integer (clusters CHECK constraint); one bad value must not fail the whole batch"""
+    try:
+        return max(0, min(100, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return default
+
+
+class RunCheckpoint:
+    """
+    Artefacts of one clustering run in a local directory.
+
+    Each completed stage is recorded in manifest.json (written atomically)
+    after its artefacts are on disk, so a run that dies mid-stage resumes
+    from the last stage that finished. Checkpoints older than `max_age`
+    seconds are discarded: by then the fetched article set is stale.
+    """
+
+    def __init__(self, root: str, key: str, max_age: float = 3600):
+        self.path = os.path.join(root, key)
+        self.key = key
+        self.max_age = max_age
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        fresh = {"key": self.key, "created_at": time.time(), "done": [], "counts": {}}
+        try:
+            with open(os.path.join(self.path, "manifest.json")) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return fresh
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint {self.key} unreadable, starting over: {e}")
+            self.clear()
+            return fresh
+
+        age = time.time() - manifest.get("created_at", 0)
+        if age > self.max_age:
+            logger.info(f"Checkpoint {self.key} is {age:.0f}s old, starting over")
+            self.clear()
+            return fresh
+        return manifest
+
+    @property
+    def last_stage(self) -> Optional[str]:
+        """Last completed stage, None for a fresh run"""
+        done = self.manifest["done"]
+        return done[-1] if done else None
+
+    def done(self, stage: str) -> bool:
+        return stage in self.manifest["done"]
+
+    def mark_done(self, stage: str, **counts):
+        self.manifest["done"].append(stage)
+        self.manifest["counts"].update(counts)
+        self._write_manifest()
+
+    def count(self, name: str, default: Any = 0) -> Any:
+        return self.manifest["counts"].get(name, default)
+
+    def _write_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._atomic_write("manifest.json", lambda f: json.dump(self.manifest, f))
+
+    def _atomic_write(self, name: str, write: Callable[[Any], None], mode: str = "w"):
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        with open(tmp, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def save_array(self, name: str, array: np.ndarray):
+        os.makedirs(self.path, exist_ok=True)
+        self._atomic_write(f"{name}.npy", lambda f: np.save(f, array), mode="wb")
+
+    def load_array(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"))
+
+    def save_json(self, name: str, obj: Any):
+        os.makedirs(self.path, exist_ok=True)
+        self._atomic_write(f"{name}.json", lambda f: json.dump(obj, f))
+
+    def load_json(self, name: str) -> Any:
+        with open(os.path.join(self.path, f"{name}.json")) as f:
+            return json.load(f)
+
+    def append_json(self, name: str, obj: Any):
+        """One JSON line per record, flushed so it survives a killed worker"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, f"{name}.jsonl"), "a") as f:
+            f.write(json.dumps(obj) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_jsonl(self, name: str) -> List[Any]:
+        records = []
+        try:
+            with open(os.path.join(self.path, f"{name}.jsonl")) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break  # Línea truncada por una caída a mitad de escritura
+        except FileNotFoundError:
+            pass
+        return records
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ClusteringPipeline:
+    """
+    fetch → dedup → match → cluster → create → enrich, shared by /api/cluster,
+    the global stage of sharded runs and /api/recluster.
+
+    With a RunCheckpoint, every stage persists its output (embedding matrix,
+    dedup map, remaining mask, labels, created cluster ids, enrichment
+    results) before the next one starts. An interrupted run called again
+    with the same checkpoint resumes after the last completed stage: it does
+    not re-fetch, re-encode, re-create clusters or re-enrich clusters that
+    already have a result. Enrichment results are checkpointed one cluster
+    at a time. The checkpoint is removed once the enrich stage has run, so
+    the next call starts a new run; clusters whose enrichment failed (e.g.
+    OpenAI outage) are handed to the re-enrichment queue instead.
+    """
+
+    def __init__(
+        self,
+        clustering_service,
+        dedup_service,
+        db_service,
+        enrichment_service,
+        checkpoint: Optional[RunCheckpoint] = None,
+        recent_index=None,
+        reenrich_queue=None,
+        batch_enricher=None,
+        batch_min_clusters: int = 1,
+        hierarchy=None,
+        blocked=None
+    ):
+        self.clustering_service = clustering_service
+        self.dedup_service = dedup_service
+        self.db_service = db_service
+        self.enrichment_service = enrichment_service
+        self.checkpoint = checkpoint
+        # RecentEmbeddingIndex: duplicates of earlier batches join their cluster in the match stage
+        self.recent_index = recent_index
+        # ReenrichmentQueue: clusters that grew in the match stage are checked for
+        # drift, and clusters whose enrichment failed are retried from it
+        self.reenrich_queue = reenrich_queue
+        # BatchEnricher: runs creating at least batch_min_clusters clusters submit
+        # one offline job instead of a chat call per cluster
+        self.batch_enricher = batch_enricher
+        self.batch_min_clusters = batch_min_clusters
+        # HierarchyStore: keeps the HDBSCAN tree of the cluster stage for re-cuts
+        self.hierarchy = hierarchy
+        # BlockedClusterer: windows of at least blocked.min_articles articles are
+        # clustered per country/time block and stitched instead of in one HDBSCAN
+        self.blocked = blocked
+
+    def run(
+        self,
+        fetch: FetchFn,
+        match: bool = True,
+        skip_match: Optional[set] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            fetch: Returns (articles, article_ids, embeddings); embeddings already stored
+            match: Assign articles to existing clusters (and to the cluster of a
+                recent duplicate, with a recent_index) before HDBSCAN
+            skip_match: Article ids already matched elsewhere (not looked up again)
+
+        Returns:
+            processed, created, updated, linked, duplicates, outliers (plus resumed_from
+            and enrich_pending when relevant), or None if fetch found nothing
+        """
+        ckpt = self.checkpoint
+        resumed_from = ckpt.last_stage if ckpt else None
+        if resumed_from:
+            logger.info(f"Resuming run {ckpt.key} after stage '{resumed_from}'")
+
+        # 1. Fetch + encode + store
+        if self._done("fetch"):
+            articles = ckpt.load_json("articles")
+            embeddings = ckpt.load_array("embeddings")
+            article_ids = [a["id"] for a in articles]
+        else:
+            start = time.perf_counter()
+            articles, article_ids, embeddings = fetch()
+            if not articles:
+                return None
+            if ckpt:
+                ckpt.save_json("articles", articles)
+                ckpt.save_array("embeddings", embeddings)
+                ckpt.mark_done("fetch")
+            logger.info(f"Stage fetch: {len(articles)} articles in {time.perf_counter() - start:.1f}s")
+
+        articles_map = {a["id"]: a for a in articles}
+
+        # 2. Dedup
+        if self._done("dedup"):
+            keep = ckpt.load_array("keep")
+            duplicates = ckpt.load_json("duplicates")
+        else:
+            start = time.perf_counter()
+            logger.info("Buscando duplicados...")
+            _, kept_ids, duplicates = self.dedup_service.deduplicate(embeddings, article_ids)
+            position = {aid: i for i, aid in enumerate(article_ids)}
+            keep = np.array([position[aid] for aid in kept_ids], dtype=np.int64)
+            if ckpt:
+                ckpt.save_array("keep", keep)
+                ckpt.save_json("duplicates", duplicates)
+                ckpt.mark_done("dedup")
+            logger.info(f"Stage dedup: {len(duplicates)} duplicates in {time.perf_counter() - start:.1f}s")
+
+        article_ids = [article_ids[i] for i in keep]
+        embeddings = embeddings[keep]
+
+        # 3. Match against existing clusters
+        if self._done("match"):
+            remaining_mask = ckpt.load_array("remaining").astype(bool)
+            updated = ckpt.count("updated")
+            linked = ckpt.count("linked")
+        else:
+            start = time.perf_counter()
+            remaining_mask = np.ones(len(article_ids), dtype=bool)
+            updated = linked = 0
+            if match:
+                skip = skip_match or set()
+                to_check = np.array([i for i, aid in enumerate(article_ids) if aid not in skip], dtype=np.int64)
+                if self.recent_index is not None and len(to_check):
+                    mask, linked = link_recent_duplicates(
+                        self.db_service, self.recent_index,
+                        [article_ids[i] for i in to_check], embeddings[to_check]
+                    )
+                    remaining_mask[to_check] = mask
+                    to_check = to_check[mask]
+                logger.info("Searching for existing clusters...")
+                mask, updated = match_existing_clusters(
+                    self.db_service, [article_ids[i] for i in to_check], embeddings[to_check]
+                )
+                remaining_mask[to_check] = mask
+                if self.reenrich_queue is not None and (linked or updated):
+                    self.reenrich_queue.note_articles(
+                        [aid for aid, keep_it in zip(article_ids, remaining_mask) if not keep_it]
+                    )
+            if ckpt:
+                ckpt.save_array("remaining", remaining_mask)
+                ckpt.mark_done("match", updated=updated, linked=linked)
+            logger.info(
+                f"Stage match: {linked} linked to recent duplicates, {updated} assigned "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+
+        remaining_ids = [aid for aid, keep_it in zip(article_ids, remaining_mask) if keep_it]
+        remaining_embeddings = embeddings[remaining_mask]
+
+        # 4. HDBSCAN
+        if self._done("cluster"):
+            labels = ckpt.load_array("labels")
+        else:
+            start = time.perf_counter()
+            logger.info(f"Clustering {len(remaining_ids)} articles...")
+            if self.blocked is not None and self.blocked.applies(len(remaining_ids)):
+                # No single tree to cache for /api/hierarchy in this mode
+                labels = self.blocked.fit_labels(
+                    remaining_embeddings, [articles_map[aid] for aid in remaining_ids]
+                )
+            elif self.hierarchy is not None:
+                labels, tree = self.clustering_service.fit_hierarchy(remaining_embeddings)
+                try:
+                    self.hierarchy.save(
+                        remaining_ids, tree,
+                        self.clustering_service.min_cluster_size,
+                        self.clustering_service.min_samples
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not cache the clustering hierarchy: {e}")
+            else:
+                labels = self.clustering_service.fit_labels(remaining_embeddings)
+            if ckpt:
+                ckpt.save_array("labels", labels)
+                ckpt.mark_done("cluster")
+            logger.info(f"Stage cluster: {time.perf_counter() - start:.1f}s")
+
+        clusters = labels_to_clusters(labels, remaining_ids)
+
+        # 5. Create clusters (one transaction). The specs and their ids are
+        # saved first; a run resumed after the insert repeats it harmlessly.
+        if self._done("create"):
+            specs = ckpt.load_json("specs")
+            new_clusters = ckpt.load_json("created")
+        else:
+            start = time.perf_counter()
+            if self._done("specs"):
+                specs = ckpt.load_json("specs")
+                centroids = ckpt.load_array("centroids")
+            else:
+                specs, centroids = self._specs(labels, remaining_ids, remaining_embeddings, articles_map)
+                if ckpt:
+                    ckpt.save_json("specs", specs)
+                    ckpt.save_array("centroids", centroids)
+                    ckpt.mark_done("specs")
+            new_clusters = self._create(specs, centroids)
+            if ckpt:
+                ckpt.save_json("created", new_clusters)
+                ckpt.mark_done("create")
+            logger.info(f"Stage create: {len(specs)} clusters in {time.perf_counter() - start:.1f}s")
+
+        created = sum(1 for c in new_clusters if c)
+
+        # 6. Enrich (synchronous, or one offline batch job)
+        pending = 0
+        enrich_job = ckpt.count("enrich_job", None) if ckpt else None
+        if not self._done("enrich"):
+            start = time.perf_counter()
+            if self.batch_enricher is not None and created >= self.batch_min_clusters:
+                enrich_job = self._submit_batch(specs, new_clusters, articles_map)
+            if enrich_job is None:
+                pending = self._enrich(specs, new_clusters, articles_map)
+            logger.info(f"Stage enrich: {pending} pending in {time.perf_counter() - start:.1f}s")
+
+        result = {
+            "processed": len(article_ids),
+            "created": created,
+            "updated": updated,
+            "linked": linked,
+            "duplicates": len(duplicates),
+            "outliers": len(clusters.get(-1, []))
+        }
+        if resumed_from:
+            result["resumed_from"] = resumed_from
+        if enrich_job:
+            result["enrich_job"] = enrich_job
+        if pending:
+            result["enrich_pending"] = pending
+        if ckpt:
+            ckpt.clear()
+        return result
+
+    def _done(self, stage: str) -> bool:
+        return bool(self.checkpoint and self.checkpoint.done(stage))
+
+    def _specs(
+        self,
+        labels: np.ndarray,
+        article_ids: List[str],
+        embeddings: np.ndarray,
+        articles_map: Dict[str, Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        One cluster spec (with its id and article ids) per HDBSCAN group, and
+        their centroids as rows of one matrix.
+        """
+        # Agregar metadatos de todos los clusters de una vez (centroides, fechas,
+        # fuentes, países y topics)
+        articles = [articles_map[aid] for aid in article_ids]
+        groups = group_clusters(
+            labels, embeddings, articles,
+            representatives=Config.ENRICH_MAX_ARTICLES,
+            diversity=Config.ENRICH_DIVERSITY
+        )
+
+        # Preparar nuevos clusters
+        specs = [cluster_spec(group, articles) for group in groups]
+        centroids = np.array([spec.pop("embedding") for spec in specs], dtype=np.float32)
+        return specs, centroids.reshape(len(specs), embeddings.shape[1])
+
+    def _create(self, specs: List[Dict[str, Any]], centroids: np.ndarray) -> List[Optional[Dict[str, Any]]]:
+        """Persist the specs with their centroids in one transaction; returns the created clusters, aligned"""
+        # Crear clusters, centroides y asignaciones en una transacción
+        new_clusters = self.db_service.create_clusters_bulk(
+            [{**spec, "embedding": centroid} for spec, centroid in zip(specs, centroids)]
+        )
+        for new_cluster in new_clusters:
+            if new_cluster:
+                logger.info(f"Created cluster: {new_cluster['canonical_title'][:50]}... ({new_cluster['article_count']} articles)")
+
+        return [
+            {k: v for k, v in c.items() if k != "embedding"} if c else None
+            for c in new_clusters
+        ]
+
+    def _submit_batch(
+        self,
+        specs: List[Dict[str, Any]],
+        new_clusters: List[Optional[Dict[str, Any]]],
+        articles_map: Dict[str, Dict[str, Any]]
+    ) -> Optional[str]:
+        """Submit the enrichment of all new clusters as one batch job; None to enrich synchronously"""
+        items = [
+            {
+                "cluster": new_cluster,
+                "spec": spec,
+                "articles": [articles_map[aid] for aid in spec.get("representative_ids") or spec["article_ids"]]
+            }
+            for spec, new_cluster in zip(specs, new_clusters)
+            if new_cluster
+        ]
+        try:
+            job_id = self.batch_enricher.submit(items)
+        except Exception as e:
+            logger.error(f"Batch enrichment submit failed, enriching synchronously: {e}", exc_info=True)
+            return None
+        if job_id and self.checkpoint:
+            self.checkpoint.mark_done("enrich", enrich_job=job_id)
+        return job_id
+
+    def _enrich(
+        self,
+        specs: List[Dict[str, Any]],
+        new_clusters: List[Optional[Dict[str, Any]]],
+        articles_map: Dict[str, Dict[str, Any]]
+    ) -> int:
+        """
+        Enrich each new cluster with GPT; updates are written in one batch.
+        Returns how many clusters still lack an enrichment (queued for
+        re-enrichment when there is a reenrich_queue).
+        """
+        ckpt = self.checkpoint
+        if not self.enrichment_service.enabled:
+            # Sin OpenAI no hay nada que reintentar
+            if ckpt:
+                ckpt.mark_done("enrich")
+            return 0
+
+        results = {r["id"]: r["update"] for r in ckpt.load_jsonl("enriched")} if ckpt else {}
+        failed: List[str] = []
+        for spec, new_cluster in zip(specs, new_clusters):
+            if not new_cluster or new_cluster["id"] in results:
+                continue
+            cluster_articles = [
+                articles_map[aid] for aid in spec.get("representative_ids") or spec["article_ids"]
+            ]
+            try:
+                enrichment = self.enrichment_service.enrich_cluster(new_cluster, cluster_articles)
+            except Exception as e:
+                logger.error(f"Error enriching cluster {new_cluster.get('id')}: {e}", exc_info=True)
+                enrichment = None
+            if enrichment:
+                update = enrichment_update(enrichment, spec)
+                results[new_cluster["id"]] = update
+                if ckpt:
+                    ckpt.append_json("enriched", {"id": new_cluster["id"], "update": update})
+                logger.info(f"✓ Cluster {new_cluster['id']} enriquecido con GPT")
+            else:
+                failed.append(new_cluster["id"])
+                logger.warning(f"⚠ No se pudo enriquecer cluster {new_cluster['id']}")
+
+        # Idempotente: incluye los resultados de intentos anteriores
+        self.db_service.update_clusters_bulk(list(results.items()))
+        if self.reenrich_queue is not None and results:
+            self.reenrich_queue.mark_enriched(list(results))
+
+        if failed:
+            if self.reenrich_queue is not None:
+                self.reenrich_queue.retry(failed)
+            else:
+                logger.warning(f"{len(failed)} clusters left without enrichment")
+        if ckpt:
+            ckpt.mark_done("enrich")
+        return len(failed)
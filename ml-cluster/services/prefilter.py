@@ -0,0 +1,199 @@
+"""
+Embedding-free exact / near-exact duplicate detection ahead of encoding
+"""
+import re
+import zlib
+import logging
+import unicodedata
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest prime below 2^32: (a * x + b) % p stays within uint64 for 32-bit x
+_PRIME = np.uint64(4294967291)
+_WORD = re.compile(r"\w+")
+# Combining diacritical marks left by NFKD (é → e + U+0301)
+_COMBINING = re.compile(r"[\u0300-\u036f]")
+
+
+def normalize_text(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-free word tokens"""
+    if not text:
+        return []
+    text = text.lower()
+    if not text.isascii():
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    return _WORD.findall(text)
+
+
+class DuplicatePrefilter:
+    """
+    Finds articles whose text is (nearly) identical to one seen earlier, so
+    they can reuse that article's embedding instead of a transformer pass.
+
+    Two checks, both without the model:
+    1. Exact: same normalized title and content_hash, or same normalized
+       text (what would be encoded).
+    2. Near-exact: MinHash signatures over word shingles with LSH banding.
+       Candidates that share a band are confirmed with the exact Jaccard
+       similarity of their shingle sets (>= threshold).
+
+    The first article of each group is the representative; later ones map
+    to it. State accumulates across calls, so duplicates are caught across
+    pages of the same run.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: Min Jaccard similarity of shingle sets for a near-duplicate
+            num_perm: MinHash permutations (must be divisible by bands)
+            bands: LSH bands; more bands catch lower similarities as candidates
+            shingle_size: Words per shingle
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+        self._exact: Dict[Any, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._shingles: Dict[str, Set[int]] = {}
+        self.stats = {"seen": 0, "exact": 0, "near": 0}
+
+    def _shingle_set(self, tokens: List[str]) -> Set[int]:
+        k = self.shingle_size
+        if len(tokens) <= k:
+            grams = [" ".join(tokens)] if tokens else []
+        else:
+            grams = [" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+        return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+    def _signature(self, shingles: Set[int]) -> np.ndarray:
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        return ((self._a[:, None] * x[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def find_representative(
+        self,
+        article_id: str,
+        text: str,
+        title: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Returns the id of an earlier article this one duplicates, or None
+        (the article becomes a representative for later ones).
+        """
+        self.stats["seen"] += 1
+        tokens = normalize_text(text)
+
+        # 1. Exact
+        keys = [("text", " ".join(tokens))]
+        if content_hash:
+            keys.append(("hash", " ".join(normalize_text(title)), content_hash))
+        for key in keys:
+            rep = self._exact.get(key)
+            if rep is not None:
+                self.stats["exact"] += 1
+                return rep
+
+        # 2. Near-exact (MinHash + LSH)
+        shingles = self._shingle_set(tokens)
+        band_keys = []
+        if shingles:
+            signature = self._signature(shingles)
+            band_keys = [
+                (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)
+            ]
+            checked = set()
+            for band_key in band_keys:
+                for rep in self._buckets.get(band_key, ()):
+                    if rep in checked:
+                        continue
+                    checked.add(rep)
+                    other = self._shingles[rep]
+                    jaccard = len(shingles & other) / len(shingles | other)
+                    if jaccard >= self.threshold:
+                        self.stats["near"] += 1
+                        return rep
+
+        # Nuevo representante
+        for key in keys:
+            self._exact[key] = article_id
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(article_id)
+        if shingles:
+            self._shingles[article_id] = shingles
+        return None
+
+    @property
+    def saved_fraction(self) -> float:
+        """Share of articles that skipped the model"""
+        seen = self.stats["seen"]
+        return (self.stats["exact"] + self.stats["near"]) / seen if seen else 0.0
+
+
+def article_texts(embedding_service, articles: List[Dict[str, Any]]) -> List[str]:
+    """Model input of each article (title, snippet, content, countries, topics)"""
+    return [
+        embedding_service.prepare_article_text(
+            title=a["title"],
+            snippet=a.get("snippet"),
+            content=a.get("full_content"),
+            countries=a.get("countries"),
+            topics=a.get("topics")
+        )
+        for a in articles
+    ]
+
+
+def encode_articles(
+    embedding_service,
+    articles: List[Dict[str, Any]],
+    prefilter: Optional[DuplicatePrefilter] = None,
+    known: Optional[Dict[str, np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Encode articles, running only the representatives of duplicate groups
+    through the model when a prefilter is given. Duplicates get a copy of
+    their representative's vector, taken from this batch or from `known`
+    (id → embedding of articles encoded earlier in the run).
+
+    Returns the embedding matrix aligned with `articles`.
+    """
+    texts = article_texts(embedding_service, articles)
+    if prefilter is None:
+        return embedding_service.encode(texts, use_cache=False)
+
+    reps = [
+        prefilter.find_representative(a["id"], text, a.get("title"), a.get("content_hash"))
+        for a, text in zip(articles, texts)
+    ]
+    unique = [i for i, rep in enumerate(reps) if rep is None]
+    rows: Dict[str, np.ndarray] = {}
+    if unique:
+        encoded = embedding_service.encode([texts[i] for i in unique], use_cache=False)
+        rows = {articles[i]["id"]: encoded[j] for j, i in enumerate(unique)}
+    known = known or {}
+
+    if len(unique) < len(articles):
+        logger.debug(f"Prefilter: {len(articles) - len(unique)}/{len(articles)} articles reuse a vector")
+    return np.vstack([
+        rows[a["id"]] if rep is None else (rows[rep] if rep in rows else known[rep])
+        for a, rep in zip(articles, reps)
+    ])
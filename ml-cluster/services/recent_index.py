@@ -0,0 +1,197 @@
+"""
+In-memory rolling index of recent article embeddings for cross-batch dedup
+"""
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Optional, Tuple, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Re-read rows updated slightly before the watermark: a transaction that
+# started earlier may commit after the previous refresh
+_WATERMARK_OVERLAP = timedelta(seconds=60)
+
+
+class RecentEmbeddingIndex:
+    """
+    The last `days` of article_embeddings, held as one normalized matrix.
+
+    refresh() only loads rows written since the previous refresh (by
+    updated_at) and drops rows that fell out of the window, so it is cheap
+    to call before every use. Near-duplicate pairs (similarity >= threshold)
+    are computed for new rows only, against the rows already indexed, and
+    kept until one side expires; /api/deduplicate reads them instead of
+    comparing the whole window again. `loader(days, updated_since)` replaces
+    get_recent_article_embeddings as the source (e.g. the vectors of a
+    cascade model).
+    """
+
+    def __init__(
+        self,
+        db_service,
+        days: int = 3,
+        threshold: float = 0.92,
+        block_size: int = 1024,
+        loader: Optional[Callable[..., List[Tuple[str, datetime, datetime, np.ndarray]]]] = None
+    ):
+        self.db_service = db_service
+        self.days = days
+        self.threshold = threshold
+        self.block_size = block_size
+        self.loader = loader or (lambda **kwargs: db_service.get_recent_article_embeddings(**kwargs))
+
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._created = np.empty(0, dtype=np.float64)
+        self._size = 0
+        self._watermark: Optional[datetime] = None
+        self._pairs: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, article_id: str) -> bool:
+        return article_id in self._rows
+
+    def _grow(self, needed: int, dim: int):
+        capacity = self._matrix.shape[0]
+        if self._matrix.shape[1] != dim:
+            # Primera carga (o cambio de modelo): empezar de cero
+            self._ids, self._rows, self._pairs, self._size = [], {}, {}, 0
+            self._matrix = np.zeros((max(needed, 1024), dim), dtype=np.float32)
+            self._created = np.full(self._matrix.shape[0], np.nan)
+        elif needed > capacity:
+            new_capacity = max(needed, capacity * 2)
+            matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+            matrix[:capacity] = self._matrix
+            created = np.full(new_capacity, np.nan)
+            created[:capacity] = self._created
+            self._matrix, self._created = matrix, created
+
+    def refresh(self) -> int:
+        """Load rows written since the last refresh; returns how many changed"""
+        with self._lock:
+            since = self._watermark - _WATERMARK_OVERLAP if self._watermark else None
+            started = time.perf_counter()
+            rows = self.loader(days=self.days, updated_since=since)
+            self._expire()
+            if not rows:
+                return 0
+
+            changed = []
+            for article_id, created_at, updated_at, embedding in rows:
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+                embedding = np.asarray(embedding, dtype=np.float32)
+                norm = np.linalg.norm(embedding)
+                if norm > 0:
+                    embedding = embedding / norm
+                self._grow(self._size + 1, embedding.shape[0])
+                row = self._rows.get(article_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._rows[article_id] = row
+                    self._ids.append(article_id)
+                elif np.array_equal(self._matrix[row], embedding):
+                    continue  # Ya indexado (solapamiento del watermark)
+                self._matrix[row] = embedding
+                self._created[row] = created_at.timestamp()
+                changed.append(row)
+
+            self._update_pairs(changed)
+            if changed:
+                logger.info(
+                    f"Recent index: {len(changed)} new/updated embeddings, {len(self._rows)} total "
+                    f"({time.perf_counter() - started:.2f}s)"
+                )
+            return len(changed)
+
+    def _expire(self):
+        """Drop rows older than the window, compacting the matrix"""
+        if not self._size:
+            return
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.days)).timestamp()
+        keep = ~(self._created[:self._size] < cutoff)
+        if keep.all():
+            return
+        expired = {self._ids[i] for i in np.flatnonzero(~keep)}
+        rows = np.flatnonzero(keep)
+        self._matrix[:len(rows)] = self._matrix[rows]
+        self._created[:len(rows)] = self._created[rows]
+        self._created[len(rows):] = np.nan
+        self._ids = [self._ids[i] for i in rows]
+        self._rows = {aid: i for i, aid in enumerate(self._ids)}
+        self._size = len(rows)
+        for aid in expired:
+            for other in self._pairs.pop(aid, {}):
+                self._pairs.get(other, {}).pop(aid, None)
+
+    def _update_pairs(self, changed: List[int]):
+        """Near-duplicate pairs between changed rows and the whole index"""
+        if not changed:
+            return
+        matrix = self._matrix[:self._size]
+        for start in range(0, len(changed), self.block_size):
+            block = changed[start:start + self.block_size]
+            sims = matrix[block] @ matrix.T
+            sims[np.arange(len(block)), block] = -1  # self
+            hit_rows, hit_cols = np.nonzero(sims >= self.threshold)
+            for r, c in zip(hit_rows.tolist(), hit_cols.tolist()):
+                a, b = self._ids[block[r]], self._ids[c]
+                sim = float(sims[r, c])
+                self._pairs.setdefault(a, {})[b] = sim
+                self._pairs.setdefault(b, {})[a] = sim
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        threshold: Optional[float] = None,
+        exclude: Iterable[str] = ()
+    ) -> List[Optional[Tuple[str, float]]]:
+        """
+        Most similar indexed article (id, similarity) per query row, or None
+        below the threshold. Ids in `exclude` (e.g. the current batch) are
+        never returned.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        results: List[Optional[Tuple[str, float]]] = [None] * len(embeddings)
+        with self._lock:
+            if not self._size or not len(embeddings):
+                return results
+            matrix = self._matrix[:self._size]
+            excluded = [self._rows[aid] for aid in exclude if aid in self._rows]
+            for start in range(0, len(embeddings), self.block_size):
+                sims = np.asarray(embeddings[start:start + self.block_size], dtype=np.float32) @ matrix.T
+                if excluded:
+                    sims[:, excluded] = -1
+                best = sims.argmax(axis=1)
+                best_sims = sims[np.arange(len(best)), best]
+                for i in np.flatnonzero(best_sims >= threshold):
+                    results[start + i] = (self._ids[best[i]], float(best_sims[i]))
+        return results
+
+    def duplicate_pairs(self, article_ids: List[str]) -> Tuple[List[Tuple[str, str, float]], List[str]]:
+        """
+        Cached near-duplicate pairs among the indexed articles of the list,
+        ordered as in the list (id1 before id2), and the ids that are not
+        indexed (older than the window, or no embedding yet), whose pairs the
+        caller has to compute.
+        """
+        with self._lock:
+            missing = [aid for aid in article_ids if aid not in self._rows]
+            position = {aid: i for i, aid in enumerate(article_ids)}
+            pairs = []
+            for aid in article_ids:
+                pairs.extend(sorted(
+                    ((aid, other, sim) for other, sim in self._pairs.get(aid, {}).items()
+                     if position.get(other, -1) > position[aid]),
+                    key=lambda pair: position[pair[1]]
+                ))
+            return pairs, missing
@@ -0,0 +1,162 @@
+"""
+Drift-triggered, debounced re-enrichment of clusters that grew after creation
+"""
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .grouping import select_representatives
+from .pipeline import enrichment_update
+
+logger = logging.getLogger(__name__)
+
+
+class ReenrichmentQueue:
+    """
+    Decides when a cluster's GPT analysis is stale and re-enriches it.
+
+    Each cluster keeps the article count and centroid its last enrichment
+    was based on (migration 012). When articles join existing clusters,
+    note_articles() recomputes the count and centroid of those clusters and
+    queues the ones that grew by `growth` (fraction) or whose centroid moved
+    by `drift` (cosine distance) since then. Every new trigger pushes the
+    entry back by `debounce_seconds` (never beyond `max_wait_seconds` from
+    the first one), so a burst of articles costs one LLM call. process()
+    re-enriches due entries, at most once per `min_interval_seconds` per
+    cluster.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        growth: float = 0.5,
+        drift: float = 0.05,
+        debounce_seconds: int = 600,
+        max_wait_seconds: int = 3600,
+        min_interval_seconds: int = 3600,
+        max_articles: int = 10,
+        diversity: float = 0.5
+    ):
+        self.db_service = db_service
+        self.growth = growth
+        self.drift = drift
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_articles = max_articles
+        self.diversity = diversity
+
+    def trigger(self, stats: Dict[str, Any]) -> Optional[str]:
+        """Why a cluster needs re-enrichment ("growth:…", "drift:…"), or None"""
+        baseline = stats.get("enriched_article_count")
+        if baseline:
+            grown = (stats["article_count"] - baseline) / baseline
+            if grown >= self.growth:
+                return f"growth:{grown:.2f}"
+
+        centroid, enriched = stats.get("centroid"), stats.get("enriched_embedding")
+        if centroid is not None and enriched is not None:
+            norm = np.linalg.norm(enriched)
+            if norm:
+                distance = 1.0 - float(centroid @ enriched) / norm
+                if distance >= self.drift:
+                    return f"drift:{distance:.3f}"
+        return None
+
+    def note_articles(self, article_ids: List[str]) -> int:
+        """Articles just assigned to existing clusters; returns clusters queued"""
+        if not article_ids:
+            return 0
+        try:
+            clusters = self.db_service.get_article_clusters(article_ids)
+            cluster_ids = sorted({cid for cid in clusters.values() if cid})
+            return self.note_clusters(cluster_ids)
+        except Exception as e:
+            logger.warning(f"Re-enrichment check failed: {e}")
+            return 0
+
+    def note_clusters(self, cluster_ids: List[str]) -> int:
+        """Refresh the stats of clusters that gained articles and queue the stale ones"""
+        if not cluster_ids:
+            return 0
+        stale: List[Tuple[str, str]] = []
+        for stats in self.db_service.refresh_cluster_stats(cluster_ids):
+            reason = self.trigger(stats)
+            if reason:
+                stale.append((stats["id"], reason))
+        if stale:
+            self.db_service.enqueue_cluster_reenrichment(
+                stale,
+                debounce_seconds=self.debounce_seconds,
+                max_wait_seconds=self.max_wait_seconds
+            )
+            logger.info(f"Re-enrichment: {len(stale)}/{len(cluster_ids)} grown clusters queued")
+        return len(stale)
+
+    def retry(self, cluster_ids: List[str]):
+        """New clusters whose enrichment failed; process() enriches them once the debounce expires"""
+        self.db_service.enqueue_cluster_reenrichment(
+            [(cid, "enrich_failed") for cid in cluster_ids],
+            debounce_seconds=self.debounce_seconds,
+            max_wait_seconds=self.max_wait_seconds
+        )
+        logger.info(f"Re-enrichment: {len(cluster_ids)} clusters without enrichment queued")
+
+    def mark_enriched(self, cluster_ids: List[str]):
+        """Current count and centroid become the baseline of these clusters"""
+        self.db_service.mark_clusters_enriched(cluster_ids)
+
+    def process(self, enrichment_service, limit: int = 20) -> Dict[str, int]:
+        """
+        Re-enrich up to `limit` due clusters. Failed ones are queued again
+        (after another debounce period).
+
+        Returns:
+            reenriched, failed
+        """
+        if not enrichment_service.enabled:
+            return {"reenriched": 0, "failed": 0}
+
+        cluster_ids = self.db_service.claim_due_reenrichments(
+            limit=limit, min_interval_seconds=self.min_interval_seconds
+        )
+        if not cluster_ids:
+            return {"reenriched": 0, "failed": 0}
+
+        updates = []
+        failed: List[Tuple[str, str]] = []
+        for cluster in self.db_service.get_clusters_by_ids(cluster_ids):
+            articles = self._representatives(cluster["id"])
+            enrichment = None
+            if articles:
+                try:
+                    enrichment = enrichment_service.enrich_cluster(cluster, articles)
+                except Exception as e:
+                    logger.error(f"Error re-enriching cluster {cluster['id']}: {e}", exc_info=True)
+            if enrichment:
+                updates.append((cluster["id"], enrichment_update(enrichment, cluster)))
+            elif articles:
+                failed.append((cluster["id"], "retry"))
+
+        if updates:
+            self.db_service.update_clusters_bulk(updates)
+            self.mark_enriched([cid for cid, _ in updates])
+        if failed:
+            self.db_service.enqueue_cluster_reenrichment(
+                failed,
+                debounce_seconds=self.debounce_seconds,
+                max_wait_seconds=self.max_wait_seconds
+            )
+        logger.info(f"Re-enrichment: {len(updates)} clusters refreshed, {len(failed)} failed")
+        return {"reenriched": len(updates), "failed": len(failed)}
+
+    def _representatives(self, cluster_id: str) -> List[Dict[str, Any]]:
+        """Central and diverse members of a cluster, most central first"""
+        article_ids, embeddings = self.db_service.get_cluster_articles_embeddings(cluster_id)
+        if not article_ids:
+            return []
+        picks = select_representatives(embeddings, embeddings.mean(axis=0), self.max_articles, self.diversity)
+        chosen = [article_ids[i] for i in picks]
+        articles = {a["id"]: a for a in self.db_service.get_articles_by_ids(chosen)}
+        return [articles[aid] for aid in chosen if aid in articles]
@@ -0,0 +1,198 @@
+"""
+Local re-split of clusters that grew too wide through centroid matching
+"""
+import time
+import logging
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from config import Config
+from .grouping import annotate_timestamps, group_clusters
+from .pipeline import cluster_spec, enrichment_update
+
+logger = logging.getLogger(__name__)
+
+
+def cluster_dispersion(cluster_of_row: List[str], embeddings: np.ndarray) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Mean cosine distance of the members to their centroid, per cluster, for
+    rows grouped by cluster. For normalized rows it equals 1 - |mean row|, so
+    it is one segmented sum over the whole matrix.
+
+    Returns:
+        Tuple (cluster_ids, start row of each cluster, dispersion per cluster)
+    """
+    if not cluster_of_row:
+        return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    boundaries = [i for i in range(1, len(cluster_of_row)) if cluster_of_row[i] != cluster_of_row[i - 1]]
+    starts = np.array([0] + boundaries, dtype=np.int64)
+    sizes = np.diff(np.append(starts, len(cluster_of_row)))
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms > 0, norms, 1)
+    means = np.add.reduceat(unit, starts, axis=0) / sizes[:, None]
+    return [cluster_of_row[i] for i in starts], starts, 1.0 - np.linalg.norm(means, axis=1)
+
+
+class ClusterResplitter:
+    """
+    Splits active clusters whose members drifted apart, without a full recluster.
+
+    Dispersion is computed for every cluster active in the last `days` from
+    one bulk read of member embeddings. HDBSCAN (the service's
+    ClusteringService) runs only on clusters with at least `min_size`
+    members and a dispersion above `max_dispersion`. When it finds two or
+    more sub-clusters, the largest keeps the original id (and its history),
+    the others become new clusters, and members that fit none (outliers) are
+    unassigned so the next run can match them again.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        clustering_service,
+        enrichment_service=None,
+        max_dispersion: float = 0.3,
+        min_size: int = 6,
+        days: int = 7,
+        reenrich_queue=None
+    ):
+        self.db_service = db_service
+        self.clustering_service = clustering_service
+        self.enrichment_service = enrichment_service
+        self.max_dispersion = max_dispersion
+        self.min_size = min_size
+        self.days = days
+        self.reenrich_queue = reenrich_queue
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        start = time.perf_counter()
+        cluster_of_row, article_ids, embeddings = self.db_service.get_active_cluster_members(days=self.days)
+        cluster_ids, starts, dispersion = cluster_dispersion(cluster_of_row, embeddings)
+        sizes = np.diff(np.append(starts, len(cluster_of_row)))
+        wide = [
+            k for k in np.argsort(-dispersion)
+            if sizes[k] >= self.min_size and dispersion[k] > self.max_dispersion
+        ]
+
+        result = {"clusters": len(cluster_ids), "wide": len(wide), "split": 0, "created": 0, "unassigned": 0}
+        plans = []
+        for k in wide:
+            rows = slice(starts[k], starts[k] + sizes[k])
+            labels = self.clustering_service.fit_labels(embeddings[rows])
+            children = np.unique(labels[labels >= 0])
+            plans.append((cluster_ids[k], float(dispersion[k]), article_ids[rows], embeddings[rows], labels))
+            if dry_run:
+                result.setdefault("candidates", []).append({
+                    "cluster_id": cluster_ids[k],
+                    "size": int(sizes[k]),
+                    "dispersion": round(float(dispersion[k]), 4),
+                    "children": sorted((int(np.count_nonzero(labels == c)) for c in children), reverse=True),
+                    "outliers": int(np.count_nonzero(labels < 0))
+                })
+
+        if not dry_run:
+            for cluster_id, spread, members, member_embeddings, labels in plans:
+                split = self._split(cluster_id, members, member_embeddings, labels)
+                if split:
+                    result["split"] += 1
+                    result["created"] += split["created"]
+                    result["unassigned"] += split["unassigned"]
+                    logger.info(
+                        f"Cluster {cluster_id} (dispersion {spread:.3f}) split: "
+                        f"{split['kept']} kept, {split['created']} new clusters, {split['unassigned']} unassigned"
+                    )
+        result["dry_run"] = dry_run
+
+        logger.info(
+            f"Re-split: {result['wide']} of {result['clusters']} clusters above dispersion "
+            f"{self.max_dispersion}, {result['split']} split in {time.perf_counter() - start:.2f}s"
+        )
+        return result
+
+    def _split(
+        self,
+        cluster_id: str,
+        member_ids: List[str],
+        embeddings: np.ndarray,
+        labels: np.ndarray
+    ) -> Dict[str, int]:
+        """Apply one HDBSCAN result; {} when it found fewer than two sub-clusters"""
+        articles_map = {a["id"]: a for a in self.db_service.get_articles_by_ids(member_ids)}
+        if len(articles_map) < len(member_ids):
+            # Miembros borrados o movidos desde la lectura: se deja para la próxima
+            return {}
+        articles = [articles_map[aid] for aid in member_ids]
+        annotate_timestamps(articles)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.where(norms > 0, norms, 1)
+        groups = group_clusters(
+            labels, unit, articles,
+            min_size=self.clustering_service.min_cluster_size,
+            representatives=Config.ENRICH_MAX_ARTICLES,
+            diversity=Config.ENRICH_DIVERSITY
+        )
+        if len(groups) < 2:
+            return {}
+
+        groups.sort(key=lambda g: len(g["indices"]), reverse=True)
+        kept, others = groups[0], groups[1:]
+        grouped = set(np.concatenate([g["indices"] for g in groups]).tolist())
+        unassigned = [aid for i, aid in enumerate(member_ids) if i not in grouped]
+
+        # Hijos nuevos (crean cluster, centroide y asignaciones en una transacción)
+        specs = [cluster_spec(group, articles) for group in others]
+        new_clusters = self.db_service.create_clusters_bulk(specs)
+        if unassigned:
+            self.db_service.update_articles_cluster(unassigned, None)
+
+        # El hijo mayor conserva el id original
+        self.db_service.update_cluster(cluster_id, {
+            "article_count": len(kept["indices"]),
+            "source_count": kept["source_count"],
+            "window_start": kept["window_start"],
+            "window_end": kept["window_end"],
+            "countries": kept["countries"],
+            "topics": kept["topics"]
+        })
+        self.db_service.store_cluster_embedding(cluster_id, kept["centroid"])
+
+        self._enrich(specs, new_clusters, articles_map)
+        if self.reenrich_queue is not None:
+            # Its centroid moved: queued for re-enrichment by the drift check
+            self.reenrich_queue.note_clusters([cluster_id])
+
+        return {
+            "kept": len(kept["indices"]),
+            "created": sum(1 for c in new_clusters if c),
+            "unassigned": len(unassigned)
+        }
+
+    def _enrich(
+        self,
+        specs: List[Dict[str, Any]],
+        new_clusters: List[Dict[str, Any]],
+        articles_map: Dict[str, Dict[str, Any]]
+    ):
+        """GPT analysis of the new clusters (provisional titles otherwise)"""
+        if self.enrichment_service is None or not self.enrichment_service.enabled:
+            return
+        updates = []
+        for spec, new_cluster in zip(specs, new_clusters):
+            if not new_cluster:
+                continue
+            try:
+                enrichment = self.enrichment_service.enrich_cluster(
+                    new_cluster, [articles_map[aid] for aid in spec["representative_ids"]]
+                )
+            except Exception as e:
+                logger.error(f"Error enriching cluster {new_cluster.get('id')}: {e}", exc_info=True)
+                enrichment = None
+            if enrichment:
+                updates.append((new_cluster["id"], enrichment_update(enrichment, spec)))
+        if updates:
+            self.db_service.update_clusters_bulk(updates)
+            if self.reenrich_queue is not None:
+                self.reenrich_queue.mark_enriched([cid for cid, _ in updates])
@@ -0,0 +1,367 @@
+"""
+Event-driven micro-batch clustering of new articles (Postgres LISTEN/NOTIFY)
+"""
+import time
+import select
+import logging
+import threading
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .grouping import annotate_timestamps
+from .pipeline import link_recent_duplicates
+from .prefilter import encode_articles
+
+logger = logging.getLogger(__name__)
+
+# Channel of migration 014 (comma-separated article ids per notification)
+CHANNEL = "articles_inserted"
+# Only one worker listens at a time; the others wait as standbys
+WORKER_LOCK = "ml-cluster:stream-worker"
+
+
+class CentroidIndex:
+    """
+    Centroids of the recent clusters as one normalized matrix, reloaded from
+    cluster_embeddings every `refresh_seconds` (and on demand after new
+    clusters are created), so matching a micro-batch is one matmul instead of
+    a pgvector query per article. Safe to share between request threads.
+    `loader(days)` replaces get_recent_cluster_centroids as the source (e.g.
+    the centroids of a cascade model).
+    """
+
+    def __init__(
+        self,
+        db_service,
+        days: int = 7,
+        refresh_seconds: float = 60,
+        loader: Optional[Callable[[int], Tuple[List[str], np.ndarray]]] = None
+    ):
+        self.db_service = db_service
+        self.days = days
+        self.refresh_seconds = refresh_seconds
+        self.loader = loader or (lambda days: db_service.get_recent_cluster_centroids(days=days))
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            if not force and self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+            ids, matrix = self.loader(self.days)
+            if len(ids):
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms > 0, norms, 1)
+            self._ids, self._matrix = ids, matrix
+            self._loaded_at = time.monotonic()
+
+    def top(self, embeddings: np.ndarray, k: int, threshold: float) -> List[List[Tuple[str, float]]]:
+        """Up to k clusters (id, similarity) per row at or above the threshold, best first"""
+        with self._lock:
+            ids, matrix = self._ids, self._matrix
+        results: List[List[Tuple[str, float]]] = [[] for _ in range(len(embeddings))]
+        if not ids or not len(embeddings):
+            return results
+        sims = np.asarray(embeddings, dtype=np.float32) @ matrix.T
+        k = min(k, len(ids))
+        if k < len(ids):
+            candidates = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(len(ids)), (len(sims), 1))
+        for row, cols in enumerate(candidates):
+            row_sims = sims[row, cols]
+            for j in np.argsort(-row_sims):
+                if row_sims[j] < threshold:
+                    break
+                results[row].append((ids[cols[j]], float(row_sims[j])))
+        return results
+
+    def match(self, embeddings: np.ndarray, threshold: float) -> List[Optional[Tuple[str, float]]]:
+        """Best cluster (id, similarity) per row, or None below the threshold"""
+        return [hits[0] if hits else None for hits in self.top(embeddings, 1, threshold)]
+
+
+class MicroBatchWorker:
+    """
+    Long-running clustering loop fed by article-insert notifications.
+
+    New article ids are accumulated until `batch_size` of them are pending or
+    the oldest has waited `max_wait_seconds`. The batch is then encoded,
+    stored, deduplicated, linked to the cluster of a recent duplicate and
+    matched against the in-memory centroids, as the embed/match stage of a
+    sharded run does. Articles that fit no cluster stay unclustered; every
+    `global_interval_seconds` `run_global` (HDBSCAN over the leftovers,
+    under the cluster-run lock) groups them. With a `cascade`
+    (cascade.ModelCascade), a cheaper model settles the clear matches first
+    and only the rest goes through the primary model. The primary vectors of
+    settled articles are backfilled while no batch is pending (the articles
+    a previous worker left without one are picked up at each global run), so
+    merge, resplit, export and re-enrichment see them too.
+
+    Each batch is leased under `worker_id` (migration 016) while it is
+    processed, and cluster runs read with the leased articles excluded, so a
+    concurrent /api/cluster call never assigns the same articles.
+
+    Notifications sent while no worker is connected are lost, so every
+    (re)connect starts with a global run, which also encodes any article
+    without an embedding.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        embedding_service,
+        dedup_service,
+        centroids: CentroidIndex,
+        run_global: Callable[[set], Optional[Dict[str, Any]]],
+        similarity_threshold: float = 0.75,
+        batch_size: int = 64,
+        max_wait_seconds: float = 5,
+        global_interval_seconds: float = 300,
+        recent_index=None,
+        reenrich_queue=None,
+        new_prefilter: Optional[Callable[[], Any]] = None,
+        retry_seconds: float = 10,
+        cascade=None,
+        worker_id: str = "stream-worker",
+        lease_seconds: int = 600
+    ):
+        self.db_service = db_service
+        self.embedding_service = embedding_service
+        self.dedup_service = dedup_service
+        self.centroids = centroids
+        self.run_global = run_global
+        self.similarity_threshold = similarity_threshold
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.global_interval_seconds = global_interval_seconds
+        self.recent_index = recent_index
+        self.reenrich_queue = reenrich_queue
+        self.new_prefilter = new_prefilter or (lambda: None)
+        self.retry_seconds = retry_seconds
+        # ModelCascade: a cheaper model settles clear matches before the primary one
+        self.cascade = cascade
+        # Each micro-batch is leased (claim columns) so concurrent runs skip it
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+
+        self.stop_event = threading.Event()
+        self._pending: Dict[str, None] = {}  # ids in arrival order
+        self._first_pending_at: Optional[float] = None
+        self._next_global = 0.0
+        # Articles already matched since the last global run (not matched again there)
+        self._checked: set = set()
+        # Articles settled by the cascade still without a primary vector
+        self._backfill: Dict[str, None] = {}
+        self.stats = {
+            "batches": 0, "embedded": 0, "assigned": 0, "linked": 0, "cascaded": 0,
+            "backfilled": 0, "global_runs": 0
+        }
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """Listen until stop(); reconnects (and waits as standby) on its own"""
+        standby = False
+        while not self.stop_event.is_set():
+            conn = None
+            try:
+                conn = self.db_service.open_listener(CHANNEL)
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (WORKER_LOCK,))
+                    active = cur.fetchone()[0]
+                if not active:
+                    log = logger.debug if standby else logger.info
+                    log("Another stream worker is active, standing by")
+                    standby = True
+                    self.stop_event.wait(self.retry_seconds)
+                    continue
+                standby = False
+
+                logger.info(f"Stream worker listening on '{CHANNEL}'")
+                self._next_global = 0.0  # Catch up on what was missed while disconnected
+                self._listen(conn)
+            except Exception as e:
+                logger.error(f"Stream worker error, reconnecting in {self.retry_seconds}s: {e}", exc_info=True)
+                self.stop_event.wait(self.retry_seconds)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()  # Also releases the advisory lock
+                    except Exception:
+                        pass
+        while self._pending:
+            self.flush()
+
+    def _listen(self, conn):
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            deadline = self._next_global
+            if self._first_pending_at is not None:
+                deadline = min(deadline, self._first_pending_at + self.max_wait_seconds)
+            timeout = min(max(deadline - now, 0), 1.0)
+            if self._backfill and not self._pending:
+                timeout = 0
+
+            if select.select([conn], [], [], timeout)[0]:
+                conn.poll()
+                while conn.notifies:
+                    self.add(conn.notifies.pop(0).payload.split(","))
+
+            now = time.monotonic()
+            if self._pending and (
+                len(self._pending) >= self.batch_size
+                or now - self._first_pending_at >= self.max_wait_seconds
+            ):
+                self.flush()
+            elif self._backfill and not self._pending:
+                self.backfill()
+            if now >= self._next_global:
+                self._global()
+
+    def add(self, article_ids: List[str]):
+        """Queue new article ids (duplicates are ignored)"""
+        for aid in article_ids:
+            aid = aid.strip()
+            if aid:
+                self._pending.setdefault(aid, None)
+        if self._pending and self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+
+    def flush(self) -> Dict[str, int]:
+        """Process up to batch_size pending articles; failures are left to the global run"""
+        batch = list(self._pending)[:self.batch_size]
+        for aid in batch:
+            del self._pending[aid]
+        self._first_pending_at = time.monotonic() if self._pending else None
+        try:
+            return self.process(batch)
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} articles failed: {e}", exc_info=True)
+            return {}
+
+    def process(self, article_ids: List[str]) -> Dict[str, int]:
+        """
+        Encode, store, dedup, link and match one micro-batch. The articles are
+        leased first: ones already clustered or leased by a cluster run are
+        skipped, and runs started meanwhile do not read them.
+        """
+        articles = self.db_service.claim_articles(self.worker_id, article_ids, self.lease_seconds)
+        if not articles:
+            return {"embedded": 0, "assigned": 0, "linked": 0, "cascaded": 0}
+        try:
+            return self._process(articles)
+        finally:
+            self.db_service.release_article_claims(self.worker_id, [a["id"] for a in articles])
+
+    def _process(self, articles: List[Dict[str, Any]]) -> Dict[str, int]:
+        start = time.perf_counter()
+        annotate_timestamps(articles)
+        received = len(articles)
+
+        by_cluster: Dict[str, List[str]] = {}
+        assigned: List[str] = []
+        linked = 0
+        cascaded = 0
+        if self.cascade is not None:
+            # Clear matches settled by the cheap model skip the primary one
+            by_cluster, assigned, articles = self.cascade.split(articles)
+            linked = len(assigned)
+            cascaded = received - len(articles)
+            settled = assigned + [aid for members in by_cluster.values() for aid in members]
+            self._backfill.update(dict.fromkeys(settled))
+
+        if articles:
+            ids = [a["id"] for a in articles]
+            embeddings = encode_articles(self.embedding_service, articles, self.new_prefilter())
+            self.db_service.store_article_embeddings_batch(ids, embeddings)
+
+            embeddings, kept_ids, _ = self.dedup_service.deduplicate(embeddings, ids)
+            self._checked.update(kept_ids)
+            if self.recent_index is not None:
+                mask, recent_linked = link_recent_duplicates(self.db_service, self.recent_index, kept_ids, embeddings)
+                linked += recent_linked
+                assigned += [aid for aid, keep in zip(kept_ids, mask) if not keep]
+                kept_ids = [aid for aid, keep in zip(kept_ids, mask) if keep]
+                embeddings = embeddings[mask]
+
+            self.centroids.refresh()
+            for aid, hit in zip(kept_ids, self.centroids.match(embeddings, self.similarity_threshold)):
+                if hit:
+                    by_cluster.setdefault(hit[0], []).append(aid)
+        for cluster_id, members in by_cluster.items():
+            self.db_service.update_articles_cluster(members, cluster_id)
+            assigned += members
+        matched = sum(len(members) for members in by_cluster.values())
+
+        if self.reenrich_queue is not None and assigned:
+            self.reenrich_queue.note_articles(assigned)
+
+        self.stats["batches"] += 1
+        self.stats["embedded"] += len(articles)
+        self.stats["assigned"] += matched
+        self.stats["linked"] += linked
+        self.stats["cascaded"] += cascaded
+        logger.info(
+            f"Micro-batch: {received} articles, {cascaded} settled by the cascade model, "
+            f"{linked} linked, {matched} assigned to {len(by_cluster)} clusters "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return {"embedded": len(articles), "assigned": matched, "linked": linked, "cascaded": cascaded}
+
+    def backfill(self) -> int:
+        """Encode and store the primary vectors of up to batch_size articles settled by the cascade"""
+        chunk = list(self._backfill)[:self.batch_size]
+        for aid in chunk:
+            del self._backfill[aid]
+        if not chunk:
+            return 0
+        try:
+            articles = self.db_service.get_articles_by_ids(chunk)
+            if not articles:
+                return 0
+            ids = [a["id"] for a in articles]
+            embeddings = encode_articles(self.embedding_service, articles, self.new_prefilter())
+            self.db_service.store_article_embeddings_batch(ids, embeddings)
+            if self.reenrich_queue is not None:
+                # Their clusters' centroid and count now include them
+                self.reenrich_queue.note_articles(ids)
+        except Exception as e:
+            # Left to the sweep of the next global run
+            logger.error(f"Backfill of {len(chunk)} primary vectors failed: {e}", exc_info=True)
+            return 0
+        self.stats["backfilled"] += len(ids)
+        logger.info(f"Backfilled the primary vectors of {len(ids)} cascade-settled articles")
+        return len(ids)
+
+    def _global(self):
+        """Periodic HDBSCAN over the leftovers (skipped if another run holds the lock)"""
+        self._next_global = time.monotonic() + self.global_interval_seconds
+        if self.cascade is not None:
+            try:
+                missing = self.db_service.get_articles_missing_embeddings(self.cascade.model, days=self.cascade.days)
+                self._backfill.update(dict.fromkeys(missing))
+            except Exception as e:
+                logger.warning(f"Could not list articles awaiting a primary vector: {e}")
+        checked, self._checked = self._checked, set()
+        try:
+            result = self.run_global(checked)
+        except Exception as e:
+            logger.error(f"Stream worker global run failed: {e}", exc_info=True)
+            return
+        self.stats["global_runs"] += 1
+        if result and result.get("created"):
+            self.centroids.invalidate()
+            if self.cascade is not None:
+                self.cascade.invalidate()
+        logger.info(f"Stream worker global run: {result}")
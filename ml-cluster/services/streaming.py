@@ -0,0 +1,193 @@
+"""
+Overlapped fetch → encode → persist pipeline for clustering runs
+"""
+import time
+import queue
+import threading
+import logging
+from typing import Callable, Iterator, List, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+from .grouping import annotate_timestamps
+from .prefilter import DuplicatePrefilter, encode_articles
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed through the queues
+_DONE = object()
+
+
+class StreamingEncoder:
+    """
+    Bounded producer/consumer pipeline for the front half of a clustering run.
+
+    A fetcher thread pages unclustered articles into a bounded queue, the
+    calling thread encodes them, and a writer thread stores each encoded
+    batch in article_embeddings while the next page is being encoded. Full
+    queues block the stage upstream, so at most `queue_depth` pages (and
+    `queue_depth` encoded batches) are in flight.
+
+    The assembled (articles, ids, embeddings) are returned in fetch order
+    for the global stages (dedup, HDBSCAN).
+    """
+
+    def __init__(
+        self,
+        db_service,
+        embedding_service,
+        page_size: int = 200,
+        queue_depth: int = 2,
+        encode_batch_size: Optional[int] = None,
+        page_source: Optional[Callable[..., Iterator[List[Dict[str, Any]]]]] = None,
+        prefilter: Optional[DuplicatePrefilter] = None
+    ):
+        """
+        Args:
+            db_service: DatabaseService
+            embedding_service: EmbeddingService
+            page_size: Articles per fetch request
+            queue_depth: Max pages / encoded batches waiting between stages
+            encode_batch_size: Texts per encode call (default: page_size). Raise it
+                to at least ENCODE_MP_MIN_TEXTS so the multi-process pool kicks in.
+            page_source: Page generator taking (days, limit, page_size); defaults
+                to db_service.iter_unclustered_articles
+            prefilter: Exact/near-exact duplicate detector; articles it collapses
+                reuse their representative's vector instead of being encoded
+        """
+        self.db_service = db_service
+        self.embedding_service = embedding_service
+        self.page_size = page_size
+        self.queue_depth = queue_depth
+        self.encode_batch_size = max(encode_batch_size or page_size, 1)
+        self.page_source = page_source or db_service.iter_unclustered_articles
+        self.prefilter = prefilter
+        self.stats: Dict[str, float] = {}
+
+    def run(self, days: int = 7, limit: int = 500) -> Tuple[List[Dict[str, Any]], List[str], np.ndarray]:
+        """Fetch, encode and store up to `limit` unclustered articles"""
+        pages: "queue.Queue" = queue.Queue(maxsize=self.queue_depth)
+        writes: "queue.Queue" = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        stats = {"pages": 0, "fetch_s": 0.0, "encode_s": 0.0, "store_s": 0.0, "encode_wait_s": 0.0,
+                 "prefiltered": 0}
+
+        def put(q: "queue.Queue", item) -> bool:
+            """Blocking put that gives up once the pipeline is stopping"""
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch():
+            try:
+                pager = self.page_source(
+                    days=days, limit=limit, page_size=self.page_size
+                )
+                while True:
+                    start = time.perf_counter()
+                    page = next(pager, None)
+                    if page is not None:
+                        # Parsed here, off the encoding thread, once per article
+                        annotate_timestamps(page)
+                    stats["fetch_s"] += time.perf_counter() - start
+                    if page is None or not put(pages, page):
+                        break
+                    stats["pages"] += 1
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(pages, _DONE)
+
+        def write():
+            while True:
+                item = writes.get()
+                if item is _DONE:
+                    return
+                ids, embeddings = item
+                start = time.perf_counter()
+                try:
+                    self.db_service.store_article_embeddings_batch(ids, embeddings)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+                stats["store_s"] += time.perf_counter() - start
+
+        fetcher = threading.Thread(target=fetch, name="stream-fetch", daemon=True)
+        writer = threading.Thread(target=write, name="stream-write", daemon=True)
+        fetcher.start()
+        writer.start()
+
+        articles: List[Dict[str, Any]] = []
+        chunks: List[np.ndarray] = []
+        seen = set()
+        pending: List[Dict[str, Any]] = []
+        known: Dict[str, np.ndarray] = {}
+        start_total = time.perf_counter()
+
+        def flush():
+            if not pending:
+                return
+            start = time.perf_counter()
+            embeddings = encode_articles(self.embedding_service, pending, self.prefilter, known)
+            stats["encode_s"] += time.perf_counter() - start
+            put(writes, ([a["id"] for a in pending], embeddings))
+            articles.extend(pending)
+            chunks.append(embeddings)
+            if self.prefilter:
+                # Later pages may duplicate these articles
+                known.update(zip((a["id"] for a in pending), embeddings))
+            pending.clear()
+
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    page = pages.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                finally:
+                    stats["encode_wait_s"] += time.perf_counter() - start
+                if page is _DONE:
+                    break
+                for article in page:
+                    # Offset paging can repeat a row if new articles arrive mid-run
+                    if article["id"] not in seen:
+                        seen.add(article["id"])
+                        pending.append(article)
+                if len(pending) >= self.encode_batch_size:
+                    flush()
+            if not stop.is_set():
+                flush()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # Let the writer drain what was already encoded, then stop the fetcher
+            writes.put(_DONE)
+            writer.join()
+            stop.set()
+            fetcher.join()
+
+        stats["total_s"] = time.perf_counter() - start_total
+        if self.prefilter:
+            stats["prefiltered"] = self.prefilter.stats["exact"] + self.prefilter.stats["near"]
+        self.stats = stats
+        if errors:
+            raise errors[0]
+
+        logger.info(
+            f"Streamed {len(articles)} articles in {stats['pages']} pages: "
+            f"total={stats['total_s']:.1f}s fetch={stats['fetch_s']:.1f}s "
+            f"encode={stats['encode_s']:.1f}s store={stats['store_s']:.1f}s"
+            + (f" prefiltered={stats['prefiltered']} ({self.prefilter.saved_fraction:.0%} of encode work saved)"
+               if self.prefilter else "")
+        )
+
+        if not articles:
+            return [], [], np.array([])
+        return articles, [a["id"] for a in articles], np.vstack(chunks)
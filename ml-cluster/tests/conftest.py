@@ -0,0 +1,8 @@
+"""
+Shared pytest setup: the services import `config` from the ml-cluster root
+"""
+import os
+import sys
+
+# Add the ml-cluster directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,102 @@
+import numpy as np
+
+from services.blocked import stitch_blocks, time_slices
+
+HOUR = 3600.0
+
+
+def block(rows, owned=None) -> dict:
+    rows = np.asarray(rows, dtype=np.int64)
+    owned = np.ones(len(rows), dtype=bool) if owned is None else np.asarray(owned, dtype=bool)
+    return {"key": "*", "rows": rows, "owned": owned}
+
+
+def test_small_input_is_one_slice():
+    ((rows, owned),) = time_slices(np.arange(10, dtype=float), max_block=10, overlap_seconds=HOUR)
+
+    assert rows.tolist() == list(range(10))
+    assert owned.all()
+
+
+def test_every_row_is_owned_once():
+    timestamps = np.random.default_rng(0).uniform(0, 100 * HOUR, 1000)
+
+    slices = time_slices(timestamps, max_block=300, overlap_seconds=2 * HOUR)
+
+    assert len(slices) == 4
+    owners = np.concatenate([rows[owned] for rows, owned in slices])
+    assert sorted(owners.tolist()) == list(range(1000))
+    assert all(owned.sum() <= 300 for _, owned in slices)
+
+
+def test_slices_take_the_rows_just_after_their_end():
+    timestamps = np.arange(20, dtype=float) * HOUR
+
+    (first_rows, first_owned), (second_rows, _) = time_slices(timestamps, max_block=10, overlap_seconds=3 * HOUR)
+
+    borrowed = first_rows[~first_owned]
+    assert borrowed.min() >= second_rows.min()
+    assert (timestamps[borrowed] - timestamps[first_rows[first_owned]].max()).max() <= 3 * HOUR
+    assert len(borrowed) > 0
+
+
+def test_rows_without_a_date_go_to_the_median_slice():
+    timestamps = np.arange(30, dtype=float) * HOUR
+    timestamps[[0, 29]] = np.nan
+
+    slices = time_slices(timestamps, max_block=10, overlap_seconds=0)
+
+    owner = {int(r): s for s, (rows, owned) in enumerate(slices) for r in rows[owned]}
+    assert owner[0] == owner[29] == owner[15] == 1
+
+
+def test_similar_clusters_of_different_blocks_are_joined():
+    embeddings = np.array([[1, 0], [1, 0.05], [1, 0.02], [1, 0.03], [0, 1], [0.05, 1]], dtype=float)
+    blocks = [block([0, 1, 4]), block([2, 3, 5])]
+    block_labels = [np.array([0, 0, -1]), np.array([0, 0, -1])]
+
+    labels, stitched = stitch_blocks(blocks, block_labels, embeddings, threshold=0.95, n_rows=6)
+
+    assert stitched == 1
+    assert labels.tolist() == [0, 0, 0, 0, -1, -1]
+
+
+def test_dissimilar_clusters_stay_apart():
+    embeddings = np.array([[1, 0], [1, 0.05], [0, 1], [0.05, 1]], dtype=float)
+    blocks = [block([0, 1]), block([2, 3])]
+    block_labels = [np.array([0, 0]), np.array([0, 0])]
+
+    labels, stitched = stitch_blocks(blocks, block_labels, embeddings, threshold=0.95, n_rows=4)
+
+    assert stitched == 0
+    assert labels[0] == labels[1] != labels[2] == labels[3]
+
+
+def test_clusters_sharing_overlap_rows_are_joined():
+    # Centroids far apart, but the second block's cluster holds half of the first one
+    embeddings = np.array([[1, 0], [1, 0], [0, 1], [0, 1], [0, 1]], dtype=float)
+    blocks = [block([0, 1]), block([0, 2, 3, 4], owned=[False, True, True, True])]
+    block_labels = [np.array([0, 0]), np.array([0, 0, 0, 0])]
+
+    labels, stitched = stitch_blocks(blocks, block_labels, embeddings, threshold=0.95, n_rows=5)
+
+    assert stitched == 1
+    assert len(set(labels.tolist())) == 1
+
+
+def test_outlier_of_its_own_block_takes_the_overlap_label():
+    embeddings = np.array([[1, 0], [1, 0.01], [1, 0.02], [0, 1], [0.01, 1]], dtype=float)
+    blocks = [block([0, 1, 2]), block([2, 3, 4], owned=[False, True, True])]
+    block_labels = [np.array([0, 0, -1]), np.array([0, 1, 1])]
+
+    labels, _ = stitch_blocks(blocks, block_labels, embeddings, threshold=0.95, n_rows=5)
+
+    assert labels[2] == labels[0] == labels[1]
+    assert labels[3] == labels[4] != labels[0]
+
+
+def test_no_clusters():
+    labels, stitched = stitch_blocks([block([0, 1])], [np.array([-1, -1])], np.eye(2), threshold=0.9, n_rows=2)
+
+    assert labels.tolist() == [-1, -1]
+    assert stitched == 0
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+
+from services.embeddings import EmbeddingCache, normalize_text
+
+
+def vector(value: float, dim: int = 4) -> np.ndarray:
+    return np.full(dim, value, dtype=np.float32)
+
+
+def entry_size(key: str, dim: int = 4) -> int:
+    return dim * 4 + len(key.encode("utf-8"))
+
+
+def test_get_returns_stored_vector_and_counts_hits():
+    cache = EmbeddingCache()
+    cache.put("a", vector(1.0))
+
+    assert np.array_equal(cache.get("a"), vector(1.0))
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_stored_vectors_are_float32_and_read_only():
+    cache = EmbeddingCache()
+    source = np.arange(4, dtype=np.float64)
+    cache.put("a", source)
+    source[0] = 99
+
+    cached = cache.get("a")
+    assert cached.dtype == np.float32
+    assert cached[0] == 0
+    assert not cached.flags.writeable
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = EmbeddingCache(max_bytes=2 * entry_size("a"))
+    cache.put("a", vector(1.0))
+    cache.put("b", vector(2.0))
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", vector(3.0))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = EmbeddingCache()
+    cache.put("a", vector(1.0))
+    cache.put("a", vector(2.0))
+
+    assert cache.stats()["bytes"] == entry_size("a")
+    assert cache.get("a")[0] == 2.0
+
+
+def test_entry_larger_than_budget_is_not_stored():
+    cache = EmbeddingCache(max_bytes=entry_size("a") - 1)
+    cache.put("a", vector(1.0))
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_clear_keeps_counters():
+    cache = EmbeddingCache()
+    cache.put("a", vector(1.0))
+    cache.get("a")
+    cache.clear()
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"]) == (0, 0, 1)
+
+
+def test_concurrent_puts_stay_within_budget():
+    cache = EmbeddingCache(max_bytes=50 * entry_size("k000"))
+
+    def worker(offset: int):
+        for i in range(200):
+            key = f"k{(offset + i) % 1000:03d}"
+            cache.put(key, vector(float(i)))
+            cache.get(key)
+
+    threads = [threading.Thread(target=worker, args=(t * 250,)) for t in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["entries"] == 50
+
+
+def test_normalize_text_is_the_cache_key():
+    assert normalize_text("  Café  news\n") == normalize_text("Café news")
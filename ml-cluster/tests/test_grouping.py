@@ -0,0 +1,87 @@
+import numpy as np
+
+from services.grouping import group_clusters, parse_published_at
+
+
+def unit(*values: float) -> np.ndarray:
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def article(published_at=None, source_id=None, countries=None, topics=None) -> dict:
+    return {
+        "published_at": published_at,
+        "source_id": source_id,
+        "countries": countries or [],
+        "topics": topics or [],
+    }
+
+
+def test_groups_members_by_label_and_drops_small_clusters():
+    labels = np.array([1, 0, -1, 1, 0, 2])
+    embeddings = np.stack([unit(1, 0, 0)] * 6)
+    articles = [article() for _ in labels]
+
+    groups = group_clusters(labels, embeddings, articles, min_size=2)
+
+    assert [g["label"] for g in groups] == [0, 1]
+    assert groups[0]["indices"].tolist() == [1, 4]
+    assert groups[1]["indices"].tolist() == [0, 3]
+
+
+def test_only_outliers_gives_no_groups():
+    labels = np.array([-1, -1])
+    embeddings = np.stack([unit(1, 0), unit(0, 1)])
+
+    assert group_clusters(labels, embeddings, [article(), article()]) == []
+
+
+def test_centroid_is_the_normalized_mean():
+    labels = np.array([0, 0])
+    embeddings = np.stack([unit(1, 0), unit(0, 1)])
+
+    (group,) = group_clusters(labels, embeddings, [article(), article()])
+
+    assert np.allclose(group["centroid"], unit(1, 1))
+
+
+def test_window_ignores_missing_dates():
+    labels = np.array([0, 0, 0])
+    embeddings = np.stack([unit(1, 0)] * 3)
+    articles = [
+        article("2024-05-02T10:00:00Z"),
+        article(None),
+        article("2024-05-01T08:00:00+00:00"),
+    ]
+
+    (group,) = group_clusters(labels, embeddings, articles)
+
+    assert group["window_start"] == "2024-05-01T08:00:00+00:00"
+    assert group["window_end"] == "2024-05-02T10:00:00+00:00"
+
+
+def test_counts_distinct_sources_and_ranks_terms():
+    labels = np.array([0, 0, 0, 1, 1])
+    embeddings = np.stack([unit(1, 0)] * 5)
+    articles = [
+        article(source_id="a", countries=["FR", "DE"], topics=["energy"]),
+        article(source_id="a", countries=["DE", "DE"], topics=["energy", "gas"]),
+        article(source_id="b", countries=["ES"]),
+        article(source_id=None, countries=["US"]),
+        article(source_id="c", countries=["US"], topics=["trade"]),
+    ]
+
+    first, second = group_clusters(labels, embeddings, articles, top_terms=2)
+
+    assert first["source_count"] == 2
+    # DE counts once per article; FR and ES tie at one, first appearance wins
+    assert first["countries"] == ["DE", "FR"]
+    assert first["topics"] == ["energy", "gas"]
+    assert second["source_count"] == 1
+    assert second["countries"] == ["US"]
+
+
+def test_parse_published_at_handles_bad_input():
+    assert np.isnan(parse_published_at(None))
+    assert np.isnan(parse_published_at("yesterday"))
+    assert parse_published_at("1970-01-01T00:01:00") == 60
@@ -0,0 +1,94 @@
+import hdbscan
+import numpy as np
+import pytest
+
+from services.hierarchy import HierarchyStore
+
+
+def blobs(seed: int = 0):
+    """Two pairs of nearby blobs: four groups at a fine cut, two at a coarse one"""
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0], [0, 3], [20, 0], [20, 3]], dtype=float)
+    points = np.vstack([c + 0.3 * rng.standard_normal((30, 2)) for c in centers])
+    return points, [f"a{i}" for i in range(len(points))]
+
+
+def fit(points: np.ndarray, min_cluster_size: int, epsilon: float = 0.0, method: str = "eom"):
+    clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=3,
+        cluster_selection_epsilon=epsilon,
+        cluster_selection_method=method
+    ).fit(points)
+    return clusterer.labels_, clusterer.single_linkage_tree_.to_numpy()
+
+
+@pytest.fixture
+def store(tmp_path):
+    points, ids = blobs()
+    _, linkage = fit(points, 5)
+    store = HierarchyStore(str(tmp_path), min_articles=10)
+    assert store.save(ids, linkage, min_cluster_size=5, min_samples=3)
+    return store
+
+
+@pytest.mark.parametrize("min_cluster_size", [5, 10, 40])
+def test_cut_matches_hdbscan_refit(store, min_cluster_size):
+    points, ids = blobs()
+    labels, _ = fit(points, min_cluster_size)
+
+    result = store.cut(min_cluster_size)
+
+    assert result["article_ids"] == ids
+    assert np.array_equal(result["labels"], labels)
+
+
+def n_groups(result) -> int:
+    return len(set(result["labels"].tolist()) - {-1})
+
+
+def test_epsilon_merges_nearby_groups(store):
+    points, _ = blobs()
+
+    coarse = store.cut(5, epsilon=5.0)
+
+    assert n_groups(store.cut(5)) == 4
+    assert n_groups(coarse) == 2
+    assert np.array_equal(coarse["labels"], fit(points, 5, epsilon=5.0)[0])
+
+
+def test_leaf_gives_the_finest_groups(store):
+    points, _ = blobs()
+
+    leaf = store.cut(5, method="leaf")
+
+    assert n_groups(leaf) > n_groups(store.cut(5))
+    assert np.array_equal(leaf["labels"], fit(points, 5, method="leaf")[0])
+
+
+def test_defaults_to_the_run_min_cluster_size(store):
+    assert np.array_equal(store.cut()["labels"], store.cut(5)["labels"])
+    assert store.info()["min_cluster_size"] == 5
+
+
+def test_another_process_sees_the_saved_tree(store, tmp_path):
+    reader = HierarchyStore(str(tmp_path))
+
+    assert reader.info()["articles"] == 120
+    assert np.array_equal(reader.cut(10)["labels"], store.cut(10)["labels"])
+
+
+def test_small_runs_do_not_replace_the_tree(store):
+    points, ids = blobs(seed=1)
+    _, linkage = fit(points[:8], 2)
+
+    assert not store.save(ids[:8], linkage, min_cluster_size=2, min_samples=3)
+    assert store.info()["articles"] == 120
+
+
+def test_without_a_tree_and_bad_arguments(tmp_path, store):
+    assert HierarchyStore(str(tmp_path / "empty")).cut() is None
+    with pytest.raises(ValueError):
+        store.cut(method="dbscan")
+    with pytest.raises(ValueError):
+        store.cut(1)
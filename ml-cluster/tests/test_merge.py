@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from services.merge import find_merge_groups
+
+
+def brute_force_groups(centroids: np.ndarray, threshold: float, groups=None):
+    """Connected components of the full similarity matrix, for comparison"""
+    unit = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+    linked = unit @ unit.T >= threshold
+    if groups is not None:
+        linked &= groups[:, None] != groups[None, :]
+    seen, components = set(), []
+    for i in range(len(centroids)):
+        if i in seen:
+            continue
+        stack, component = [i], set()
+        while stack:
+            j = stack.pop()
+            if j not in component:
+                component.add(j)
+                stack.extend(np.flatnonzero(linked[j]).tolist())
+        seen |= component
+        if len(component) > 1:
+            components.append(sorted(component))
+    return sorted(components)
+
+
+def test_links_transitively():
+    # a~b and b~c are above the threshold, a~c is not
+    centroids = np.array([[1.0, 0.0], [0.94, 0.34], [0.77, 0.64], [-1.0, 0.0]])
+
+    assert find_merge_groups(centroids, 0.93) == [[0, 1, 2]]
+
+
+def test_fewer_than_two_rows():
+    assert find_merge_groups(np.ones((1, 3)), 0.5) == []
+    assert find_merge_groups(np.empty((0, 3)), 0.5) == []
+
+
+def test_zero_centroid_links_nothing():
+    centroids = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 0.01]])
+
+    assert find_merge_groups(centroids, 0.9) == [[1, 2]]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1024])
+def test_blocks_match_the_full_matrix(block_size):
+    rng = np.random.default_rng(3)
+    base = rng.standard_normal((20, 16))
+    centroids = np.repeat(base, 3, axis=0) + 0.05 * rng.standard_normal((60, 16))
+
+    groups = find_merge_groups(centroids, 0.95, block_size=block_size)
+
+    assert sorted(sorted(g) for g in groups) == brute_force_groups(centroids, 0.95)
+
+
+def test_rows_with_the_same_key_are_not_linked():
+    centroids = np.array([[1.0, 0.0], [1.0, 0.01], [1.0, 0.02]])
+    keys = np.array(["a", "a", "b"])
+
+    groups = find_merge_groups(centroids, 0.99, block_size=2, groups=keys)
+
+    assert sorted(sorted(g) for g in groups) == brute_force_groups(centroids, 0.99, keys)
+    assert sorted(groups[0]) == [0, 1, 2]
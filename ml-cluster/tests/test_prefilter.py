@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from services.prefilter import DuplicatePrefilter, encode_articles, normalize_text
+
+STORY = (
+    "The central bank raised interest rates by half a point on Thursday, "
+    "citing persistent inflation in energy and food prices across the region "
+    "and warning that further increases could follow later this year"
+)
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.encoded = []
+
+    def prepare_article_text(self, title, snippet=None, content=None, countries=None, topics=None):
+        return " ".join(part for part in (title, snippet, content) if part)
+
+    def encode(self, texts, use_cache=True):
+        self.encoded.extend(texts)
+        return np.stack([np.full(2, len(t), dtype=np.float32) for t in texts])
+
+
+def test_normalize_text_drops_case_accents_and_punctuation():
+    assert normalize_text("Élection: ¡Sí, GANÓ!") == ["election", "si", "gano"]
+    assert normalize_text(None) == []
+
+
+def test_exact_duplicate_maps_to_the_first_article():
+    prefilter = DuplicatePrefilter()
+
+    assert prefilter.find_representative("a", STORY) is None
+    assert prefilter.find_representative("b", STORY.upper() + "!") == "a"
+    assert prefilter.stats == {"seen": 2, "exact": 1, "near": 0}
+
+
+def test_same_title_and_content_hash_is_exact():
+    prefilter = DuplicatePrefilter()
+    prefilter.find_representative("a", "short text", title="Rates up", content_hash="h1")
+
+    assert prefilter.find_representative("b", "other text", title="rates UP", content_hash="h1") == "a"
+    assert prefilter.find_representative("c", "third text", title="Rates down", content_hash="h1") is None
+
+
+def test_near_duplicate_above_threshold():
+    prefilter = DuplicatePrefilter(threshold=0.8)
+    prefilter.find_representative("a", STORY)
+
+    assert prefilter.find_representative("b", STORY + " analysts said") == "a"
+    assert prefilter.stats["near"] == 1
+
+
+def test_different_story_is_a_new_representative():
+    prefilter = DuplicatePrefilter()
+    prefilter.find_representative("a", STORY)
+
+    other = "Heavy rain flooded several villages in the north after the river burst its banks overnight"
+    assert prefilter.find_representative("b", other) is None
+    assert prefilter.saved_fraction == 0.0
+
+
+def test_num_perm_must_divide_into_bands():
+    with pytest.raises(ValueError):
+        DuplicatePrefilter(num_perm=64, bands=10)
+
+
+def test_encode_articles_reuses_representative_vectors():
+    embedding_service = FakeEmbeddingService()
+    articles = [
+        {"id": "a", "title": "Rates", "full_content": STORY},
+        {"id": "b", "title": "Rates", "full_content": STORY},
+        {"id": "c", "title": "Floods", "full_content": "Rivers burst"},
+        {"id": "d", "title": "Earlier", "full_content": "Seen on a previous page"},
+    ]
+    prefilter = DuplicatePrefilter()
+    prefilter.find_representative("z", "Earlier Seen on a previous page")
+    known = {"z": np.array([7, 7], dtype=np.float32)}
+
+    embeddings = encode_articles(embedding_service, articles, prefilter, known)
+
+    assert len(embedding_service.encoded) == 2
+    assert np.array_equal(embeddings[0], embeddings[1])
+    assert np.array_equal(embeddings[3], known["z"])
@@ -0,0 +1,50 @@
+import numpy as np
+
+from services.grouping import select_representatives
+
+
+def unit(*values: float) -> np.ndarray:
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+# Three near-copies close to the centroid and one farther, different article
+EMBEDDINGS = np.stack([
+    unit(1.0, 0.05, 0.0),
+    unit(1.0, 0.04, 0.0),
+    unit(1.0, 0.06, 0.0),
+    unit(0.7, 0.0, 0.7),
+])
+CENTROID = unit(1.0, 0.05, 0.1)
+
+
+def test_first_pick_is_the_most_central():
+    picks = select_representatives(EMBEDDINGS, CENTROID, k=1)
+
+    sims = EMBEDDINGS @ CENTROID
+    assert picks.tolist() == [int(np.argmax(sims))]
+
+
+def test_zero_diversity_ranks_by_centrality():
+    picks = select_representatives(EMBEDDINGS, CENTROID, k=4, diversity=0.0)
+
+    assert picks.tolist() == np.argsort(-(EMBEDDINGS @ CENTROID), kind="stable").tolist()
+
+
+def test_diversity_prefers_a_different_article_over_near_copies():
+    central_only = select_representatives(EMBEDDINGS, CENTROID, k=2, diversity=0.0)
+    diverse = select_representatives(EMBEDDINGS, CENTROID, k=2, diversity=0.5)
+
+    assert 3 not in central_only
+    assert diverse[1] == 3
+
+
+def test_picks_are_distinct_and_capped_at_cluster_size():
+    picks = select_representatives(EMBEDDINGS, CENTROID, k=10)
+
+    assert sorted(picks.tolist()) == [0, 1, 2, 3]
+
+
+def test_empty_cluster_and_zero_centroid():
+    assert len(select_representatives(np.empty((0, 3), dtype=np.float32), CENTROID)) == 0
+    assert len(select_representatives(EMBEDDINGS, np.zeros(3, dtype=np.float32), k=2)) == 2
@@ -0,0 +1,59 @@
+import numpy as np
+
+from services.resplit import cluster_dispersion
+
+
+def mean_distance_to_centroid(rows: np.ndarray) -> float:
+    """Direct definition: mean cosine distance of each member to the centroid"""
+    unit = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    centroid = unit.mean(axis=0)
+    centroid /= np.linalg.norm(centroid)
+    return float(np.mean(1 - unit @ centroid))
+
+
+def test_identical_members_have_no_dispersion():
+    embeddings = np.array([[1.0, 0.0], [2.0, 0.0], [0.0, 3.0]])
+
+    ids, starts, dispersion = cluster_dispersion(["a", "a", "b"], embeddings)
+
+    assert ids == ["a", "b"]
+    assert starts.tolist() == [0, 2]
+    assert np.allclose(dispersion, [0.0, 0.0])
+
+
+def test_orthogonal_pair():
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+    _, _, dispersion = cluster_dispersion(["a", "a"], embeddings)
+
+    # |mean| = sqrt(0.5): each member is 45 degrees from the centroid
+    assert np.isclose(dispersion[0], 1 - np.sqrt(0.5))
+
+
+def test_matches_the_direct_definition():
+    rng = np.random.default_rng(5)
+    sizes = [3, 1, 8, 2]
+    embeddings = rng.standard_normal((sum(sizes), 12))
+    cluster_of_row = [cid for cid, size in zip("wxyz", sizes) for _ in range(size)]
+
+    ids, starts, dispersion = cluster_dispersion(cluster_of_row, embeddings)
+
+    assert ids == list("wxyz")
+    bounds = np.append(starts, len(cluster_of_row))
+    expected = [mean_distance_to_centroid(embeddings[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+    assert np.allclose(dispersion, expected)
+
+
+def test_repeated_id_in_separate_runs_is_a_separate_group():
+    embeddings = np.eye(3)
+
+    ids, starts, _ = cluster_dispersion(["a", "b", "a"], embeddings)
+
+    assert ids == ["a", "b", "a"]
+    assert starts.tolist() == [0, 1, 2]
+
+
+def test_empty_input():
+    ids, starts, dispersion = cluster_dispersion([], np.empty((0, 4)))
+
+    assert ids == [] and len(starts) == 0 and len(dispersion) == 0
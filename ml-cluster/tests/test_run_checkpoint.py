@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from services.pipeline import RunCheckpoint
+
+
+def test_fresh_checkpoint_has_no_stage(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "run")
+
+    assert checkpoint.last_stage is None
+    assert not checkpoint.done("fetch")
+    assert checkpoint.count("articles") == 0
+
+
+def test_completed_stages_survive_a_restart(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "run")
+    checkpoint.save_array("embeddings", np.eye(3, dtype=np.float32))
+    checkpoint.save_json("article_ids", ["a", "b", "c"])
+    checkpoint.mark_done("fetch", articles=3)
+
+    resumed = RunCheckpoint(str(tmp_path), "run")
+
+    assert resumed.last_stage == "fetch"
+    assert resumed.done("fetch")
+    assert resumed.count("articles") == 3
+    assert np.array_equal(resumed.load_array("embeddings"), np.eye(3))
+    assert resumed.load_json("article_ids") == ["a", "b", "c"]
+
+
+def test_expired_checkpoint_starts_over(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "run", max_age=60)
+    checkpoint.save_json("article_ids", ["a"])
+    checkpoint.mark_done("fetch")
+    checkpoint.manifest["created_at"] = time.time() - 120
+    checkpoint._write_manifest()
+
+    resumed = RunCheckpoint(str(tmp_path), "run", max_age=60)
+
+    assert resumed.last_stage is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "run", "article_ids.json"))
+
+
+def test_unreadable_manifest_starts_over(tmp_path):
+    os.makedirs(tmp_path / "run")
+    (tmp_path / "run" / "manifest.json").write_text("{not json")
+
+    assert RunCheckpoint(str(tmp_path), "run").last_stage is None
+
+
+def test_jsonl_stops_at_a_truncated_line(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "run")
+    checkpoint.append_json("enriched", {"cluster_id": "c1"})
+    checkpoint.append_json("enriched", {"cluster_id": "c2"})
+    with open(os.path.join(checkpoint.path, "enriched.jsonl"), "a") as f:
+        f.write(json.dumps({"cluster_id": "c3"})[:8])
+
+    assert checkpoint.load_jsonl("enriched") == [{"cluster_id": "c1"}, {"cluster_id": "c2"}]
+    assert checkpoint.load_jsonl("missing") == []
+
+
+def test_clear_removes_the_directory(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "run")
+    checkpoint.mark_done("fetch")
+    checkpoint.clear()
+
+    assert not os.path.exists(checkpoint.path)
+    assert RunCheckpoint(str(tmp_path), "run").last_stage is None
@@ -0,0 +1,68 @@
+"""
+pgvector search plans; needs a PostgreSQL database with the migrations applied
+"""
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from config import Config
+from services.database import DatabaseService
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL not set")
+
+# Below a couple of thousand rows the planner prefers a sequential scan
+ROWS = 3000
+
+
+@pytest.fixture(scope="module")
+def db():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Config, "DATABASE_URL", os.environ["DATABASE_URL"])
+        # Only the direct SQL connection is used; the Supabase client just needs settings
+        mp.setattr(Config, "SUPABASE_URL", Config.SUPABASE_URL or "http://localhost")
+        mp.setattr(Config, "SUPABASE_SERVICE_KEY", Config.SUPABASE_SERVICE_KEY or "unused")
+        yield DatabaseService()
+
+
+@pytest.fixture(scope="module")
+def cluster_rows(db):
+    from psycopg2.extras import execute_values
+
+    ids = [str(uuid.uuid4()) for _ in range(ROWS)]
+    embeddings = np.random.default_rng(0).standard_normal((ROWS, 384)).astype(np.float32)
+    with db.pg_connection() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO clusters (id, canonical_title, window_start, window_end) VALUES %s",
+            [(cluster_id, "test") for cluster_id in ids],
+            template="(%s, %s, NOW(), NOW())"
+        )
+        execute_values(
+            cur,
+            "INSERT INTO cluster_embeddings (cluster_id, embedding) VALUES %s",
+            [(cluster_id, e.tolist()) for cluster_id, e in zip(ids, embeddings)],
+            template="(%s, %s::vector)"
+        )
+        cur.execute("ANALYZE cluster_embeddings")
+        conn.commit()
+    yield ids
+    with db.pg_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM clusters WHERE id = ANY(%s::uuid[])", (ids,))
+        cur.execute("ANALYZE cluster_embeddings")
+        conn.commit()
+
+
+@pytest.mark.parametrize("k", [5, 40, 200])
+def test_cluster_search_uses_the_hnsw_index(db, cluster_rows, k):
+    query = np.random.default_rng(1).standard_normal(384).astype(np.float32)
+
+    plan = db.explain_vector_search("cluster_embeddings", query, k)
+
+    assert any("Index Scan using cluster_embeddings_embedding_hnsw_idx" in line for line in plan), plan
+
+
+def test_explain_rejects_other_tables(db):
+    with pytest.raises(ValueError):
+        db.explain_vector_search("articles", np.zeros(384, dtype=np.float32), 5)
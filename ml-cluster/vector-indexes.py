@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Manage the pgvector ANN indexes of article_embeddings and cluster_embeddings.
+
+    status   indexes, options and row counts, with the recommended ivfflat lists
+    rebuild  build a new HNSW or ivfflat index (CONCURRENTLY) and drop the old one
+    check    EXPLAIN the k-NN query the service runs; exit 1 if it does not use
+             the ANN index (sequential scan)
+
+ivfflat centroids are trained on the rows present at build time: rebuild with
+`--method ivfflat` (lists = rows / 1000, sqrt(rows) above 1M rows) as a table
+grows, or switch to HNSW, which needs no rebuilds. On small tables Postgres
+may rightly prefer a sequential scan; `check` reports it all the same.
+
+Examples:
+    python vector-indexes.py status
+    python vector-indexes.py rebuild article_embeddings --method hnsw --maintenance-work-mem 1GB
+    python vector-indexes.py rebuild cluster_embeddings --method ivfflat
+    python vector-indexes.py check --k 40
+"""
+import sys
+import math
+import argparse
+
+import numpy as np
+
+from config import Config
+from services.database import DatabaseService
+
+TABLES = ("article_embeddings", "cluster_embeddings")
+
+
+def recommended_lists(rows: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above"""
+    if rows > 1_000_000:
+        return int(math.sqrt(rows))
+    return max(10, rows // 1000)
+
+
+def status(db: DatabaseService) -> int:
+    for entry in db.get_vector_index_status():
+        line = f"{entry['table']:<20} {entry['rows']:>10} rows  "
+        if entry["index"] is None:
+            line += "no ANN index (sequential scans)"
+        else:
+            options = ", ".join(f"{k}={v}" for k, v in entry["options"].items()) or "defaults"
+            line += f"{entry['index']} ({entry['method']}: {options}, {entry['size_bytes'] / 1e6:.1f} MB)"
+            if entry["method"] == "ivfflat":
+                lists = int(entry["options"].get("lists", 100))
+                wanted = recommended_lists(entry["rows"])
+                if not wanted / 2 <= lists <= wanted * 2:
+                    line += f"  -> rebuild with lists={wanted}"
+        print(line)
+    print(f"Search: ivfflat.probes={Config.VECTOR_IVFFLAT_PROBES}, "
+          f"hnsw.ef_search={Config.VECTOR_HNSW_EF_SEARCH}, candidates={Config.VECTOR_SEARCH_CANDIDATES}")
+    return 0
+
+
+def rebuild(db: DatabaseService, args) -> int:
+    lists = args.lists
+    if args.method == "ivfflat" and lists is None:
+        rows = next(e["rows"] for e in db.get_vector_index_status() if e["table"] == args.table)
+        lists = recommended_lists(rows)
+    name = db.rebuild_vector_index(
+        args.table,
+        method=args.method,
+        lists=lists or 100,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        maintenance_work_mem=args.maintenance_work_mem
+    )
+    print(f"✓ {name} built on {args.table}")
+    return 0
+
+
+def check(db: DatabaseService, args) -> int:
+    query = np.random.default_rng(0).standard_normal(Config.EMBEDDING_DIM).astype(np.float32)
+    query /= np.linalg.norm(query)
+    failed = False
+    for table in args.tables or TABLES:
+        plan = db.explain_vector_search(table, query, args.k)
+        uses_index = any("Index Scan using" in line for line in plan)
+        failed |= not uses_index
+        print(f"{'✓' if uses_index else '✗'} {table}: {'ANN index' if uses_index else 'sequential scan'}")
+        if args.verbose or not uses_index:
+            print("\n".join(f"    {line}" for line in plan))
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="pgvector index management")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+
+    p = sub.add_parser("rebuild")
+    p.add_argument("table", choices=TABLES)
+    p.add_argument("--method", choices=("hnsw", "ivfflat"), default="hnsw")
+    p.add_argument("--lists", type=int, help="ivfflat lists (default: from row count)")
+    p.add_argument("--m", type=int, default=16)
+    p.add_argument("--ef-construction", type=int, default=64)
+    p.add_argument("--maintenance-work-mem", help="e.g. 1GB; HNSW builds much faster when the graph fits")
+
+    p = sub.add_parser("check")
+    p.add_argument("tables", nargs="*", help="default: both embedding tables")
+    p.add_argument("--k", type=int, default=Config.VECTOR_SEARCH_CANDIDATES)
+    p.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    if not Config.DATABASE_URL:
+        print("DATABASE_URL no configurada", file=sys.stderr)
+        return 2
+    db = DatabaseService()
+    if args.command == "status":
+        return status(db)
+    if args.command == "rebuild":
+        return rebuild(db, args)
+    return check(db, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Stream worker: clusters new articles within seconds of their insert
+(requires migration 014_article_insert_notify.sql and DATABASE_URL).
+
+Runs next to the HTTP service (same .env). Only one worker is active at a
+time; extra instances wait as standbys and take over if it dies. The
+/api/cluster cron can keep running as a safety net: it shares the
+cluster-run lock with the worker's periodic global run and skips the
+articles leased by a micro-batch (migration 016).
+"""
+import sys
+import os
+import signal
+import logging
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import (
+    CLUSTER_RUN_LOCK, get_services, get_recent_index, get_reenrich_queue,
+    load_unclaimed_embeddings, new_pipeline, new_prefilter, run_reenrichment, worker_id
+)
+from config import Config
+from services.stream_worker import CentroidIndex, MicroBatchWorker
+from services.cascade import ModelCascade
+
+logger = logging.getLogger("worker")
+
+
+def main():
+    try:
+        Config.validate()
+    except ValueError as e:
+        print(f"❌ Configuration error: {e}")
+        sys.exit(1)
+    if not Config.DATABASE_URL:
+        print("❌ DATABASE_URL is required (LISTEN/NOTIFY)")
+        sys.exit(1)
+
+    embedding_service, _, dedup_service, db_service, _ = get_services()
+    days = Config.STREAM_WORKER_DAYS
+
+    def run_global(checked: set):
+        # HDBSCAN over what the micro-batches left unclustered
+        with db_service.advisory_lock(CLUSTER_RUN_LOCK) as acquired:
+            if not acquired:
+                logger.info("Cluster run in progress elsewhere, skipping global run")
+                return None
+            result = new_pipeline("global", days, Config.CLUSTER_GLOBAL_LIMIT).run(
+                lambda: load_unclaimed_embeddings(
+                    embedding_service, db_service, days, Config.CLUSTER_GLOBAL_LIMIT
+                ),
+                skip_match=checked
+            )
+            return {**(result or {"processed": 0, "created": 0}), **run_reenrichment()}
+
+    cascade = None
+    if Config.CASCADE_MODEL:
+        embedding_service.enable_cascade(Config.CASCADE_MODEL)
+        cascade = ModelCascade(
+            embedding_service,
+            db_service,
+            dedup_service,
+            threshold=Config.CASCADE_THRESHOLD,
+            days=days,
+            refresh_seconds=Config.STREAM_WORKER_CENTROID_REFRESH_SECONDS,
+            recent_days=Config.RECENT_INDEX_DAYS
+        )
+
+    worker = MicroBatchWorker(
+        db_service,
+        embedding_service,
+        dedup_service,
+        CentroidIndex(db_service, days=days, refresh_seconds=Config.STREAM_WORKER_CENTROID_REFRESH_SECONDS),
+        run_global,
+        similarity_threshold=Config.SIMILARITY_THRESHOLD,
+        batch_size=Config.STREAM_WORKER_BATCH_SIZE,
+        max_wait_seconds=Config.STREAM_WORKER_MAX_WAIT_SECONDS,
+        global_interval_seconds=Config.STREAM_WORKER_GLOBAL_INTERVAL_SECONDS,
+        recent_index=get_recent_index(),
+        reenrich_queue=get_reenrich_queue(),
+        new_prefilter=new_prefilter,
+        cascade=cascade,
+        worker_id=worker_id(),
+        lease_seconds=Config.CLAIM_LEASE_SECONDS
+    )
+
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+    logger.info(f"Stream worker stopped: {worker.stats}")
+    db_service.close()
+
+
+if __name__ == "__main__":
+    main()
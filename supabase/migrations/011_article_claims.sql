@@ -0,0 +1,63 @@
+-- Work claiming for ML cluster runs
+-- Several ml-cluster replicas can embed and match new articles in parallel:
+-- each one leases a batch of rows with FOR UPDATE SKIP LOCKED, so two
+-- replicas never pick the same article. Leases expire, so articles claimed
+-- by a crashed replica are picked up again after the lease runs out.
+-- The global stages (dedup, HDBSCAN, cluster creation) are serialized with a
+-- session advisory lock taken by the service (no schema needed).
+
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
+
+-- Unclustered work queue, newest first
+CREATE INDEX IF NOT EXISTS idx_articles_unclustered
+ON articles(published_at DESC)
+WHERE cluster_id IS NULL;
+
+-- Lease up to p_limit unclustered articles without an embedding yet
+CREATE OR REPLACE FUNCTION claim_unclustered_articles(
+  p_worker TEXT,
+  p_days INT DEFAULT 7,
+  p_limit INT DEFAULT 200,
+  p_lease_seconds INT DEFAULT 600
+)
+RETURNS SETOF articles
+LANGUAGE sql
+AS $$
+  WITH picked AS (
+    SELECT a.id
+    FROM articles a
+    WHERE a.cluster_id IS NULL
+      AND a.created_at >= NOW() - make_interval(days => p_days)
+      AND (a.claimed_until IS NULL OR a.claimed_until < NOW())
+      AND NOT EXISTS (
+        SELECT 1 FROM article_embeddings ae WHERE ae.article_id = a.id
+      )
+    ORDER BY a.published_at DESC NULLS LAST, a.id
+    LIMIT p_limit
+    FOR UPDATE OF a SKIP LOCKED
+  )
+  UPDATE articles a
+  SET claimed_by = p_worker,
+      claimed_until = NOW() + make_interval(secs => p_lease_seconds)
+  FROM picked
+  WHERE a.id = picked.id
+  RETURNING a.*;
+$$;
+
+-- Give leased articles back before the lease expires
+CREATE OR REPLACE FUNCTION release_article_claims(
+  p_worker TEXT,
+  p_ids UUID[]
+)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+  WITH released AS (
+    UPDATE articles
+    SET claimed_by = NULL, claimed_until = NULL
+    WHERE id = ANY(p_ids) AND claimed_by = p_worker
+    RETURNING 1
+  )
+  SELECT COUNT(*)::INTEGER FROM released;
+$$;
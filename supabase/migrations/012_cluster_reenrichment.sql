@@ -0,0 +1,25 @@
+-- Drift-triggered re-enrichment of growing clusters
+-- Clusters remember what their last GPT enrichment was based on (article
+-- count and centroid). When articles join an existing cluster, the ML
+-- service compares the current values with that baseline and queues the
+-- cluster for re-enrichment if it grew or drifted enough. Queue entries are
+-- debounced: every new trigger pushes due_at back, up to a maximum wait
+-- from the first trigger.
+
+ALTER TABLE clusters ADD COLUMN IF NOT EXISTS enriched_at TIMESTAMPTZ;
+ALTER TABLE clusters ADD COLUMN IF NOT EXISTS enriched_article_count INTEGER;
+
+ALTER TABLE cluster_embeddings ADD COLUMN IF NOT EXISTS enriched_embedding vector(384);
+
+CREATE TABLE IF NOT EXISTS cluster_reenrichment_queue (
+    cluster_id UUID PRIMARY KEY REFERENCES clusters(id) ON DELETE CASCADE,
+    reason TEXT NOT NULL,
+    first_queued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    due_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cluster_reenrichment_queue_due
+ON cluster_reenrichment_queue(due_at);
+
+-- Only the ML service uses the queue (direct PostgreSQL connection)
+ALTER TABLE cluster_reenrichment_queue ENABLE ROW LEVEL SECURITY;
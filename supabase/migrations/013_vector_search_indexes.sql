@@ -0,0 +1,121 @@
+-- Index-friendly vector search
+-- pgvector only uses an ANN index for `ORDER BY embedding <=> q LIMIT k`.
+-- The 006 functions also filtered on `1 - (embedding <=> q) >= threshold`
+-- next to a join, which the planner answers with a sequential scan. They now
+-- take the k nearest rows from the index first and apply the time window and
+-- threshold to those.
+--
+-- The ivfflat indexes from 006 were usually built on empty tables (centroids
+-- trained on no data) and their `lists` never followed table growth. They are
+-- replaced by HNSW indexes (pgvector >= 0.5.0), which need no training or
+-- rebuilds. On a large article_embeddings table, build the index without
+-- blocking writes instead of running this part:
+--   python vector-indexes.py rebuild article_embeddings --method hnsw
+-- Per-query search breadth: SET hnsw.ef_search (default 40, must be >= k)
+-- or ivfflat.probes (default 1); the ML service sets both per transaction.
+
+-- 1. HNSW indexes (replace ivfflat)
+CREATE INDEX IF NOT EXISTS cluster_embeddings_embedding_hnsw_idx
+ON cluster_embeddings
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS article_embeddings_embedding_hnsw_idx
+ON article_embeddings
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+DROP INDEX IF EXISTS cluster_embeddings_embedding_idx;
+DROP INDEX IF EXISTS article_embeddings_embedding_idx;
+
+-- 2. Clusters similares: k vecinos del índice, luego ventana y umbral
+CREATE OR REPLACE FUNCTION find_similar_clusters(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.75,
+    max_results INT DEFAULT 5
+)
+RETURNS TABLE (
+    cluster_id UUID,
+    similarity FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        nn.cluster_id,
+        (1 - nn.distance)::FLOAT as similarity
+    FROM (
+        SELECT ce.cluster_id, ce.embedding <=> query_embedding as distance
+        FROM cluster_embeddings ce
+        ORDER BY ce.embedding <=> query_embedding
+        LIMIT GREATEST(max_results * 8, 40)
+    ) nn
+    JOIN clusters c ON c.id = nn.cluster_id
+    WHERE c.window_end > NOW() - INTERVAL '7 days'
+    AND nn.distance <= 1 - similarity_threshold
+    ORDER BY nn.distance
+    LIMIT max_results;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3. Artículos similares
+CREATE OR REPLACE FUNCTION find_similar_articles(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.8,
+    max_results INT DEFAULT 10
+)
+RETURNS TABLE (
+    article_id UUID,
+    similarity FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        nn.article_id,
+        (1 - nn.distance)::FLOAT as similarity
+    FROM (
+        SELECT ae.article_id, ae.embedding <=> query_embedding as distance
+        FROM article_embeddings ae
+        ORDER BY ae.embedding <=> query_embedding
+        LIMIT GREATEST(max_results * 8, 40)
+    ) nn
+    JOIN articles a ON a.id = nn.article_id
+    WHERE a.created_at > NOW() - INTERVAL '7 days'
+    AND nn.distance <= 1 - similarity_threshold
+    ORDER BY nn.distance
+    LIMIT max_results;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4. Duplicados: k vecinos de cada artículo reciente (índice) en lugar de
+-- comparar todos los pares
+CREATE OR REPLACE FUNCTION find_duplicate_articles(
+    dedup_threshold FLOAT DEFAULT 0.92
+)
+RETURNS TABLE (
+    article_id_1 UUID,
+    article_id_2 UUID,
+    similarity FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        ae1.article_id as article_id_1,
+        nn.article_id as article_id_2,
+        (1 - nn.distance)::FLOAT as similarity
+    FROM article_embeddings ae1
+    JOIN articles a1 ON a1.id = ae1.article_id
+    CROSS JOIN LATERAL (
+        SELECT ae2.article_id, ae2.embedding <=> ae1.embedding as distance
+        FROM article_embeddings ae2
+        ORDER BY ae2.embedding <=> ae1.embedding
+        LIMIT 10
+    ) nn
+    JOIN articles a2 ON a2.id = nn.article_id
+    WHERE a1.created_at > NOW() - INTERVAL '3 days'
+    AND a2.created_at > NOW() - INTERVAL '3 days'
+    AND ae1.article_id < nn.article_id
+    AND nn.distance <= 1 - dedup_threshold
+    ORDER BY nn.distance
+    LIMIT 100;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,36 @@
+-- Article-insert notifications for the ML stream worker
+-- Every INSERT statement on articles sends the new ids on the
+-- 'articles_inserted' channel (comma-separated, at most 150 per payload to
+-- stay under the 8000-byte NOTIFY limit). The worker (ml-cluster/worker.py)
+-- LISTENs on it and clusters new articles in micro-batches within seconds
+-- instead of waiting for the next cron run. Notifications are delivered on
+-- commit and only to connected listeners; the worker catches up on anything
+-- it missed with a regular run when it (re)connects.
+
+CREATE OR REPLACE FUNCTION notify_articles_inserted()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  payload TEXT;
+BEGIN
+  FOR payload IN
+    SELECT string_agg(id::text, ',')
+    FROM (
+      SELECT id, (row_number() OVER () - 1) / 150 AS chunk
+      FROM new_articles
+    ) numbered
+    GROUP BY chunk
+  LOOP
+    PERFORM pg_notify('articles_inserted', payload);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS articles_insert_notify ON articles;
+CREATE TRIGGER articles_insert_notify
+AFTER INSERT ON articles
+REFERENCING NEW TABLE AS new_articles
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_articles_inserted();
@@ -0,0 +1,23 @@
+-- Article embeddings of secondary models (ML model cascade)
+-- article_embeddings holds the vectors of the primary model (EMBEDDING_MODEL),
+-- which clustering, centroids and search use. With CASCADE_MODEL set, the
+-- stream worker first encodes new articles with a cheaper model and keeps
+-- those vectors here, tagged by model name; the centroids it matches against
+-- are the per-cluster averages of these vectors. Any dimension is accepted
+-- (one model per row), so no ANN index: they are only read grouped by cluster.
+
+CREATE TABLE IF NOT EXISTS article_model_embeddings (
+    article_id UUID NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+
+    PRIMARY KEY (article_id, model)
+);
+
+CREATE INDEX IF NOT EXISTS idx_article_model_embeddings_model
+ON article_model_embeddings(model, article_id);
+
+-- Only the ML service uses it (direct PostgreSQL connection)
+ALTER TABLE article_model_embeddings ENABLE ROW LEVEL SECURITY;
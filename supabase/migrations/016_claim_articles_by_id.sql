@@ -0,0 +1,31 @@
+-- Lease specific articles (ML stream worker)
+-- The stream worker clusters the articles named in insert notifications
+-- (migration 014) while the /api/cluster cron may run at the same time.
+-- Before touching a micro-batch, it leases those ids with the claim columns of
+-- migration 011. Runs read with the leases excluded, so the two never assign
+-- the same article. Articles that are already clustered or leased by someone
+-- else are skipped, and the lease is released once the batch is assigned.
+
+CREATE OR REPLACE FUNCTION claim_articles(
+  p_worker TEXT,
+  p_ids UUID[],
+  p_lease_seconds INT DEFAULT 600
+)
+RETURNS SETOF articles
+LANGUAGE sql
+AS $$
+  WITH picked AS (
+    SELECT a.id
+    FROM articles a
+    WHERE a.id = ANY(p_ids)
+      AND a.cluster_id IS NULL
+      AND (a.claimed_until IS NULL OR a.claimed_until < NOW() OR a.claimed_by = p_worker)
+    FOR UPDATE OF a SKIP LOCKED
+  )
+  UPDATE articles a
+  SET claimed_by = p_worker,
+      claimed_until = NOW() + make_interval(secs => p_lease_seconds)
+  FROM picked
+  WHERE a.id = picked.id
+  RETURNING a.*;
+$$;
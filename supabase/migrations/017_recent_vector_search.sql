@@ -0,0 +1,113 @@
+-- Vector search that keeps looking past stale neighbours
+-- The 013 functions take the k nearest rows from the ANN index and only then
+-- apply the 7-day window. Old clusters and articles are never removed from the
+-- index, so for a recurring story the k candidates can all be stale and the
+-- recent match is missed (and a duplicate cluster created). While fewer than
+-- max_results recent rows pass and the farthest candidate is still within the
+-- threshold, k is multiplied by 4 (up to 1000, the hnsw.ef_search maximum)
+-- and the index queried again. With pgvector >= 0.8, hnsw.iterative_scan does
+-- the same inside the index.
+
+-- 1. Clusters similares
+CREATE OR REPLACE FUNCTION find_similar_clusters(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.75,
+    max_results INT DEFAULT 5
+)
+RETURNS TABLE (
+    cluster_id UUID,
+    similarity FLOAT
+) AS $$
+DECLARE
+    k INT := LEAST(GREATEST(max_results * 8, 40), 1000);
+    fetched INT;
+    farthest FLOAT;
+    ids UUID[];
+    distances FLOAT[];
+BEGIN
+    LOOP
+        PERFORM set_config('hnsw.ef_search', k::text, true);
+        SELECT
+            COUNT(*),
+            MAX(nn.distance),
+            array_agg(nn.cluster_id ORDER BY nn.distance) FILTER (WHERE ok),
+            array_agg(nn.distance ORDER BY nn.distance) FILTER (WHERE ok)
+        INTO fetched, farthest, ids, distances
+        FROM (
+            SELECT
+                nn.cluster_id,
+                nn.distance,
+                c.window_end > NOW() - INTERVAL '7 days' AND nn.distance <= 1 - similarity_threshold AS ok
+            FROM (
+                SELECT ce.cluster_id, ce.embedding <=> query_embedding as distance
+                FROM cluster_embeddings ce
+                ORDER BY ce.embedding <=> query_embedding
+                LIMIT k
+            ) nn
+            LEFT JOIN clusters c ON c.id = nn.cluster_id
+        ) nn;
+
+        EXIT WHEN COALESCE(array_length(ids, 1), 0) >= max_results
+            OR fetched < k
+            OR farthest > 1 - similarity_threshold
+            OR k >= 1000;
+        k := LEAST(k * 4, 1000);
+    END LOOP;
+
+    RETURN QUERY
+    SELECT r.cluster_id, (1 - r.distance)::FLOAT
+    FROM unnest(ids[1:max_results], distances[1:max_results]) AS r(cluster_id, distance);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Artículos similares
+CREATE OR REPLACE FUNCTION find_similar_articles(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.8,
+    max_results INT DEFAULT 10
+)
+RETURNS TABLE (
+    article_id UUID,
+    similarity FLOAT
+) AS $$
+DECLARE
+    k INT := LEAST(GREATEST(max_results * 8, 40), 1000);
+    fetched INT;
+    farthest FLOAT;
+    ids UUID[];
+    distances FLOAT[];
+BEGIN
+    LOOP
+        PERFORM set_config('hnsw.ef_search', k::text, true);
+        SELECT
+            COUNT(*),
+            MAX(nn.distance),
+            array_agg(nn.article_id ORDER BY nn.distance) FILTER (WHERE ok),
+            array_agg(nn.distance ORDER BY nn.distance) FILTER (WHERE ok)
+        INTO fetched, farthest, ids, distances
+        FROM (
+            SELECT
+                nn.article_id,
+                nn.distance,
+                a.created_at > NOW() - INTERVAL '7 days' AND nn.distance <= 1 - similarity_threshold AS ok
+            FROM (
+                SELECT ae.article_id, ae.embedding <=> query_embedding as distance
+                FROM article_embeddings ae
+                ORDER BY ae.embedding <=> query_embedding
+                LIMIT k
+            ) nn
+            LEFT JOIN articles a ON a.id = nn.article_id
+        ) nn;
+
+        EXIT WHEN COALESCE(array_length(ids, 1), 0) >= max_results
+            OR fetched < k
+            OR farthest > 1 - similarity_threshold
+            OR k >= 1000;
+        k := LEAST(k * 4, 1000);
+    END LOOP;
+
+    RETURN QUERY
+    SELECT r.article_id, (1 - r.distance)::FLOAT
+    FROM unnest(ids[1:max_results], distances[1:max_results]) AS r(article_id, distance);
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,23 @@
+-- Offline enrichment jobs (ML service batch enrichment)
+-- A run in batch mode submits the prompts of all its new clusters as one
+-- batch job and returns its id. The job record (backend, batch id, status,
+-- counts) and the computed cluster fields the results are merged with live
+-- here instead of on the local disk of the replica that submitted it, so
+-- GET /api/enrichment-jobs/<id> and the poll cron work on any replica.
+
+CREATE TABLE IF NOT EXISTS cluster_enrichment_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    job JSONB NOT NULL,
+    specs JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Pending jobs for the poll cron
+CREATE INDEX IF NOT EXISTS idx_cluster_enrichment_jobs_submitted
+ON cluster_enrichment_jobs(created_at)
+WHERE status = 'submitted';
+
+-- Only the ML service uses it
+ALTER TABLE cluster_enrichment_jobs ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,117 @@
+-- Time window of the vector search as a parameter
+-- The 017 functions hardcode the 7-day window, while the ML service reads it
+-- from CLUSTER_MATCH_DAYS. window_days (default 7) lets callers of the RPC use
+-- the same window as the direct-SQL path. The old three-argument versions are
+-- dropped first: CREATE OR REPLACE with an extra argument would add an
+-- overload and make calls without window_days ambiguous.
+
+DROP FUNCTION IF EXISTS find_similar_clusters(vector, FLOAT, INT);
+DROP FUNCTION IF EXISTS find_similar_articles(vector, FLOAT, INT);
+
+-- 1. Clusters similares
+CREATE OR REPLACE FUNCTION find_similar_clusters(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.75,
+    max_results INT DEFAULT 5,
+    window_days INT DEFAULT 7
+)
+RETURNS TABLE (
+    cluster_id UUID,
+    similarity FLOAT
+) AS $$
+DECLARE
+    k INT := LEAST(GREATEST(max_results * 8, 40), 1000);
+    fetched INT;
+    farthest FLOAT;
+    ids UUID[];
+    distances FLOAT[];
+BEGIN
+    LOOP
+        PERFORM set_config('hnsw.ef_search', k::text, true);
+        SELECT
+            COUNT(*),
+            MAX(nn.distance),
+            array_agg(nn.cluster_id ORDER BY nn.distance) FILTER (WHERE ok),
+            array_agg(nn.distance ORDER BY nn.distance) FILTER (WHERE ok)
+        INTO fetched, farthest, ids, distances
+        FROM (
+            SELECT
+                nn.cluster_id,
+                nn.distance,
+                c.window_end > NOW() - make_interval(days => window_days)
+                    AND nn.distance <= 1 - similarity_threshold AS ok
+            FROM (
+                SELECT ce.cluster_id, ce.embedding <=> query_embedding as distance
+                FROM cluster_embeddings ce
+                ORDER BY ce.embedding <=> query_embedding
+                LIMIT k
+            ) nn
+            LEFT JOIN clusters c ON c.id = nn.cluster_id
+        ) nn;
+
+        EXIT WHEN COALESCE(array_length(ids, 1), 0) >= max_results
+            OR fetched < k
+            OR farthest > 1 - similarity_threshold
+            OR k >= 1000;
+        k := LEAST(k * 4, 1000);
+    END LOOP;
+
+    RETURN QUERY
+    SELECT r.cluster_id, (1 - r.distance)::FLOAT
+    FROM unnest(ids[1:max_results], distances[1:max_results]) AS r(cluster_id, distance);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Artículos similares
+CREATE OR REPLACE FUNCTION find_similar_articles(
+    query_embedding vector(384),
+    similarity_threshold FLOAT DEFAULT 0.8,
+    max_results INT DEFAULT 10,
+    window_days INT DEFAULT 7
+)
+RETURNS TABLE (
+    article_id UUID,
+    similarity FLOAT
+) AS $$
+DECLARE
+    k INT := LEAST(GREATEST(max_results * 8, 40), 1000);
+    fetched INT;
+    farthest FLOAT;
+    ids UUID[];
+    distances FLOAT[];
+BEGIN
+    LOOP
+        PERFORM set_config('hnsw.ef_search', k::text, true);
+        SELECT
+            COUNT(*),
+            MAX(nn.distance),
+            array_agg(nn.article_id ORDER BY nn.distance) FILTER (WHERE ok),
+            array_agg(nn.distance ORDER BY nn.distance) FILTER (WHERE ok)
+        INTO fetched, farthest, ids, distances
+        FROM (
+            SELECT
+                nn.article_id,
+                nn.distance,
+                a.created_at > NOW() - make_interval(days => window_days)
+                    AND nn.distance <= 1 - similarity_threshold AS ok
+            FROM (
+                SELECT ae.article_id, ae.embedding <=> query_embedding as distance
+                FROM article_embeddings ae
+                ORDER BY ae.embedding <=> query_embedding
+                LIMIT k
+            ) nn
+            LEFT JOIN articles a ON a.id = nn.article_id
+        ) nn;
+
+        EXIT WHEN COALESCE(array_length(ids, 1), 0) >= max_results
+            OR fetched < k
+            OR farthest > 1 - similarity_threshold
+            OR k >= 1000;
+        k := LEAST(k * 4, 1000);
+    END LOOP;
+
+    RETURN QUERY
+    SELECT r.article_id, (1 - r.distance)::FLOAT
+    FROM unnest(ids[1:max_results], distances[1:max_results]) AS r(article_id, distance);
+END;
+$$ LANGUAGE plpgsql;